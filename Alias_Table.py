@@ -0,0 +1,71 @@
+"""
+The code in this file samples nodes from a discrete probability distribution in constant time with the alias method.
+"""
+from __future__ import division
+import random
+
+
+class AliasTable(object):
+    """
+    Class to sample nodes from a weighted set of nodes, e.g. the personalization of a personalized page rank.
+
+    The table is built once in linear time with Vose's alias method: the probabilities are scaled by the number of
+    nodes and every node whose scaled probability is smaller than 1 is paired with an alias, a node with a scaled
+    probability larger than 1, which gives away the remaining probability mass. A sample picks one of the n columns
+    uniformly at random and then either the node of the column or its alias, so it takes constant time no matter how
+    many nodes there are. A table of a single node returns that node without drawing a random number, so that a
+    single seed node consumes the random numbers exactly as before.
+    """
+
+    def __init__(self, weights):
+        """
+        Builds the table
+        :param weights: A dictionary of nodes and their non-negative weights, which need not sum up to 1
+        """
+        if any(weight < 0 for weight in weights.itervalues()):
+            raise ValueError("Weights must not be negative")
+        self.nodes = [node for node, weight in weights.iteritems() if weight > 0]
+        if not self.nodes:
+            raise ValueError("At least one weight must be positive")
+        total_weight = sum(weights[node] for node in self.nodes)
+        self.probabilities = {node: weights[node] / total_weight for node in self.nodes}
+
+        number_of_nodes = len(self.nodes)
+        scaled_probabilities = [self.probabilities[node] * number_of_nodes for node in self.nodes]
+        self.thresholds = [1.0] * number_of_nodes
+        self.aliases = range(number_of_nodes)
+        small = [i for i, probability in enumerate(scaled_probabilities) if probability < 1]
+        large = [i for i, probability in enumerate(scaled_probabilities) if probability >= 1]
+        while small and large:
+            i = small.pop()
+            j = large.pop()
+            self.thresholds[i] = scaled_probabilities[i]
+            self.aliases[i] = j
+            scaled_probabilities[j] += scaled_probabilities[i] - 1
+            if scaled_probabilities[j] < 1:
+                small.append(j)
+            else:
+                large.append(j)
+        # The remaining columns are full up to rounding errors
+
+    def sample(self, rng=random):
+        """
+        Draws a node
+        :param rng: The random number generator, by default the global one of the module random
+        :return: A node, drawn with probability proportional to its weight
+        """
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+        i = int(rng.random() * len(self.nodes))
+        if rng.random() < self.thresholds[i]:
+            return self.nodes[i]
+        return self.nodes[self.aliases[i]]
+
+    def probability(self, node):
+        """
+        :return: The probability with which a node is drawn
+        """
+        return self.probabilities.get(node, 0)
+
+    def __len__(self):
+        return len(self.nodes)
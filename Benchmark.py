@@ -0,0 +1,286 @@
+"""
+In this code we time the incremental personalized page rank classes and the ingestion of the trustchain data set on
+randomly generated graphs of different sizes. The timings are written to a JSON file and can be compared with the
+timings of an earlier run, the baseline, so that performance regressions become visible.
+
+Usage:
+    python Benchmark.py --sizes 1000 10000 100000 1000000 --output results.json --baseline baseline.json
+"""
+from __future__ import division
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from timeit import default_timer
+
+import networkx as nx
+from Page_Rank import IncrementalPersonalizedPageRank
+from Page_Rank2 import IncrementalPersonalizedPageRank2
+
+ENGINES = ['IncrementalPersonalizedPageRank', 'IncrementalPersonalizedPageRank2']
+
+# Proportions of the modifications applied between two calls of update_random_walks. Most blocks in the trustchain
+# are repeated interactions between peers that already know each other, followed by interactions with new partners
+# and peers joining the network. Edges and peers rarely disappear.
+MUTATION_MIX = [('add_weight_to_edge', 0.6),
+                ('add_edge', 0.25),
+                ('add_node', 0.1),
+                ('remove_edge', 0.04),
+                ('remove_node', 0.01)]
+
+
+def generate_graph(number_of_edges, rng):
+    """
+    Generates a random directed graph with the given number of edges and a quarter as many nodes. As in Test_Cases,
+    every pair of nodes is connected by at most one edge, with a weight between 1 and 10.
+    :param number_of_edges: The number of edges of the graph
+    :param rng: The random number generator
+    :return: The graph
+    """
+    number_of_nodes = max(number_of_edges // 4, 2)
+    graph = nx.DiGraph()
+    graph.add_nodes_from(xrange(number_of_nodes))
+    pairs = set()
+    while len(pairs) < number_of_edges:
+        node_1 = rng.randrange(number_of_nodes)
+        node_2 = rng.randrange(number_of_nodes)
+        if node_1 != node_2 and (node_2, node_1) not in pairs:
+            pairs.add((node_1, node_2))
+    graph.add_weighted_edges_from((node_1, node_2, rng.randint(1, 10)) for node_1, node_2 in pairs)
+    return graph
+
+
+def create_engine(engine, graph, seed_node, arguments):
+    """
+    Creates an engine of one of the classes in ENGINES
+    :param engine: The name of the class
+    :param graph: The graph of the engine
+    :param seed_node: The seed node of the random walks
+    :param arguments: The parsed command line arguments with the number of random walks, the reset probability and
+    the length of the random walks
+    :return: The engine, without random walks
+    """
+    if engine == 'IncrementalPersonalizedPageRank':
+        return IncrementalPersonalizedPageRank(graph, seed_node, arguments.random_walks, arguments.reset_probability,
+                                               arguments.random_walk_length)
+    return IncrementalPersonalizedPageRank2(graph, seed_node, arguments.random_walks, arguments.reset_probability)
+
+
+def apply_mutations(pr, number_of_mutations, rng, next_node):
+    """
+    Applies a random mix of modifications, drawn according to MUTATION_MIX, to the graph of an engine
+    :param pr: The incremental personalized page rank engine
+    :param number_of_mutations: The number of modifications
+    :param rng: The random number generator
+    :param next_node: The label of the next node that joins the network
+    :return: The label of the next node that joins the network after the modifications
+    """
+    nodes = list(pr.graph.nodes())
+    edges = list(pr.graph.edges())
+    for _ in xrange(number_of_mutations):
+        c = rng.uniform(0, 1)
+        for mutation, probability in MUTATION_MIX:
+            c -= probability
+            if c <= 0:
+                break
+        if mutation == 'add_weight_to_edge' and edges:
+            edge = rng.choice(edges)
+            if pr.graph.has_edge(*edge):
+                pr.add_weight_to_edge(edge[0], edge[1], rng.randint(1, 10))
+        elif mutation == 'add_node':
+            pr.add_node(next_node)
+            pr.add_edge(next_node, rng.choice(nodes), rng.randint(1, 10))
+            nodes.append(next_node)
+            next_node += 1
+        elif mutation == 'remove_edge' and edges:
+            pr.remove_edge(*rng.choice(edges))
+        elif mutation == 'remove_node':
+            node = rng.choice(nodes)
+            if node != pr.node and node in pr.graph:
+                pr.remove_node(node)
+        else:
+            node_1, node_2 = rng.choice(nodes), rng.choice(nodes)
+            if node_1 != node_2 and node_1 in pr.graph and node_2 in pr.graph:
+                pr.add_edge(node_1, node_2, rng.randint(1, 10))
+    return next_node
+
+
+def time_call(function, *arguments):
+    """
+    Times a single call of a function
+    :param function: The function
+    :param arguments: The arguments of the function
+    :return: The number of seconds the call took
+    """
+    start_time = default_timer()
+    function(*arguments)
+    return default_timer() - start_time
+
+
+def summarize(engine, number_of_edges, benchmark, timings):
+    """
+    Summarizes the timings of a benchmark as a result dictionary
+    :param engine: The name of the timed class
+    :param number_of_edges: The number of edges of the graph
+    :param benchmark: The name of the timed method
+    :param timings: The list of timings in seconds
+    :return: A result dictionary with all timings and the best and mean timing
+    """
+    return {'engine': engine,
+            'edges': number_of_edges,
+            'benchmark': benchmark,
+            'seconds': timings,
+            'best': min(timings),
+            'mean': sum(timings) / len(timings)}
+
+
+def benchmark_engines(graph, arguments, rng):
+    """
+    Times initial_random_walks, update_random_walks and compute_personalized_page_ranks of both engine classes
+    :param graph: The graph on which the engines are run
+    :param arguments: The parsed command line arguments
+    :param rng: The random number generator
+    :return: A list of result dictionaries
+    """
+    results = []
+    number_of_edges = graph.number_of_edges()
+    seed_node = max(graph.nodes(), key=graph.out_degree)
+    for engine in arguments.engines:
+        initial_timings = []
+        update_timings = []
+        compute_timings = []
+        for repeat in xrange(arguments.repeat):
+            pr = create_engine(engine, graph.copy(), seed_node, arguments)
+            initial_timings.append(time_call(pr.initial_random_walks))
+            compute_timings.append(time_call(pr.compute_personalized_page_ranks))
+            next_node = graph.number_of_nodes()
+            for _ in xrange(arguments.update_batches):
+                next_node = apply_mutations(pr, arguments.mutations_per_batch, rng, next_node)
+                update_timings.append(time_call(pr.update_random_walks))
+        results.append(summarize(engine, number_of_edges, 'initial_random_walks', initial_timings))
+        results.append(summarize(engine, number_of_edges, 'update_random_walks', update_timings))
+        results.append(summarize(engine, number_of_edges, 'compute_personalized_page_ranks', compute_timings))
+        print("{} on {} edges: initial {:.4f}s, update {:.4f}s, compute {:.4f}s".format(
+            engine, number_of_edges, min(initial_timings), min(update_timings), min(compute_timings)))
+    return results
+
+
+def benchmark_open_data_set(file_path, file_name, repeat):
+    """
+    Times GraphReduction2.open_data_set on an existing trustchain database
+    :param file_path: Path of the database file
+    :param file_name: Name of the database file without '.db'
+    :param repeat: The number of times the data set is opened
+    :return: A result dictionary
+    """
+    from Open_Database2 import GraphReduction2
+
+    timings = []
+    for _ in xrange(repeat):
+        gr = GraphReduction2(file_path, file_name)
+        timings.append(time_call(gr.open_data_set))
+    return summarize('GraphReduction2', gr.graph.number_of_edges(), 'open_data_set', timings)
+
+
+def compare_with_baseline(results, baseline, tolerance, min_difference=0.001):
+    """
+    Compares the best timings of a run with those of a baseline run
+    :param results: The result dictionaries of the current run
+    :param baseline: The result dictionaries of the baseline run
+    :param tolerance: Relative slowdown above which a benchmark is reported as a regression, e.g. 0.2 for 20%
+    :param min_difference: Slowdown in seconds below which a benchmark is never reported as a regression, so that
+    timer noise on very fast benchmarks is ignored
+    :return: A list of (engine, edges, benchmark, baseline seconds, current seconds, ratio, regressed) tuples for
+    all benchmarks that appear in both runs
+    """
+    baseline_timings = {(result['engine'], result['edges'], result['benchmark']): result['best']
+                        for result in baseline}
+    comparison = []
+    for result in results:
+        key = (result['engine'], result['edges'], result['benchmark'])
+        if key not in baseline_timings:
+            continue
+        ratio = result['best'] / baseline_timings[key] if baseline_timings[key] > 0 else 1.0
+        regressed = ratio > 1 + tolerance and result['best'] - baseline_timings[key] > min_difference
+        comparison.append(key + (baseline_timings[key], result['best'], ratio, regressed))
+    return comparison
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the incremental personalized page rank classes")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help="Numbers of edges of the generated graphs")
+    parser.add_argument("--engines", nargs='+', default=ENGINES, choices=ENGINES)
+    parser.add_argument("--random-walks", type=int, default=300)
+    parser.add_argument("--reset-probability", type=float, default=0.05)
+    parser.add_argument("--random-walk-length", type=int, default=50,
+                        help="Length of the random walks of IncrementalPersonalizedPageRank")
+    parser.add_argument("--update-batches", type=int, default=5,
+                        help="Number of calls of update_random_walks per repeat")
+    parser.add_argument("--mutations-per-batch", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database", nargs=2, metavar=("FILE_PATH", "FILE_NAME"), default=None,
+                        help="Also time GraphReduction2.open_data_set on this trustchain database")
+    parser.add_argument("--blocks", type=int, default=None,
+                        help="Also time GraphReduction2.open_data_set on a synthetic trustchain database with this "
+                             "number of blocks, if no --database is given")
+    parser.add_argument("--peers", type=int, default=10000, help="Number of peers of the synthetic database")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-difference", type=float, default=0.001)
+    arguments = parser.parse_args(argv)
+
+    rng = random.Random(arguments.seed)
+    random.seed(arguments.seed)
+    results = []
+    for number_of_edges in arguments.sizes:
+        graph = generate_graph(number_of_edges, rng)
+        results.extend(benchmark_engines(graph, arguments, rng))
+    if arguments.database is not None:
+        results.append(benchmark_open_data_set(arguments.database[0], arguments.database[1], arguments.repeat))
+    elif arguments.blocks is not None:
+        from Generate_Database import TrustchainGenerator
+
+        directory = tempfile.mkdtemp()
+        try:
+            TrustchainGenerator(arguments.peers, arguments.blocks, seed=arguments.seed).write(directory + os.sep,
+                                                                                              "synthetic")
+            results.append(benchmark_open_data_set(directory + os.sep, "synthetic", arguments.repeat))
+        finally:
+            shutil.rmtree(directory)
+
+    metadata = {'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'python': platform.python_version(),
+                'networkx': nx.__version__,
+                'platform': platform.platform(),
+                'arguments': vars(arguments)}
+    with open(arguments.output, 'w') as output_file:
+        json.dump({'metadata': metadata, 'results': results}, output_file, indent=2)
+    print("Results written to {}".format(arguments.output))
+
+    if arguments.baseline is None:
+        return 0
+    with open(arguments.baseline) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    regressions = 0
+    print("{:<34}{:>10}  {:<34}{:>12}{:>12}{:>8}".format("Engine", "Edges", "Benchmark", "Baseline", "Current",
+                                                         "Ratio"))
+    for engine, edges, benchmark, baseline_time, current_time, ratio, regressed in \
+            compare_with_baseline(results, baseline, arguments.tolerance, arguments.min_difference):
+        print("{:<34}{:>10}  {:<34}{:>12.4f}{:>12.4f}{:>8.2f}{}".format(engine, edges, benchmark, baseline_time,
+                                                                        current_time, ratio,
+                                                                        "  REGRESSION" if regressed else ""))
+        regressions += regressed
+    print("{} regressions".format(regressions))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,110 @@
+"""
+The code in this file extracts the neighbourhood of a peer, i.e. all peers that can be reached from it in at most k
+hops along edges in either direction, together with the edges in between these peers. It is used by the TrustGUI to
+display the neighbourhood of a peer and can be used by any other tool that needs the neighbourhood of a peer.
+"""
+from heapq import nlargest
+
+import networkx as nx
+
+
+class EgoNetwork(object):
+    """
+    Class holding the neighbourhood of a center node, as computed by ego_network.
+
+    The nodes are divided into rings by their distance to the center node: rings[0] only contains the center node,
+    rings[1] its neighbours, rings[2] the neighbours of its neighbours and so on. Every node outside the center is
+    reached through a single node of the previous ring, its parent, so that children[node] lists the nodes of the next
+    ring that were reached through node. The edges are all edges of the graph between the nodes of the neighbourhood.
+    """
+
+    def __init__(self, center, rings, hops, parents, edges):
+        """
+        Initializes the neighbourhood
+        :param center: The center node
+        :param rings: A list of lists of nodes, one per distance to the center node
+        :param hops: A dictionary of nodes and their distances to the center node
+        :param parents: A dictionary of nodes and the node of the previous ring through which they were reached
+        :param edges: A list of (source, destination, weight) tuples of the edges between the nodes
+        """
+        self.center = center
+        self.rings = rings
+        self.hops = hops
+        self.parents = parents
+        self.edges = edges
+        self.children = {node: [] for ring in rings for node in ring}
+        for ring in rings[1:]:
+            for node in ring:
+                self.children[parents[node]].append(node)
+
+    def nodes(self):
+        """
+        :return: The list of all nodes, ordered by ring
+        """
+        return [node for ring in self.rings for node in ring]
+
+    def __contains__(self, node):
+        return node in self.hops
+
+    def __len__(self):
+        return len(self.hops)
+
+    def graph(self):
+        """
+        Builds the graph of the neighbourhood
+        :return: A weighted directed graph of the nodes and edges
+        """
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes())
+        graph.add_weighted_edges_from(self.edges)
+        return graph
+
+
+def ego_network(graph, center, hops=2, max_degree=None):
+    """
+    Computes the neighbourhood of a center node by a breadth first search that follows edges in both directions.
+    Every node and every edge incident to a node of the neighbourhood is visited a constant number of times, so the
+    running time is linear in the size of the neighbourhood, and membership checks are done in dictionaries rather
+    than lists.
+    The neighbourhoods of peers with thousands of neighbours are too large to be useful. A node therefore adds at most
+    max_degree new nodes to the next ring, namely those connected to it by the heaviest edges, where the weights of
+    edges in both directions are added up. Selecting the heaviest edges costs O(d log max_degree) for a node of degree
+    d.
+    :param graph: A weighted directed graph
+    :param center: The center node
+    :param hops: The maximal distance of a node to the center node
+    :param max_degree: The maximal number of new nodes a node adds to the next ring, an integer for all rings, a list
+    with one entry per ring starting with the ring of the center node, or None for no limit
+    :return: An EgoNetwork
+    """
+    if not isinstance(max_degree, (list, tuple)):
+        max_degree = [max_degree] * hops
+    elif len(max_degree) < hops:
+        raise ValueError("max_degree needs an entry for each of the %d hops" % hops)
+
+    rings = [[center]]
+    distances = {center: 0}
+    parents = dict()
+    for hop in xrange(hops):
+        next_ring = []
+        for node in rings[hop]:
+            candidates = dict()
+            for neighbour, data in graph.succ[node].iteritems():
+                if neighbour not in distances:
+                    candidates[neighbour] = data.get('weight', 1)
+            for neighbour, data in graph.pred[node].iteritems():
+                if neighbour not in distances:
+                    candidates[neighbour] = candidates.get(neighbour, 0) + data.get('weight', 1)
+            if max_degree[hop] is not None and len(candidates) > max_degree[hop]:
+                candidates = nlargest(max_degree[hop], candidates, key=candidates.get)
+            for neighbour in candidates:
+                distances[neighbour] = hop + 1
+                parents[neighbour] = node
+                next_ring.append(neighbour)
+        if not next_ring:
+            break
+        rings.append(next_ring)
+
+    edges = [(node, neighbour, data.get('weight', 1)) for ring in rings for node in ring
+             for neighbour, data in graph.succ[node].iteritems() if neighbour in distances]
+    return EgoNetwork(center, rings, distances, parents, edges)
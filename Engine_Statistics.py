@@ -0,0 +1,164 @@
+"""
+The code in this file collects counters and timers of an incremental personalized page rank engine, so that it can be
+seen where the time goes: taking steps of random walks, repairing random walks or normalizing the page ranks.
+"""
+from __future__ import division
+import cProfile
+import pstats
+from functools import wraps
+from timeit import default_timer
+
+# Names of the phases that are timed
+PHASES = ['generate', 'update', 'compute']
+
+
+def timed_phase(phase):
+    """
+    Decorator for the methods of an engine that make up a phase, e.g. repair_random_walks for the phase update. If
+    the statistics of the engine are enabled, the time spent in the method is added to the phase, whoever calls it,
+    e.g. a LazyPageRank answering a query.
+    :param phase: The name of the phase
+    :return: The decorator
+    """
+    def decorator(method):
+        @wraps(method)
+        def timed_method(self, *arguments, **keywords):
+            statistics = self.statistics
+            if statistics is None:
+                return method(self, *arguments, **keywords)
+            statistics.start_phase(phase)
+            try:
+                return method(self, *arguments, **keywords)
+            finally:
+                statistics.stop_phase()
+        return timed_method
+    return decorator
+
+
+class EngineStatistics(object):
+    """
+    Class to collect statistics of an incremental personalized page rank engine.
+
+    The engine reports every random walk it generates or continues with record_walk and every call of
+    update_random_walks with record_update. The methods of the engine that make up the phases generate, update and
+    compute are decorated with timed_phase, which reports the start and end of every call with start_phase and
+    stop_phase. Phases are nested when such methods call each other, e.g. update_random_walks calls
+    repair_random_walks, and the time of a nested phase is only added to the innermost phase, so that the phase times
+    add up to the wall time. A method of a phase called within the same phase is not counted as another call of the
+    phase. An engine without statistics only pays for one attribute lookup per random walk and per timed call.
+    If profile is true, the phases are additionally run under cProfile, so that the functions called in each phase
+    can be inspected with profile_stats.
+    """
+
+    def __init__(self, profile=False):
+        """
+        Initializes empty statistics
+        :param profile: If true, the timed phases are also run under cProfile
+        """
+        self.profiler = cProfile.Profile() if profile else None
+        self.active_phases = list()
+        self.phase_start_time = None
+        self.reset()
+
+    def reset(self):
+        """
+        Sets all counters and timers to zero
+        """
+        self.random_walks = 0
+        self.steps = 0
+        self.resets = 0
+        self.dangling_hits = 0
+        self.updates = 0
+        self.rerouted_walks = 0
+        self.truncation_positions = 0
+        self.phase_times = {phase: 0.0 for phase in PHASES}
+        self.phase_calls = {phase: 0 for phase in PHASES}
+        return
+
+    def start_phase(self, phase):
+        """
+        Starts timing a phase, pausing the phase that is running
+        :param phase: The name of the phase
+        """
+        start_time = default_timer()
+        if self.active_phases:
+            self.phase_times[self.active_phases[-1]] += start_time - self.phase_start_time
+        elif self.profiler is not None:
+            self.profiler.enable()
+        if phase not in self.active_phases:
+            self.phase_calls[phase] += 1
+        self.active_phases.append(phase)
+        self.phase_start_time = start_time
+        return
+
+    def stop_phase(self):
+        """
+        Stops timing the innermost running phase and resumes the phase it was called from
+        """
+        stop_time = default_timer()
+        self.phase_times[self.active_phases.pop()] += stop_time - self.phase_start_time
+        self.phase_start_time = stop_time
+        if not self.active_phases and self.profiler is not None:
+            self.profiler.disable()
+        return
+
+    def record_walk(self, steps, resets, dangling_hits):
+        """
+        Records a random walk that has been generated or continued
+        :param steps: The number of nodes appended to the random walk
+        :param resets: The number of times the random walk jumped back to the seed node or was terminated by a reset
+        :param dangling_hits: The number of times the random walk reached a node without outgoing edges
+        """
+        self.random_walks += 1
+        self.steps += steps
+        self.resets += resets
+        self.dangling_hits += dangling_hits
+        return
+
+    def record_update(self, truncation_positions):
+        """
+        Records a call of update_random_walks
+        :param truncation_positions: The positions from which the rerouted random walks have been recomputed
+        """
+        self.updates += 1
+        self.rerouted_walks += len(truncation_positions)
+        self.truncation_positions += sum(truncation_positions)
+        return
+
+    def stats(self):
+        """
+        :return: A dictionary of all counters, the average number of steps per random walk, rerouted random walks
+        per update and truncation position, and the wall time and number of calls of every phase
+        """
+        return {'random_walks': self.random_walks,
+                'steps': self.steps,
+                'resets': self.resets,
+                'dangling_hits': self.dangling_hits,
+                'steps_per_walk': self.steps / max(self.random_walks, 1),
+                'updates': self.updates,
+                'rerouted_walks': self.rerouted_walks,
+                'rerouted_walks_per_update': self.rerouted_walks / max(self.updates, 1),
+                'average_truncation_position': self.truncation_positions / max(self.rerouted_walks, 1),
+                'phase_times': dict(self.phase_times),
+                'phase_calls': dict(self.phase_calls)}
+
+    def profile_stats(self, sort='cumulative'):
+        """
+        :param sort: The key by which the profiled functions are sorted
+        :return: A pstats.Stats object of all profiled phases, or None if profiling is disabled
+        """
+        if self.profiler is None:
+            return None
+        return pstats.Stats(self.profiler).sort_stats(sort)
+
+    def phase_breakdown(self):
+        """
+        :return: A printable table of the wall time spent in every phase
+        """
+        total_time = sum(self.phase_times.values())
+        lines = ["{:<10}{:>8}{:>12}{:>8}".format("Phase", "Calls", "Seconds", "Share")]
+        for phase in PHASES:
+            lines.append("{:<10}{:>8}{:>12.4f}{:>7.1f}%".format(phase, self.phase_calls[phase], self.phase_times[phase],
+                                                                100 * self.phase_times[phase] / total_time
+                                                                if total_time > 0 else 0.0))
+        return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""
+The code below generates a synthetic trustchain database, so that the ingestion of the data set can be benchmarked and
+profiled without access to the real trustchain.db. The blocks table has the columns GraphReduction2 expects: type,
+tx (encoded with Encode.encode), public key, sequence number, link public key, link sequence number, previous hash,
+signature, block timestamp, insertion time and block hash.
+
+Usage:
+    python Generate_Database.py --peers 100000 --blocks 10000000 --skew 1.2 --non-bandwidth-fraction 0.1 synthetic
+"""
+from __future__ import division
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from bisect import bisect_right
+
+from Encode import encode
+
+BANDWIDTH_BLOCK_TYPE = 'tribler_bandwidth'
+OTHER_BLOCK_TYPES = ['tribler_market', 'tribler_tx', 'tribler_dht']
+GENESIS_HASH = '00' * 32
+
+CREATE_BLOCKS_TABLE = """
+CREATE TABLE IF NOT EXISTS blocks(
+ type                 TEXT NOT NULL,
+ tx                   TEXT NOT NULL,
+ public_key           TEXT NOT NULL,
+ sequence_number      INTEGER NOT NULL,
+ link_public_key      TEXT NOT NULL,
+ link_sequence_number INTEGER NOT NULL,
+ previous_hash        TEXT NOT NULL,
+ signature            TEXT NOT NULL,
+ block_timestamp      BIGINT NOT NULL,
+ insert_time          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+ block_hash           TEXT NOT NULL,
+ PRIMARY KEY (public_key, sequence_number)
+)"""
+
+
+class TrustchainGenerator(object):
+    """
+    Class to generate a synthetic trustchain database.
+
+    Every bandwidth interaction between two peers is stored as two blocks, as in the real trustchain: a proposal in
+    the chain of the peer that initiated the interaction and an agreement in the chain of its counterparty, which links
+    to the proposal. The agreement contains the same transaction seen from the counterparty, i.e. with up and down
+    swapped, so that both blocks contribute the same net flow of data and GraphReduction2 halves their sum.
+    Peers are drawn from a Zipf distribution, so that a few peers take part in most interactions, as in the real
+    network. The blocks are written in chunks, so that databases of 10 million blocks and more can be generated in
+    constant memory.
+    """
+
+    def __init__(self, number_of_peers, number_of_blocks, skew=1.0, non_bandwidth_fraction=0.0,
+                 max_transfer=100 * 1024 * 1024, start_time=1500000000000, seed=None):
+        """
+        Initializes the generator
+        :param number_of_peers: The number of peers in the network
+        :param number_of_blocks: The number of blocks in the database
+        :param skew: Exponent of the Zipf distribution from which peers are drawn, 0 for a uniform distribution
+        :param non_bandwidth_fraction: The fraction of blocks that are not bandwidth blocks
+        :param max_transfer: The maximal number of bytes uploaded or downloaded in one interaction
+        :param start_time: The timestamp of the first block in milliseconds
+        :param seed: Seed of the random number generator
+        """
+        self.number_of_peers = number_of_peers
+        self.number_of_blocks = number_of_blocks
+        self.skew = skew
+        self.non_bandwidth_fraction = non_bandwidth_fraction
+        self.max_transfer = max_transfer
+        self.start_time = start_time
+        self.rng = random.Random(seed)
+
+        self.public_keys = ['LibNaCLPK:' + hashlib.sha512('peer %d %d' % (peer, self.rng.getrandbits(64))).digest()
+                            for peer in xrange(number_of_peers)]
+        cumulated_weight = 0.0
+        self.cumulated_peer_weights = []
+        for peer in xrange(number_of_peers):
+            cumulated_weight += 1.0 / (peer + 1) ** skew
+            self.cumulated_peer_weights.append(cumulated_weight)
+
+        self.sequence_numbers = [0] * number_of_peers
+        self.previous_hashes = [GENESIS_HASH.decode('hex')] * number_of_peers
+        self.total_up = [0] * number_of_peers
+        self.total_down = [0] * number_of_peers
+        self.timestamp = start_time
+
+    def random_peer(self):
+        """
+        Draws a peer from the Zipf distribution
+        :return: The index of the peer
+        """
+        return bisect_right(self.cumulated_peer_weights, self.rng.uniform(0, self.cumulated_peer_weights[-1]))
+
+    def block(self, block_type, tx, peer, link_peer, link_sequence_number):
+        """
+        Appends a block to the chain of a peer
+        :param block_type: The type of the block
+        :param tx: The transaction as a dictionary
+        :param peer: The index of the peer in whose chain the block is stored
+        :param link_peer: The index of the counterparty of the transaction
+        :param link_sequence_number: The sequence number of the linked proposal, 0 for a proposal
+        :return: The block as a tuple of column values
+        """
+        self.sequence_numbers[peer] += 1
+        self.timestamp += self.rng.randint(0, 2000)
+        sequence_number = self.sequence_numbers[peer]
+        encoded_tx = encode(tx)
+        block_hash = hashlib.sha256('%s%s%d%s' % (encoded_tx, self.public_keys[peer], sequence_number,
+                                                   self.previous_hashes[peer])).digest()
+        block = (block_type,
+                 sqlite3.Binary(encoded_tx),
+                 sqlite3.Binary(self.public_keys[peer]),
+                 sequence_number,
+                 sqlite3.Binary(self.public_keys[link_peer]),
+                 link_sequence_number,
+                 sqlite3.Binary(self.previous_hashes[peer]),
+                 sqlite3.Binary(hashlib.sha512(block_hash).digest()),
+                 self.timestamp,
+                 time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.timestamp // 1000)),
+                 sqlite3.Binary(block_hash))
+        self.previous_hashes[peer] = block_hash
+        return block
+
+    def bandwidth_blocks(self):
+        """
+        Generates the proposal and the agreement of a bandwidth interaction between two distinct random peers
+        :return: A list of two blocks
+        """
+        peer = self.random_peer()
+        counterparty = self.random_peer()
+        while counterparty == peer and self.number_of_peers > 1:
+            counterparty = self.random_peer()
+        up = self.rng.randint(0, self.max_transfer)
+        down = self.rng.randint(0, self.max_transfer)
+
+        self.total_up[peer] += up
+        self.total_down[peer] += down
+        proposal = self.block(BANDWIDTH_BLOCK_TYPE, {'up': up, 'down': down, 'total_up': self.total_up[peer],
+                                                     'total_down': self.total_down[peer]},
+                              peer, counterparty, 0)
+        self.total_up[counterparty] += down
+        self.total_down[counterparty] += up
+        agreement = self.block(BANDWIDTH_BLOCK_TYPE, {'up': down, 'down': up,
+                                                      'total_up': self.total_up[counterparty],
+                                                      'total_down': self.total_down[counterparty]},
+                               counterparty, peer, self.sequence_numbers[peer])
+        return [proposal, agreement]
+
+    def other_block(self):
+        """
+        Generates a single block that is not a bandwidth block
+        :return: A list of one block
+        """
+        peer = self.random_peer()
+        counterparty = self.random_peer()
+        block_type = self.rng.choice(OTHER_BLOCK_TYPES)
+        return [self.block(block_type, {'payload': self.rng.getrandbits(32)}, peer, counterparty, 0)]
+
+    def blocks(self):
+        """
+        Generates all blocks of the database. Since bandwidth blocks come in pairs and other blocks come alone, a
+        single block is generated with probability 2f / (1 + f), so that a fraction f of all blocks are not bandwidth
+        blocks.
+        """
+        single_block_probability = 2 * self.non_bandwidth_fraction / (1 + self.non_bandwidth_fraction)
+        number_of_blocks = 0
+        while number_of_blocks < self.number_of_blocks:
+            if self.number_of_blocks - number_of_blocks == 1 or self.rng.uniform(0, 1) < single_block_probability:
+                blocks = self.other_block()
+            else:
+                blocks = self.bandwidth_blocks()
+            for block in blocks:
+                yield block
+            number_of_blocks += len(blocks)
+
+    def write(self, file_path, file_name, chunk_size=10000):
+        """
+        Writes the blocks to a new database file, at the location GraphReduction2 reads it from
+        :param file_path: Path of the database file
+        :param file_name: Name of the database file without '.db'
+        :param chunk_size: The number of blocks inserted per transaction
+        :return: The number of blocks written
+        """
+        database = file_path + file_name + ".db"
+        if os.path.exists(database):
+            os.remove(database)
+        conn = sqlite3.connect(database)
+        cursor = conn.cursor()
+        # The file is thrown away if generation fails, so there is no need to wait for the disk after every chunk
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute(CREATE_BLOCKS_TABLE)
+        insert = "INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+        chunk = []
+        written_blocks = 0
+        for block in self.blocks():
+            chunk.append(block)
+            if len(chunk) == chunk_size:
+                cursor.executemany(insert, chunk)
+                conn.commit()
+                written_blocks += len(chunk)
+                chunk = []
+                if written_blocks % (100 * chunk_size) == 0:
+                    print("{}/{} blocks written".format(written_blocks, self.number_of_blocks))
+        cursor.executemany(insert, chunk)
+        conn.commit()
+        written_blocks += len(chunk)
+        conn.close()
+        return written_blocks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic trustchain database")
+    parser.add_argument("file_name", help="Name of the database file without '.db'")
+    parser.add_argument("--file-path", default="")
+    parser.add_argument("--peers", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=100000)
+    parser.add_argument("--skew", type=float, default=1.0, help="Exponent of the Zipf distribution of the peers")
+    parser.add_argument("--non-bandwidth-fraction", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    arguments = parser.parse_args()
+
+    generator = TrustchainGenerator(arguments.peers, arguments.blocks, skew=arguments.skew,
+                                    non_bandwidth_fraction=arguments.non_bandwidth_fraction, seed=arguments.seed)
+    print("{} blocks written".format(generator.write(arguments.file_path, arguments.file_name)))
@@ -0,0 +1,137 @@
+"""
+The code in this file computes the global page ranks of all nodes of a graph incrementally using the Monte Carlo
+algorithm, i.e. the reputation of every peer in the network rather than from the perspective of a single peer.
+"""
+from Engine_Statistics import timed_phase
+from Page_Rank2 import IncrementalPersonalizedPageRank2
+
+
+class IncrementalGlobalPageRank(IncrementalPersonalizedPageRank2):
+    """
+    Class to incrementally compute the global page ranks of a graph, following Bahmani, Chowdhury and Goel, Fast
+    Incremental and Personalized PageRank.
+
+    Instead of starting all random walks at a seed node, walks_per_node random walks are started at every node of the
+    graph. Each random walk stops with the reset probability at every step, or at a dangling node, exactly like the
+    random walks of IncrementalPersonalizedPageRank2, and the page rank of a node is its share of the visit times of
+    all random walks. This is the page rank with damping factor 1 - reset_probability in which dangling nodes jump to
+    a uniformly random node.
+    The graph is modified with the same methods as the personalized page rank and the random walks are repaired by
+    update_random_walks through the walk index, so that the page ranks of the whole network can be kept up to date as
+    new blocks arrive without running the power iteration again. In addition, the random walks started at a removed
+    node are discarded and walks_per_node random walks are started at every added node. The positions of discarded
+    random walks in the list random_walks are set to None and reused by later random walks, so that the ids of the
+    other random walks in the walk index remain valid.
+    """
+
+    def __init__(self, graph, walks_per_node, reset_probability):
+        """
+        Initializes the global page rank
+        :param graph: The graph for which the global page ranks are computed
+        :param walks_per_node: The number of random walks starting at every node
+        :param reset_probability: The probability with which a random walk stops at every step
+        """
+        super(IncrementalGlobalPageRank, self).__init__(graph, None, walks_per_node * graph.number_of_nodes(),
+                                                        reset_probability)
+        self.walks_per_node = walks_per_node
+        self.added_nodes = list()
+        self.free_walk_ids = list()
+
+    @timed_phase('generate')
+    def initial_random_walks(self):
+        """
+        Starts walks_per_node random walks at every node. The random walks are started at the nodes in turn, so that
+        every prefix of the random walks is spread evenly over the nodes.
+        """
+        nodes = list(self.graph.nodes())
+        while len(self.random_walks) < self.number_of_random_walks:
+            self.start_random_walk(nodes[len(self.random_walks) % len(nodes)])
+        return
+
+    def start_random_walk(self, node):
+        """
+        Computes a random walk starting at node and stores it at a free position of the list random_walks
+        :param node: The node at which the random walk begins
+        """
+        random_walk = [node]
+        self.continue_random_walk(random_walk)
+        if self.free_walk_ids:
+            walk_id = self.free_walk_ids.pop()
+            self.random_walks[walk_id] = random_walk
+        else:
+            walk_id = len(self.random_walks)
+            self.random_walks.append(random_walk)
+        self.walk_index.add_walk(walk_id, random_walk)
+        self.walk_index.add_origin(walk_id, node)
+        return
+
+    def discard_random_walk(self, walk_id):
+        """
+        Removes a random walk from the walk index and frees its position in the list random_walks
+        :param walk_id: The position of the random walk in the list of random walks
+        """
+        random_walk = self.random_walks[walk_id]
+        self.walk_index.remove_walk(walk_id, random_walk)
+        self.walk_index.remove_origin(walk_id, random_walk[0])
+        self.dirty_walks.pop(walk_id, None)
+        self.random_walks[walk_id] = None
+        self.free_walk_ids.append(walk_id)
+        return
+
+    def add_node(self, node):
+        """
+        Adds a node to the graph. Its random walks are started by update_random_walks.
+        :param node: Node that is to be added
+        """
+        if node not in self.graph:
+            self.added_nodes.append(node)
+        super(IncrementalGlobalPageRank, self).add_node(node)
+        return
+
+    @timed_phase('update')
+    def update_random_walks(self):
+        """
+        Discards the random walks started at removed nodes, repairs the random walks passing through modified nodes
+        and starts walks_per_node random walks at every added node
+        :return: The number of random walks that have been recomputed, discarded or started
+        """
+        number_of_changed_walks = 0
+        for node in self.removed_nodes:
+            for walk_id in list(self.walk_index.walks_from_node(node)):
+                self.discard_random_walk(walk_id)
+                self.number_of_random_walks -= 1
+                number_of_changed_walks += 1
+        # The rank change events are emitted once for all changed random walks below, not by repair_random_walks
+        rank_events = self.rank_events
+        self.rank_events = None
+        try:
+            number_of_repaired_walks = super(IncrementalGlobalPageRank, self).update_random_walks()
+        finally:
+            self.rank_events = rank_events
+        number_of_updated_walks = number_of_changed_walks
+        if not self.lazy_repair:
+            # Random walks that are only marked dirty do not change the visit times
+            number_of_updated_walks += number_of_repaired_walks
+        number_of_changed_walks += number_of_repaired_walks
+
+        added_nodes = [node for node in self.added_nodes if node in self.graph]
+        del self.added_nodes[:]
+        for node in added_nodes:
+            if self.walk_index.walks_from_node(node):
+                continue
+            for _ in xrange(self.walks_per_node):
+                self.start_random_walk(node)
+            self.number_of_random_walks += self.walks_per_node
+            number_of_changed_walks += self.walks_per_node
+            number_of_updated_walks += self.walks_per_node
+        if self.rank_events is not None and number_of_updated_walks > 0:
+            self.rank_events.emit()
+        return number_of_changed_walks
+
+    @timed_phase('compute')
+    def compute_page_ranks(self):
+        """
+        Determines the global page ranks based on the visit times of all random walks
+        :return: A dictionary of nodes and corresponding page ranks
+        """
+        return self.compute_personalized_page_ranks()
@@ -0,0 +1,143 @@
+"""
+The code in this file computes the positions of the nodes of the neighbourhood of a peer that is displayed by the
+TrustGUI. The peer is placed at the center, its neighbours on an inner circle and the neighbours of its neighbours on
+an outer circle, next to the neighbour through which they are reached.
+"""
+from __future__ import division
+import math
+
+import networkx as nx
+import numpy as np
+
+
+def ring_layout(center, neighbours, neighbours_of_neighbours, inner_radius=20, outer_radius=40):
+    """
+    Places the nodes on concentric circles around the center node. The inner circle is divided into equal sectors, one
+    per neighbour, and the neighbours of every neighbour are spread over the sector of that neighbour on the outer
+    circle.
+    :param center: The center node
+    :param neighbours: The list of neighbours of the center node
+    :param neighbours_of_neighbours: A dictionary of neighbours and the lists of their neighbours on the outer circle
+    :param inner_radius: The radius of the inner circle
+    :param outer_radius: The radius of the outer circle
+    :return: A dictionary of nodes and their positions
+    """
+    pos = {center: np.array([0.0, 0.0])}
+    if not neighbours:
+        return pos
+    angle_first_circle = (2 * np.pi) / len(neighbours)
+    for i, node in enumerate(neighbours):
+        pos[node] = np.array([np.cos(angle_first_circle * i) * inner_radius,
+                              np.sin(angle_first_circle * i) * inner_radius])
+    for i, node1 in enumerate(neighbours):
+        outer_nodes = neighbours_of_neighbours.get(node1, [])
+        if not outer_nodes:
+            continue
+        angle_second_circle = angle_first_circle / len(outer_nodes)
+        for j, node2 in enumerate(outer_nodes):
+            angle = angle_second_circle * j + angle_first_circle * i - angle_first_circle / 2
+            pos[node2] = np.array([np.cos(angle) * outer_radius, np.sin(angle) * outer_radius])
+    return pos
+
+
+class LayoutCache(object):
+    """
+    Class to compute the layout of the neighbourhood of a peer once per version of the neighbourhood.
+
+    The layout of a neighbourhood is cached under its center node, together with the nodes and edges it was computed
+    for. Showing the same neighbourhood again, e.g. when switching views or after the page ranks have been updated,
+    returns the cached positions without any computation. If the neighbourhood has changed, the nodes that were
+    already displayed keep their positions, so that the picture does not jump around, and only the new nodes are
+    placed: first on the circle they belong to, at the mean angle of their displayed neighbours, and then by a short
+    force-directed relaxation of the new nodes alone, in which all other nodes are fixed. Nodes for which the ring
+    layout has no position are placed in the same way.
+    """
+
+    def __init__(self, inner_radius=20, outer_radius=40, iterations=20):
+        """
+        Initializes an empty cache
+        :param inner_radius: The radius of the circle of neighbours
+        :param outer_radius: The radius of the circle of neighbours of neighbours
+        :param iterations: The number of iterations of the force-directed relaxation of new nodes
+        """
+        self.inner_radius = inner_radius
+        self.outer_radius = outer_radius
+        self.iterations = iterations
+        self.layouts = dict()
+        self.computations = 0
+
+    def layout(self, sub_graph, center, neighbours, neighbours_of_neighbours):
+        """
+        Returns the positions of the nodes of a neighbourhood, computing them only if the neighbourhood has changed
+        :param sub_graph: The graph of the neighbourhood
+        :param center: The center node
+        :param neighbours: The list of neighbours of the center node
+        :param neighbours_of_neighbours: A dictionary of neighbours and the lists of their neighbours on the outer
+        circle
+        :return: A dictionary of nodes and their positions
+        """
+        version = (frozenset(sub_graph.nodes()), frozenset(sub_graph.edges()))
+        cached = self.layouts.get(center)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        self.computations += 1
+        if cached is None:
+            pos = ring_layout(center, neighbours, neighbours_of_neighbours, self.inner_radius, self.outer_radius)
+            pos = {node: position for node, position in pos.iteritems() if node in sub_graph}
+        else:
+            pos = {node: position for node, position in cached[1].iteritems() if node in sub_graph}
+            pos[center] = np.array([0.0, 0.0])
+        new_nodes = [node for node in sub_graph.nodes() if node not in pos]
+        if new_nodes:
+            pos = self.place_new_nodes(sub_graph, pos, new_nodes, set(neighbours))
+        self.layouts[center] = (version, pos)
+        return pos
+
+    def place_new_nodes(self, sub_graph, pos, new_nodes, neighbours):
+        """
+        Places new nodes on their circle and relaxes them with the spring layout, keeping all other nodes fixed
+        :param sub_graph: The graph of the neighbourhood
+        :param pos: The positions of the nodes that are already placed
+        :param new_nodes: The nodes without a position
+        :param neighbours: The set of neighbours of the center node
+        :return: The positions of all nodes
+        """
+        undirected = sub_graph.to_undirected(as_view=True)
+        pos = dict(pos)
+        for k, node in enumerate(new_nodes):
+            radius = self.inner_radius if node in neighbours else self.outer_radius
+            placed_neighbours = [pos[neighbour] for neighbour in undirected[node] if neighbour in pos and
+                                 np.any(pos[neighbour])]
+            if placed_neighbours:
+                mean = np.mean(placed_neighbours, axis=0)
+                angle = math.atan2(mean[1], mean[0])
+            else:
+                # Spread unconnected new nodes by the golden angle
+                angle = k * math.pi * (3 - math.sqrt(5))
+            pos[node] = np.array([math.cos(angle) * radius, math.sin(angle) * radius])
+
+        # Only the new nodes and the nodes they are connected to take part in the relaxation
+        local_nodes = set(new_nodes)
+        for node in new_nodes:
+            local_nodes.update(undirected[node])
+        fixed = [node for node in local_nodes if node not in new_nodes]
+        if not fixed:
+            return pos
+        local_graph = undirected.subgraph(local_nodes)
+        relaxed = nx.spring_layout(local_graph, k=self.outer_radius / max(math.sqrt(len(local_nodes)), 1),
+                                   pos={node: pos[node] for node in local_nodes}, fixed=fixed,
+                                   iterations=self.iterations, weight=None)
+        for node in new_nodes:
+            pos[node] = relaxed[node]
+        return pos
+
+    def invalidate(self, center=None):
+        """
+        Removes the layout of a center node from the cache, or all layouts if center is None
+        """
+        if center is None:
+            self.layouts.clear()
+        else:
+            self.layouts.pop(center, None)
+        return
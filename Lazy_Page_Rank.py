@@ -0,0 +1,138 @@
+"""
+The code in this file answers page rank queries of an incremental personalized page rank engine whose random walks are
+only repaired when their page ranks are queried.
+"""
+from __future__ import division
+import time
+
+
+class LazyPageRank(object):
+    """
+    Class to repair the random walks of an incremental personalized page rank engine lazily, driven by the queries.
+
+    Modifications of the graph are applied to the graph of the engine immediately, and the random walks they affect are
+    marked dirty through the walk index by update_random_walks, once for all modifications since the last call. Every
+    query calls update_random_walks first, but no random walk is recomputed until the page ranks are queried:
+        - compute_personalized_page_ranks repairs all dirty random walks and returns the exact page ranks of the
+          random walks, exactly as if update_random_walks had been called after every batch of modifications,
+        - page_ranks_of only repairs the dirty random walks passing through the queried nodes, so that the visits of
+          the queried nodes by random walks that are about to be recomputed are not counted. The visits that the
+          other dirty random walks would make after their repair are only counted by the next full query.
+    A random walk that is affected by several batches of modifications before it is queried is only recomputed once,
+    and random walks that are never queried are never recomputed until the next full query.
+    If max_staleness is set, the page ranks of the last full query, the last clean snapshot, are served for
+    max_staleness seconds without repairing any random walk.
+    """
+
+    def __init__(self, page_rank, max_staleness=None):
+        """
+        Initializes the lazy page rank and switches the engine to lazy repair
+        :param page_rank: The incremental personalized page rank engine whose random walks are repaired lazily
+        :param max_staleness: Number of seconds for which the last clean snapshot is served, None to always repair
+        the dirty random walks of a query
+        """
+        self.page_rank = page_rank
+        self.page_rank.lazy_repair = True
+        self.max_staleness = max_staleness
+
+        self.snapshot = None
+        self.snapshot_time = None
+        self.marked_walks = 0
+        self.repaired_walks = 0
+
+    def add_edge(self, source, destination, weight):
+        """
+        Applies the addition of an edge, see IncrementalPersonalizedPageRank2.add_edge
+        """
+        self.page_rank.add_edge(source, destination, weight)
+
+    def add_weight_to_edge(self, source, destination, weight):
+        """
+        Applies a change of the weight of an edge, see IncrementalPersonalizedPageRank2.add_weight_to_edge
+        """
+        self.page_rank.add_weight_to_edge(source, destination, weight)
+
+    def remove_edge(self, source, destination):
+        """
+        Applies the removal of an edge, see IncrementalPersonalizedPageRank2.remove_edge
+        """
+        self.page_rank.remove_edge(source, destination)
+
+    def add_node(self, node):
+        """
+        Applies the addition of a node, see IncrementalPersonalizedPageRank2.add_node
+        """
+        self.page_rank.add_node(node)
+
+    def remove_node(self, node):
+        """
+        Applies the removal of a node, see IncrementalPersonalizedPageRank2.remove_node
+        """
+        self.page_rank.remove_node(node)
+
+    def update_random_walks(self):
+        """
+        Marks the random walks affected by all modifications of the engine since the last call dirty, as one batch
+        :return: The number of random walks that have been marked dirty
+        """
+        number_of_marked_walks = self.page_rank.update_random_walks()
+        self.marked_walks += number_of_marked_walks
+        return number_of_marked_walks
+
+    def is_fresh(self):
+        """
+        :return: True if the last clean snapshot is at most max_staleness seconds old and may be served
+        """
+        return self.max_staleness is not None and self.snapshot is not None and \
+            time.time() - self.snapshot_time <= self.max_staleness
+
+    def compute_personalized_page_ranks(self):
+        """
+        Repairs all dirty random walks and takes a clean snapshot of the page ranks, unless the last clean snapshot
+        may be served
+        :return: A dictionary of nodes and corresponding page ranks
+        """
+        if self.is_fresh():
+            return dict(self.snapshot)
+        self.update_random_walks()
+        self.repaired_walks += self.page_rank.repair_random_walks()
+        self.snapshot = self.page_rank.compute_personalized_page_ranks()
+        self.snapshot_time = time.time()
+        return dict(self.snapshot)
+
+    def page_ranks_of(self, nodes):
+        """
+        Repairs the dirty random walks passing through the given nodes and determines the page ranks of these nodes,
+        unless the last clean snapshot may be served
+        :param nodes: The queried nodes
+        :return: A dictionary of the queried nodes and their page ranks
+        """
+        if self.is_fresh():
+            return {node: self.snapshot.get(node, 0) for node in nodes}
+        self.update_random_walks()
+        walk_index = self.page_rank.walk_index
+        dirty_walks = set()
+        for node in nodes:
+            dirty_walks.update(walk_id for walk_id in walk_index.walks_through_node(node)
+                               if walk_id in self.page_rank.dirty_walks)
+        self.repaired_walks += self.page_rank.repair_random_walks(dirty_walks)
+        if walk_index.total_visit_times == 0:
+            return dict.fromkeys(nodes, 0)
+        return {node: walk_index.visit_times.get(node, 0) / walk_index.total_visit_times if node in self.page_rank.graph
+                else 0 for node in nodes}
+
+    def page_rank_of(self, node):
+        """
+        :return: The page rank of a single node, see page_ranks_of
+        """
+        return self.page_ranks_of([node])[node]
+
+    def metrics(self):
+        """
+        :return: A dictionary with the total number of random walks marked dirty and repaired, the number of random
+        walks that are currently dirty and the age of the last clean snapshot in seconds, None if there is none
+        """
+        return {'marked_walks': self.marked_walks,
+                'repaired_walks': self.repaired_walks,
+                'dirty_walks': len(self.page_rank.dirty_walks),
+                'snapshot_age': time.time() - self.snapshot_time if self.snapshot_time is not None else None}
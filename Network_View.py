@@ -0,0 +1,187 @@
+"""
+The code in this file draws the neighbourhood of a peer with a fixed set of matplotlib artists, so that the TrustGUI
+can highlight peers and recolour them after the page ranks have been updated without drawing the network again.
+"""
+from __future__ import division
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
+
+# Page ranks below UNTRUSTED_RANK are drawn red, above TRUSTED_RANK green and in between yellow
+UNTRUSTED_RANK = 0.0001
+TRUSTED_RANK = 0.0005
+
+
+def trust_colors(page_ranks, nodes):
+    """
+    Determines the colour of every node by its page rank
+    :param page_ranks: A dictionary of nodes and corresponding page ranks
+    :param nodes: The list of nodes
+    :return: A list of colour names, one per node
+    """
+    colors = []
+    for node in nodes:
+        page_rank = page_ranks.get(node, 0)
+        if page_rank < UNTRUSTED_RANK:
+            colors.append('red')
+        elif page_rank > TRUSTED_RANK:
+            colors.append('green')
+        else:
+            colors.append('yellow')
+    return colors
+
+
+class NetworkView(object):
+    """
+    Class to draw a network on a matplotlib axes with one PathCollection for all nodes and one LineCollection for all
+    edges.
+
+    The artists are created once per neighbourhood by draw. Changing the colours of the nodes or highlighting some
+    nodes and edges only changes the colour arrays of the existing collections. If the canvas supports blitting, the
+    collections are animated, i.e. left out of full draws of the canvas, the background of the axes is saved after
+    every full draw and an update only restores the background and draws the collections again. Otherwise an update
+    asks the canvas for a full draw when it is idle.
+    If the neighbourhood has more than max_edges edges, only the edges incident to the center node and the heaviest
+    remaining edges up to max_edges are drawn, since thousands of overlapping lines are indistinguishable anyway.
+    """
+
+    def __init__(self, axes, max_edges=5000, node_size=50, edge_width=0.05, dimmed_alpha=0.1):
+        """
+        Initializes an empty view
+        :param axes: The matplotlib axes on which the network is drawn
+        :param max_edges: The maximal number of edges drawn
+        :param node_size: The size of the nodes
+        :param edge_width: The width of the edges
+        :param dimmed_alpha: The alpha of nodes and edges that are not highlighted
+        """
+        self.axes = axes
+        self.canvas = axes.figure.canvas
+        self.max_edges = max_edges
+        self.node_size = node_size
+        self.edge_width = edge_width
+        self.dimmed_alpha = dimmed_alpha
+
+        self.nodes = []
+        self.node_ids = dict()
+        self.edges = []
+        self.node_colors = np.zeros((0, 4))
+        self.node_collection = None
+        self.edge_collection = None
+        self.highlighted_edge_collection = None
+        self.blit = getattr(self.canvas, 'supports_blit', False)
+        self.background = None
+        self.draw_event = self.canvas.mpl_connect('draw_event', self.save_background)
+
+    def draw(self, graph, pos, colors, center=None, labels=None):
+        """
+        Creates the artists of a network
+        :param graph: The graph of the network
+        :param pos: A dictionary of nodes and their positions
+        :param colors: A list of colours, one per node in the order of graph.nodes()
+        :param center: The center node, whose edges are never culled
+        :param labels: A dictionary of nodes and their labels
+        """
+        self.axes.cla()
+        self.axes.set_axis_off()
+        self.nodes = list(graph.nodes())
+        self.node_ids = {node: node_id for node_id, node in enumerate(self.nodes)}
+        self.edges = self.cull_edges(graph, center)
+
+        node_positions = np.array([pos[node] for node in self.nodes], dtype=float).reshape(-1, 2)
+        self.node_colors = to_rgba_array(colors) if len(colors) else np.zeros((0, 4))
+        self.edge_collection = LineCollection([(pos[u], pos[v]) for u, v in self.edges], colors='k',
+                                              linewidths=self.edge_width, animated=self.blit)
+        self.axes.add_collection(self.edge_collection)
+        self.highlighted_edge_collection = LineCollection([], colors='k', linewidths=4 * self.edge_width,
+                                                          animated=self.blit)
+        self.axes.add_collection(self.highlighted_edge_collection)
+        self.node_collection = self.axes.scatter(node_positions[:, 0], node_positions[:, 1], s=self.node_size,
+                                                 c=self.node_colors, animated=self.blit, zorder=2)
+        for node, label in (labels or {}).iteritems():
+            self.axes.text(pos[node][0], pos[node][1], label, horizontalalignment='center',
+                           verticalalignment='center')
+        if len(node_positions):
+            self.axes.update_datalim(node_positions)
+        self.axes.autoscale_view()
+        self.background = None
+        self.canvas.draw_idle()
+        return
+
+    def cull_edges(self, graph, center):
+        """
+        Selects the edges that are drawn
+        :param graph: The graph of the network
+        :param center: The center node
+        :return: A list of edges
+        """
+        if graph.number_of_edges() <= self.max_edges:
+            return list(graph.edges())
+        center_edges = [(u, v) for u, v in graph.edges() if u == center or v == center]
+        other_edges = sorted(((u, v) for u, v in graph.edges() if u != center and v != center),
+                             key=lambda edge: -graph[edge[0]][edge[1]].get('weight', 1))
+        return center_edges + other_edges[:max(self.max_edges - len(center_edges), 0)]
+
+    def set_colors(self, colors):
+        """
+        Changes the colours of all nodes, keeping their alpha
+        :param colors: A list of colours, one per node in the order in which the nodes were drawn
+        """
+        alpha = self.node_colors[:, 3].copy()
+        self.node_colors = to_rgba_array(colors) if len(colors) else np.zeros((0, 4))
+        self.node_colors[:, 3] = alpha
+        self.node_collection.set_facecolors(self.node_colors)
+        self.update()
+        return
+
+    def highlight(self, nodes=None, edges=None):
+        """
+        Draws the given nodes and edges opaque and all other nodes and edges transparent
+        :param nodes: The highlighted nodes, None to draw all nodes and edges opaque
+        :param edges: The highlighted edges, which are drawn thicker
+        """
+        if nodes is None:
+            self.node_colors[:, 3] = 1
+            self.edge_collection.set_alpha(1)
+        else:
+            self.node_colors[:, 3] = self.dimmed_alpha
+            self.node_colors[[self.node_ids[node] for node in nodes if node in self.node_ids], 3] = 1
+            self.edge_collection.set_alpha(self.dimmed_alpha)
+        self.node_collection.set_facecolors(self.node_colors)
+        positions = self.node_collection.get_offsets()
+        self.highlighted_edge_collection.set_segments([(positions[self.node_ids[u]], positions[self.node_ids[v]])
+                                                       for u, v in edges or [] if u in self.node_ids and
+                                                       v in self.node_ids])
+        self.update()
+        return
+
+    def save_background(self, event=None):
+        """
+        Saves the axes without the collections after a full draw of the canvas and draws the collections on top
+        """
+        if self.node_collection is None or not self.blit:
+            return
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.draw_collections()
+        return
+
+    def draw_collections(self):
+        self.axes.draw_artist(self.edge_collection)
+        self.axes.draw_artist(self.highlighted_edge_collection)
+        self.axes.draw_artist(self.node_collection)
+        return
+
+    def update(self):
+        """
+        Shows the changed collections, by blitting if possible
+        """
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_collections()
+        self.canvas.blit(self.axes.bbox)
+        return
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self.draw_event)
+        return
@@ -7,6 +7,8 @@ import time
 
 import networkx as nx
 from Encode import decode
+from Sliding_Window import SlidingWindow, WindowGraph
+from Time_Decay import TimeDecay
 
 
 class GraphReduction2(object):
@@ -21,17 +23,35 @@ class GraphReduction2(object):
 	the net flow of data in between these peers. The direction of an edge is determined by the sign of the net flow,
 	i.e. if a has transferred 3GB to b and b has transferred 1GB to a, then the graph will have a directed edge from
 	a to b of weight 2GB.
+	If a decay rate is given, the data transferred in a block is weighted by its age at the time of the latest block,
+	exp(-decay_rate * age), so that recent interactions count more than old ones. The weights are kept with the global
+	scale factor of a TimeDecay, which can be used to add later interactions in the same units, once its rescale
+	function has been replaced by the rescale_weights method of the page rank engine that uses the graph.
+	If a window is given instead, every block is fed into a SlidingWindow, so that the graph only contains the net
+	flows of the blocks of the last window milliseconds before the latest block. The page rank engine that uses the
+	graph is then attached to the window, which keeps expiring old blocks as later interactions are added to it.
 	"""
 
-	def __init__(self, file_path, file_name):
+	def __init__(self, file_path, file_name, decay_rate=None, window=None, bucket_size=None):
 		"""
 		Initializes Graph Reduction Class
 		:param file_path: Path of database file
 		:param file_name: Name of database file
+		:param decay_rate: Decay rate of the net flows per millisecond of the block timestamps, None to weight all
+		blocks equally
+		:param window: Length of the sliding window in milliseconds of the block timestamps, None to keep all blocks
+		:param bucket_size: Length of a bucket of the sliding window in milliseconds, None for a hundredth of the window
 		"""
+		if decay_rate is not None and window is not None:
+			raise ValueError("A decay rate and a window cannot be combined")
 		self.file_path = file_path
 		self.file_name = file_name
 		self.graph = nx.DiGraph()
+		self.decay_rate = decay_rate
+		self.time_decay = None
+		self.sliding_window = None
+		if window is not None:
+			self.sliding_window = SlidingWindow(WindowGraph(self.graph), window, bucket_size, self.graph)
 		print("graphreduction instantiated")
 
 	def open_data_set(self):
@@ -53,6 +73,9 @@ class GraphReduction2(object):
 
 		# Dict where all the edges will be stored
 		edges = {}
+		latest_time_stamp = None
+		if self.decay_rate is not None:
+			self.time_decay = TimeDecay(self.decay_rate, lambda factor: self.rescale_edges(edges, factor))
 		while raw_block is not None:
 			if (round_count % 5000) == 0:
 				print("{} blocks parsed, {} bloccks skipped, at {} blocks/seconds".format(round_count, skipped_blocks,
@@ -93,6 +116,18 @@ class GraphReduction2(object):
 			else:
 				size = block["tx"]["up"] - block["tx"]["down"]
 
+			if self.sliding_window is not None:
+				# Both parties of an interaction sign a block, hence every block carries half of the net flow
+				self.sliding_window.add_interaction(block["public key"], block["counter public key"], size / 2.0,
+													block["block time_stamp"])
+				raw_block = cursor.fetchone()
+				round_count += 1
+				continue
+
+			if self.time_decay is not None:
+				size = self.time_decay.contribution(size, block["block time_stamp"])
+				latest_time_stamp = max(latest_time_stamp, block["block time_stamp"])
+
 			try:
 				new_size = edges[block["public key"]][block["counter public key"]] + size
 				edges[block["public key"]][block["counter public key"]] = new_size
@@ -105,6 +140,11 @@ class GraphReduction2(object):
 			raw_block = cursor.fetchone()
 			round_count += 1
 
+		if self.time_decay is not None and latest_time_stamp is not None:
+			# Afterwards the weights are the decayed net flows at the time of the latest block
+			self.time_decay.renormalize(latest_time_stamp)
+			self.time_decay.rescale = self.rescale_graph
+
 		current_node = 1
 		total_nodes = len(edges)
 
@@ -122,6 +162,26 @@ class GraphReduction2(object):
 			current_node += 1
 		return
 
+	def rescale_edges(self, edges, factor):
+		"""
+		Multiplies the net flows of all pairs of peers by the same factor
+		:param edges: Dictionary of peers and dictionaries of their counterparties and net flows
+		:param factor: The factor
+		"""
+		for counterparties in edges.itervalues():
+			for counterparty in counterparties:
+				counterparties[counterparty] *= factor
+		return
+
+	def rescale_graph(self, factor):
+		"""
+		Multiplies the weights of all edges of the graph by the same factor
+		:param factor: The factor
+		"""
+		for source, destination, data in self.graph.edges(data=True):
+			data['weight'] *= factor
+		return
+
 	def generate_graph(self):
 		print("Generating graph")
 		return self.graph
@@ -5,9 +5,12 @@ The code in this file computes the PageRanks using the Monte Carlo algorithm.
 import networkx as nx
 import random
 from numpy import cumsum, array
+from Alias_Table import AliasTable
+from Engine_Statistics import timed_phase
+from Page_Rank_Base import IncrementalPageRankBase
 
 
-class IncrementalPersonalizedPageRank(object):
+class IncrementalPersonalizedPageRank(IncrementalPageRankBase):
     """
     Class to incrementally compute the personalized page ranks of a graph from the perspective of a predetermined
     node in the graph.
@@ -29,9 +32,14 @@ class IncrementalPersonalizedPageRank(object):
     that a given random walk does not pass through every single edge. Only random walks that reach a node for which
     the outgoing edges have been modified, i.e. an edge is added or removed, or the weight of an edge is changed,
     need to be recomputed, starting from the first node for which such changes have occurred.
+    Instead of a single seed node the random walks can be started and reset at a weighted set of trusted nodes, the
+    personalization. Every start and reset node is then drawn from the personalization with an alias table. Since a
+    random walk of fixed length is reset many times, the positions of all drawn nodes are kept in origin_positions
+    and the drawn nodes are recorded in the walk index as the origins of the random walk.
     """
 
-    def __init__(self, graph, node, number_of_random_walks, reset_probability, random_walk_length):
+    def __init__(self, graph, node, number_of_random_walks, reset_probability, random_walk_length,
+                 personalization=None):
         """
         Initializes the incremental personalized page rank class by determining the graph, the seed node, the number
         of random walks, the reset probability and the length of each random walk.
@@ -41,24 +49,13 @@ class IncrementalPersonalizedPageRank(object):
         :param number_of_random_walks: The number of random walks starting at the seed node
         :param reset_probability: The probability with which a random walk jumps back to the seed node
         :param random_walk_length: The number of nodes each random walk goes through before it's terminated
+        :param personalization: A dictionary of nodes and weights with which the random walks start and are reset at
+        them, None to start and reset all random walks at the seed node
         """
-        self.graph = graph
-        self.node = node
-        self.number_of_random_walks = number_of_random_walks
-        self.reset_probability = reset_probability
+        super(IncrementalPersonalizedPageRank, self).__init__(graph, node, number_of_random_walks, reset_probability,
+                                                              personalization)
         self.random_walk_length = random_walk_length
-
-        self.random_walks = list()
-        self.added_edges = list()
-        self.removed_edges = list()
-
-    def initial_random_walks(self):
-        """
-        Initiates the random_walk_from_node function starting from the seed node, number_of_random_walks times
-        """
-        while len(self.random_walks) < self.number_of_random_walks:
-            self.regular_random_walk(self.node)
-        return
+        self.origin_positions = list()
 
     def regular_random_walk(self, node):
         """
@@ -66,25 +63,12 @@ class IncrementalPersonalizedPageRank(object):
         :param node: The node at which the random walk begins
         """
         random_walk = [node]
-        while len(random_walk) < self.random_walk_length:
-            c = random.uniform(0, 1)
-            if len(list(self.graph.neighbors(random_walk[-1]))) > 0 and c > self.reset_probability:
-                current_node = random_walk[-1]
-                current_neighbors = list(self.graph.neighbors(current_node))
-                current_edge_weights = array(
-                    [self.graph[current_node][neighbor]['weight'] for neighbor in current_neighbors])
-                cumulated_edge_weights = cumsum(current_edge_weights)
-                if cumulated_edge_weights[-1] == 0:
-                    random_walk.append(self.node)
-                    continue
-                random_id = list(
-                    cumulated_edge_weights < (random.uniform(0, 1) * cumulated_edge_weights[-1])).index(
-                    False)
-                next_node = current_neighbors[random_id]
-                random_walk.append(next_node)
-            else:
-                random_walk.append(self.node)
+        origins = [0]
+        self.continue_random_walk(random_walk, origins)
+        self.add_origins(len(self.random_walks), random_walk, origins)
+        self.walk_index.add_walk(len(self.random_walks), random_walk)
         self.random_walks.append(random_walk)
+        self.origin_positions.append(origins)
         return
 
     def add_random_walk(self, previous_random_walk):
@@ -95,281 +79,68 @@ class IncrementalPersonalizedPageRank(object):
         :param previous_random_walk: A random walk segment which is not as long as random_walk_length
         """
         random_walk = previous_random_walk
-        while len(random_walk) < self.random_walk_length:
-            c = random.uniform(0, 1)
-            if len(list(self.graph.neighbors(random_walk[-1]))) > 0 and c > self.reset_probability:
-                current_node = random_walk[-1]
-                current_neighbors = list(self.graph.neighbors(current_node))
-                current_edge_weights = array(
-                    [self.graph[current_node][neighbor]['weight'] for neighbor in current_neighbors])
-                cumulated_current_edge_weights = cumsum(current_edge_weights)
-                if cumulated_current_edge_weights[-1] == 0:
-                    random_walk.append(self.node)
-                    continue
-                random_id = list(
-                    cumulated_current_edge_weights < (random.uniform(0, 1) * cumulated_current_edge_weights[-1])).index(
-                    False)
-                next_node = current_neighbors[random_id]
-                random_walk.append(next_node)
-            else:
-                random_walk.append(self.node)
+        origins = [0]
+        self.continue_random_walk(random_walk, origins)
+        self.add_origins(len(self.random_walks), random_walk, origins)
+        self.walk_index.add_walk(len(self.random_walks), random_walk)
         self.random_walks.append(random_walk)
+        self.origin_positions.append(origins)
         return
 
-    def compute_personalized_page_ranks(self):
-        """
-        Determines the personalized page ranks based the random walks in the list random_walks
-        :return: A dictionary of nodes and corresponding page ranks
-        """
-        zeros = [0 for _ in range(len(list(self.graph.nodes)))]
-        page_ranks = dict(zip(list(self.graph.nodes), zeros))
-        visit_times = dict(zip(list(self.graph.nodes), zeros))
-        nodes_in_random_walks = []
-        for random_walk in self.random_walks:
-            nodes_in_random_walks.extend(random_walk)
-        for node in self.graph.nodes:
-            visit_times[node] = nodes_in_random_walks.count(node)
-        for node in self.graph.nodes:
-            try:
-                page_ranks[node] = float(visit_times[node]) / sum(visit_times.values())
-            except ZeroDivisionError:
-                print "List of visit times is empty..."
-        return page_ranks
-
-    def add_edge(self, source, destination, weight):
+    def add_origins(self, walk_id, random_walk, origins, start=0):
         """
-        Adds an edge to the graph. Then adds the edge to the list added_edges
-        :param source: source node
-        :param destination: destination node
-        :param weight: weight of the edge
+        Records the nodes drawn from the personalization at the given positions of a random walk in the walk index
+        :param walk_id: The position of the random walk in the list of random walks
+        :param random_walk: The random walk
+        :param origins: The positions of the drawn nodes in the random walk
+        :param start: The number of positions that are already recorded
         """
-        if weight == 0 or source not in self.graph or destination not in self.graph:
-            return
-        if self.graph.has_edge(source, destination):
-            self.add_weight_to_edge(source, destination, weight)
-        elif self.graph.has_edge(destination, source):
-            self.add_weight_to_edge(destination, source, -weight)
-        else:
-            if weight > 0:
-                edge = (source, destination, weight)
-            elif weight < 0:
-                edge = (destination, source, -weight)
-            self.graph.add_weighted_edges_from([edge])
-            self.added_edges.append(edge)
-
-    def add_weight_to_edge(self, source, destination, weight):
-        """
-        Takes an existing edge and updates its weight. Then adds the edge to the list added_edges
-        :param source: source node of the edge
-        :param destination: destination node of the edge
-        :param weight: weight added to the edge
-        """
-        if weight == 0:
-            return
-        if self.graph.has_edge(source, destination):
-            self.graph[source][destination]['weight'] += weight
-            if self.graph[source][destination]['weight'] < 0:
-                edge = (destination, source, -self.graph[source][destination]['weight'])
-                self.graph.remove_edge(source, destination)
-                self.graph.add_weighted_edges_from([edge])
-                self.removed_edges.append((source, destination))
-                self.added_edges.append(edge)
-            elif self.graph[source][destination]['weight'] > 0:
-                edge = (source, destination, self.graph[source][destination]['weight'])
-                self.graph.remove_edge(source, destination)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-            elif self.graph[source][destination]['weight'] == 0:
-                self.graph.remove_edge(source, destination)
-                self.removed_edges.append((source, destination))
-
-        elif self.graph.has_edge(destination, source):
-            self.graph[destination][source]['weight'] -= weight
-            if self.graph[destination][source]['weight'] < 0:
-                edge = (source, destination, -self.graph[destination][source]['weight'])
-                self.graph.remove_edge(destination, source)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-                self.removed_edges.append((destination, source))
-            elif self.graph[destination][source]['weight'] > 0:
-                edge = (destination, source, self.graph[destination][source]['weight'])
-                self.graph.remove_edge(destination, source)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-            elif self.graph[destination][source]['weight'] == 0:
-                self.graph.remove_edge(destination, source)
-                self.removed_edges.append((destination, source))
-        else:
-            self.add_edge(source, destination, weight)
+        for position in origins[start:]:
+            self.walk_index.add_origin(walk_id, random_walk[position])
         return
 
-    def remove_edge(self, source, destination):
+    def truncate_random_walk(self, walk_id, position):
         """
-        Removes an edge from the graph and adds it to the list added_edges
-        :param source: source node of the edge
-        :param destination: destination node of the edge
+        Removes all nodes of a random walk from a position on, from the random walk and from the walk index
+        :param walk_id: The position of the random walk in the list of random walks
+        :param position: The position of the first node that is removed
         """
-        if self.graph.has_edge(source, destination):
-            edge = (source, destination)
-            self.graph.remove_edge(source, destination)
-            self.removed_edges.append(edge)
-        elif self.graph.has_edge(destination, source):
-            edge = (destination, source)
-            self.graph.remove_edge(destination, source)
-            self.removed_edges.append(edge)
+        random_walk = self.random_walks[walk_id]
+        origins = self.origin_positions[walk_id]
+        while origins and origins[-1] >= position:
+            self.walk_index.remove_origin(walk_id, random_walk[origins.pop()])
+        self.walk_index.remove_walk(walk_id, random_walk, position)
+        del random_walk[position:]
         return
 
-    def add_node(self, node):
-        """
-        Adds a node to the graph
-        :param node: Node that is to be added
-        """
-        if node not in self.graph.nodes:
-            self.graph.add_node(node)
-        else:
-            print "node already in graph"
+    def restart_random_walk(self, walk_id):
+        """
+        Recomputes a random walk whose origin has been removed from a node drawn from the personalization. If the
+        removed node is the only node of the personalization, the random walk only consists of it and adds nothing to
+        the page ranks.
+        :param walk_id: The position of the random walk in the list of random walks
+        """
+        random_walk = self.random_walks[walk_id]
+        origins = self.origin_positions[walk_id]
+        self.truncate_random_walk(walk_id, 0)
+        origins.append(0)
+        random_walk.append(self.personalization_table.sample())
+        if random_walk[0] in self.graph:
+            self.continue_random_walk(random_walk, origins)
+        self.add_origins(walk_id, random_walk, origins)
+        self.walk_index.add_walk(walk_id, random_walk)
         return
 
-    def remove_node(self, node):
+    def continue_random_walk(self, random_walk, origins=None):
         """
-        Removes a node from the graph
-        :param node: node that is to be removed
+        Continues a random walk from its final node, appending all nodes it passes through, until it consists of
+        random_walk_length nodes
+        :param random_walk: The random walk that is continued
+        :param origins: A list to which the positions of the nodes drawn from the personalization are appended
         """
-        if node in self.graph.nodes:
-            for predecessor in self.graph.predecessors(node):
-                if (predecessor, node) not in self.removed_edges:
-                    self.removed_edges.append((predecessor, node))
-                if (predecessor, node) in self.added_edges:
-                    self.added_edges.remove((predecessor, node))
-            for successor in self.graph.successors(node):
-                if (node, successor) in self.added_edges:
-                    self.added_edges.remove((node, successor))
-                if (node, successor) not in self.removed_edges:
-                    self.removed_edges.append((node, successor))
-        for edge in reversed(self.removed_edges):
-            if edge[0] == node:
-                self.removed_edges.remove(edge)
-        for edge in reversed(self.added_edges):
-            if edge[0] == node:
-                self.added_edges.remove(edge)
-
-            self.graph.remove_node(node)
-        return
-
-    """def update_graph(self, new_graph):
-        
-        Takes a modification of the current graph and updates the lists added_edges and removed_edges
-        :param new_graph: Modified version of the original graph
-        
-        old_edges = nx.get_edge_attributes(self.graph, 'weight').items()
-        new_edges = nx.get_edge_attributes(new_graph, 'weight').items()
-        for edge in list(set(new_edges) - set(old_edges)):
-            self.add_edge(edge[0][0], edge[0][1], edge[1])"""
-
-    def update_random_walks(self):
-        """
-        Takes the lists added_edges and removed_edges and recomputes all random walks that have traversed these
-        edges, starting from their respective source nodes. The new random walks then replace the old ones in the
-        list random_walks. Finally the edges are removed from the lists added_edges and removed_edges
-        """
-        for edge in reversed(self.added_edges):
-            self.added_edges.remove(edge)
-            random_walks_to_change = [random_walk for random_walk in self.random_walks if edge[0] in random_walk]
-            for random_walk in random_walks_to_change:
-                self.random_walks.remove(random_walk)
-                del random_walk[random_walk.index(edge[0])+1:]
-                self.add_random_walk(random_walk)
-
-        for edge in reversed(self.removed_edges):
-            self.removed_edges.remove(edge)
-            random_walks_to_change = [random_walk for random_walk in self.random_walks if edge[0] in random_walk]
-            for random_walk in random_walks_to_change:
-                self.random_walks.remove(random_walk)
-                del random_walk[random_walk.index(edge[0]) + 1:]
-                self.add_random_walk(random_walk)
-        return
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-"""
-The code in this file computes the PageRanks using the Monte Carlo algorithm.
-"""
-
-import networkx as nx
-import random
-from numpy import cumsum, array
-
-
-class IncrementalPersonalizedPageRank(object):
-    """
-    Class to incrementally compute the personalized page ranks of a graph from the perspective of a predetermined
-    node in the graph.
-
-    Page rank is an algorithm with which nodes in a directed graph are ranked by their respective importance.
-    Personalized page rank is an alternate version of page rank where the ranks of nodes are determined by their
-    distance from a given seed node.
-    Usually, the page ranks in a network are computed using an iterative procedure called the power iteration.
-    In this class the page ranks are computed using the monte carlo method, whereby a number of random walks of
-    predetermined lengths originate from the seed node and walk along the edges through the graph. They jump back
-    to the seed node with a given probability at every step and the walk is terminated once it reaches a certain
-    length. If a random walk reaches a "dangling node", i.e. a node with no outgoing edges it is reset as well.
-    A vector of visit times is computed containing the number of times the random walk passes through the individual
-    nodes and the page rank is given by the visit times divided by the accumulated visit times of all nodes in the
-    graph.
-    The personalised page rank given below is incremental, meaning that it can be recomputed every time the underlying
-    graph structure is modified. In order to recompute the page ranks, one doesn't have to recompute the entire set
-    of random walks through the graph. Instead, the given set of random walks is modified. The idea behind this is
-    that a given random walk does not pass through every single edge. Only random walks that reach a node for which
-    the outgoing edges have been modified, i.e. an edge is added or removed, or the weight of an edge is changed,
-    need to be recomputed, starting from the first node for which such changes have occurred.
-    """
-
-    def __init__(self, graph, node, number_of_random_walks, reset_probability, random_walk_length):
-        """
-        Initializes the incremental personalized page rank class by determining the graph, the seed node, the number
-        of random walks, the reset probability and the length of each random walk.
-
-        :type node: The seed node at which all random walks begin
-        :param graph: The graph for which the incremental page rank is computed
-        :param number_of_random_walks: The number of random walks starting at the seed node
-        :param reset_probability: The probability with which a random walk jumps back to the seed node
-        :param random_walk_length: The number of nodes each random walk goes through before it's terminated
-        """
-        self.graph = graph
-        self.node = node
-        self.number_of_random_walks = number_of_random_walks
-        self.reset_probability = reset_probability
-        self.random_walk_length = random_walk_length
-
-        self.random_walks = list()
-        self.added_edges = list()
-        self.removed_edges = list()
-
-    def initial_random_walks(self):
-        """
-        Initiates the random_walk_from_node function starting from the seed node, number_of_random_walks times
-        """
-        while len(self.random_walks) < self.number_of_random_walks:
-            self.regular_random_walk(self.node)
-        return
-
-    def regular_random_walk(self, node):
-        """
-        Computes a random walk starting from node and appending all nodes it passes though to the list random_walk
-        :param node: The node at which the random walk begins
-        """
-        random_walk = [node]
+        start_length = len(random_walk)
+        resets = 0
+        dangling_hits = 0
         while len(random_walk) < self.random_walk_length:
             c = random.uniform(0, 1)
             if len(list(self.graph.neighbors(random_walk[-1]))) > 0 and c > self.reset_probability:
@@ -379,7 +150,10 @@ class IncrementalPersonalizedPageRank(object):
                     [self.graph[current_node][neighbor]['weight'] for neighbor in current_neighbors])
                 cumulated_edge_weights = cumsum(current_edge_weights)
                 if cumulated_edge_weights[-1] == 0:
-                    random_walk.append(self.node)
+                    if origins is not None:
+                        origins.append(len(random_walk))
+                    random_walk.append(self.personalization_table.sample())
+                    dangling_hits += 1
                     continue
                 random_id = list(
                     cumulated_edge_weights < (random.uniform(0, 1) * cumulated_edge_weights[-1])).index(
@@ -387,152 +161,70 @@ class IncrementalPersonalizedPageRank(object):
                 next_node = current_neighbors[random_id]
                 random_walk.append(next_node)
             else:
-                random_walk.append(self.node)
-        self.random_walks.append(random_walk)
-        return
-
-    def add_random_walk(self, previous_random_walk):
-        """
-        Takes a given random walk segment and computes random walk of length random_walk_length starting at the final
-        node in the previous random walk. The idea is that once the graph is modified some random walks will be
-        recomputed starting at a given node in the graph.
-        :param previous_random_walk: A random walk segment which is not as long as random_walk_length
-        """
-        random_walk = previous_random_walk
-        while len(random_walk) < self.random_walk_length:
-            c = random.uniform(0, 1)
-            if len(list(self.graph.neighbors(random_walk[-1]))) > 0 and c > self.reset_probability:
-                current_node = random_walk[-1]
-                current_neighbors = list(self.graph.neighbors(current_node))
-                current_edge_weights = array(
-                    [self.graph[current_node][neighbor]['weight'] for neighbor in current_neighbors])
-                cumulated_current_edge_weights = cumsum(current_edge_weights)
-                if cumulated_current_edge_weights[-1] == 0:
-                    random_walk.append(self.node)
-                    continue
-                random_id = list(
-                    cumulated_current_edge_weights < (random.uniform(0, 1) * cumulated_current_edge_weights[-1])).index(
-                    False)
-                next_node = current_neighbors[random_id]
-                random_walk.append(next_node)
+                if c > self.reset_probability:
+                    dangling_hits += 1
+                else:
+                    resets += 1
+                if origins is not None:
+                    origins.append(len(random_walk))
+                random_walk.append(self.personalization_table.sample())
+        if self.statistics is not None:
+            self.statistics.record_walk(len(random_walk) - start_length, resets, dangling_hits)
+        return random_walk
+
+    @timed_phase('update')
+    def set_personalization(self, personalization):
+        """
+        Changes the weights of the personalization and redraws as few start and reset nodes as possible.
+        Every drawn node is coupled to a node drawn from the new personalization: a node whose probability decreases
+        from p to q is kept with probability q / p and is otherwise replaced by a node drawn from the nodes whose
+        probability increases, in proportion to the increase. A random walk is recomputed from its first replaced
+        node on, since the rest of the random walk depends on it. Only the random walks with an origin whose
+        probability decreases are looked at. Pending modifications of the graph are applied and dirty random walks are
+        repaired first, also if lazy_repair is set, since the start and reset nodes of their recomputed parts are drawn
+        from the new personalization.
+        :param personalization: A dictionary of nodes and their new weights
+        :return: The number of random walks that have been recomputed
+        """
+        self.update_random_walks()
+        self.repair_random_walks()
+        old_table = self.personalization_table
+        new_table = AliasTable(personalization)
+        self.personalization = dict(personalization)
+        self.personalization_table = new_table
+        increases = {node: new_table.probability(node) - old_table.probability(node) for node in new_table.nodes
+                     if new_table.probability(node) > old_table.probability(node)}
+        if not increases:
+            return 0
+        increase_table = AliasTable(increases)
+
+        keep_probabilities = {node: new_table.probability(node) / old_table.probability(node)
+                              for node in old_table.nodes if new_table.probability(node) < old_table.probability(node)}
+        affected_walks = set()
+        for origin in keep_probabilities:
+            affected_walks.update(self.walk_index.walks_from_node(origin))
+
+        number_of_recomputed_walks = 0
+        for walk_id in affected_walks:
+            random_walk = self.random_walks[walk_id]
+            origins = self.origin_positions[walk_id]
+            for position in origins:
+                keep_probability = keep_probabilities.get(random_walk[position], 1)
+                if keep_probability < 1 and random.uniform(0, 1) >= keep_probability:
+                    break
             else:
-                random_walk.append(self.node)
-        self.random_walks.append(random_walk)
-        return
-
-    def compute_personalized_page_ranks(self):
-        """
-        Determines the personalized page ranks based the random walks in the list random_walks
-        :return: A dictionary of nodes and corresponding page ranks
-        """
-        zeros = [0 for _ in range(len(list(self.graph.nodes)))]
-        page_ranks = dict(zip(list(self.graph.nodes), zeros))
-        visit_times = dict(zip(list(self.graph.nodes), zeros))
-        nodes_in_random_walks = []
-        for random_walk in self.random_walks:
-            nodes_in_random_walks.extend(random_walk)
-        for node in self.graph.nodes:
-            visit_times[node] = nodes_in_random_walks.count(node)
-        for node in self.graph.nodes:
-            try:
-                page_ranks[node] = float(visit_times[node]) / sum(visit_times.values())
-            except ZeroDivisionError:
-                print "List of visit times is empty..."
-        return page_ranks
-
-    def add_edge(self, source, destination, weight):
-        """
-        Adds an edge to the graph. Then adds the edge to the list added_edges
-        :param source: source node
-        :param destination: destination node
-        :param weight: weight of the edge
-        """
-        if weight == 0 or source not in self.graph or destination not in self.graph:
-            return
-        if self.graph.has_edge(source, destination):
-            self.add_weight_to_edge(source, destination, weight)
-        elif self.graph.has_edge(destination, source):
-            self.add_weight_to_edge(destination, source, -weight)
-        else:
-            if weight > 0:
-                edge = (source, destination, weight)
-            elif weight < 0:
-                edge = (destination, source, -weight)
-            self.graph.add_weighted_edges_from([edge])
-            self.added_edges.append(edge)
-
-    def add_weight_to_edge(self, source, destination, weight):
-        """
-        Takes an existing edge and updates its weight. Then adds the edge to the list added_edges
-        :param source: source node of the edge
-        :param destination: destination node of the edge
-        :param weight: weight added to the edge
-        """
-        if weight == 0:
-            return
-        if self.graph.has_edge(source, destination):
-            self.graph[source][destination]['weight'] += weight
-            if self.graph[source][destination]['weight'] < 0:
-                edge = (destination, source, -self.graph[source][destination]['weight'])
-                self.graph.remove_edge(source, destination)
-                self.graph.add_weighted_edges_from([edge])
-                self.removed_edges.append((source, destination))
-                self.added_edges.append(edge)
-            elif self.graph[source][destination]['weight'] > 0:
-                edge = (source, destination, self.graph[source][destination]['weight'])
-                self.graph.remove_edge(source, destination)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-            elif self.graph[source][destination]['weight'] == 0:
-                self.graph.remove_edge(source, destination)
-                self.removed_edges.append((source, destination))
-
-        elif self.graph.has_edge(destination, source):
-            self.graph[destination][source]['weight'] -= weight
-            if self.graph[destination][source]['weight'] < 0:
-                edge = (source, destination, -self.graph[destination][source]['weight'])
-                self.graph.remove_edge(destination, source)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-                self.removed_edges.append((destination, source))
-            elif self.graph[destination][source]['weight'] > 0:
-                edge = (destination, source, self.graph[destination][source]['weight'])
-                self.graph.remove_edge(destination, source)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-            elif self.graph[destination][source]['weight'] == 0:
-                self.graph.remove_edge(destination, source)
-                self.removed_edges.append((destination, source))
-        else:
-            self.add_edge(source, destination, weight)
-        return
-
-    def remove_edge(self, source, destination):
-        """
-        Removes an edge from the graph and adds it to the list added_edges
-        :param source: source node of the edge
-        :param destination: destination node of the edge
-        """
-        if self.graph.has_edge(source, destination):
-            edge = (source, destination)
-            self.graph.remove_edge(source, destination)
-            self.removed_edges.append(edge)
-        elif self.graph.has_edge(destination, source):
-            edge = (destination, source)
-            self.graph.remove_edge(destination, source)
-            self.removed_edges.append(edge)
-        return
-
-    def add_node(self, node):
-        """
-        Adds a node to the graph
-        :param node: Node that is to be added
-        """
-        if node not in self.graph.nodes:
-            self.graph.add_node(node)
-        else:
-            print "node already in graph"
-        return
+                continue
+            self.truncate_random_walk(walk_id, position)
+            number_of_origins = len(origins)
+            origins.append(position)
+            random_walk.append(increase_table.sample())
+            self.continue_random_walk(random_walk, origins)
+            self.add_origins(walk_id, random_walk, origins, number_of_origins)
+            self.walk_index.add_walk(walk_id, random_walk, position)
+            number_of_recomputed_walks += 1
+        if self.rank_events is not None:
+            self.rank_events.emit()
+        return number_of_recomputed_walks
 
     def remove_node(self, node):
         """
@@ -540,6 +232,8 @@ class IncrementalPersonalizedPageRank(object):
         :param node: node that is to be removed
         """
         if node in self.graph.nodes:
+            for predecessor in self.graph.predecessors(node):
+                self.remember_out_edges(predecessor)
             for predecessor in self.graph.predecessors(node):
                 if (predecessor, node) not in self.removed_edges:
                     self.removed_edges.append((predecessor, node))
@@ -550,7 +244,9 @@ class IncrementalPersonalizedPageRank(object):
                     self.added_edges.remove((node, successor))
                 if (node, successor) not in self.removed_edges:
                     self.removed_edges.append((node, successor))
+            self.removed_nodes.append(node)
             self.graph.remove_node(node)
+            self.remove_from_personalization(node)
         return
 
     """def update_graph(self, new_graph):
@@ -563,25 +259,55 @@ class IncrementalPersonalizedPageRank(object):
         for edge in list(set(new_edges) - set(old_edges)):
             self.add_edge(edge[0][0], edge[0][1], edge[1])"""
 
-    def update_random_walks(self):
-        """
-        Takes the lists added_edges and removed_edges and recomputes all random walks that have traversed these
-        edges, starting from their respective source nodes. The new random walks then replace the old ones in the
-        list random_walks. Finally the edges are removed from the lists added_edges and removed_edges
-        """
-        for edge in reversed(self.added_edges):
-            self.added_edges.remove(edge)
-            random_walks_to_change = [random_walk for random_walk in self.random_walks if edge[0] in random_walk]
-            for random_walk in random_walks_to_change:
-                self.random_walks.remove(random_walk)
-                del random_walk[random_walk.index(edge[0])+1:]
-                self.add_random_walk(random_walk)
-
-        for edge in reversed(self.removed_edges):
-            self.removed_edges.remove(edge)
-            random_walks_to_change = [random_walk for random_walk in self.random_walks if edge[0] in random_walk]
-            for random_walk in random_walks_to_change:
-                self.random_walks.remove(random_walk)
-                del random_walk[random_walk.index(edge[0]) + 1:]
-                self.add_random_walk(random_walk)
-        return
+    @timed_phase('update')
+    def repair_random_walks(self, walk_ids=None):
+        """
+        Repairs dirty random walks. A random walk is recomputed from its first step that is rerouted by the coupling
+        of its node, or otherwise from its truncation position, and is clean afterwards. A random walk whose origin
+        has been removed is started again with restart_random_walk. The recomputed random walks keep their position in
+        the list random_walks.
+        :param walk_ids: The ids of the random walks to repair, None for all dirty random walks. Clean random walks
+        are skipped.
+        :return: The number of random walks that have been recomputed
+        """
+        if walk_ids is None:
+            walk_ids = list(self.dirty_walks)
+        truncation_positions = []
+        for walk_id in walk_ids:
+            if walk_id not in self.dirty_walks:
+                continue
+            coupled_position, position, batch = self.dirty_walks.pop(walk_id)
+            random_walk = self.random_walks[walk_id]
+            rerouted_step = None
+            if batch is not None:
+                reset_positions = set(self.origin_positions[walk_id])
+                # Steps after a truncation position are recomputed anyway, and resets do not depend on the edges
+                for step in xrange(coupled_position, position if position is not None else len(random_walk) - 1):
+                    coupling = batch[1].get(random_walk[step])
+                    if coupling is None or step + 1 in reset_positions:
+                        continue
+                    keep_probability = coupling.keep_probability(random_walk[step + 1])
+                    if keep_probability < 1 and random.uniform(0, 1) >= keep_probability:
+                        position = step
+                        rerouted_step = coupling.reroute()
+                        break
+            if position is None:
+                continue
+            if position < 0:
+                self.restart_random_walk(walk_id)
+                truncation_positions.append(0)
+                continue
+            origins = self.origin_positions[walk_id]
+            self.truncate_random_walk(walk_id, position + 1)
+            number_of_origins = len(origins)
+            if rerouted_step is not None:
+                random_walk.append(rerouted_step)
+            self.continue_random_walk(random_walk, origins)
+            self.add_origins(walk_id, random_walk, origins, number_of_origins)
+            self.walk_index.add_walk(walk_id, random_walk, position + 1)
+            truncation_positions.append(position)
+        if self.statistics is not None:
+            self.statistics.record_update(truncation_positions)
+        if self.rank_events is not None:
+            self.rank_events.emit()
+        return len(truncation_positions)
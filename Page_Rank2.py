@@ -5,9 +5,12 @@ The code in this file computes the PageRanks using the Monte Carlo algorithm.
 import networkx as nx
 import random
 from numpy import cumsum, array
+from Alias_Table import AliasTable
+from Engine_Statistics import timed_phase
+from Page_Rank_Base import IncrementalPageRankBase
 
 
-class IncrementalPersonalizedPageRank2(object):
+class IncrementalPersonalizedPageRank2(IncrementalPageRankBase):
     """
     Class to incrementally compute the personalized page ranks of a graph from the perspective of a predetermined
     node in the graph.
@@ -29,9 +32,12 @@ class IncrementalPersonalizedPageRank2(object):
     that a given random walk does not pass through every single edge. Only random walks that reach a node for which
     the outgoing edges have been modified, i.e. an edge is added or removed, or the weight of an edge is changed,
     need to be recomputed, starting from the first node for which such changes have occurred.
+    Instead of a single seed node the random walks can be started at a weighted set of trusted nodes, the
+    personalization. The start node of every random walk is then drawn from the personalization with an alias table
+    and recorded in the walk index as the origin of the random walk.
     """
 
-    def __init__(self, graph, node, number_of_random_walks, reset_probability):
+    def __init__(self, graph, node, number_of_random_walks, reset_probability, personalization=None):
         """
         Initializes the incremental personalized page rank class by determining the graph, the seed node, the number
         of random walks, the reset probability and the length of each random walk.
@@ -40,23 +46,11 @@ class IncrementalPersonalizedPageRank2(object):
         :param graph: The graph for which the incremental page rank is computed
         :param number_of_random_walks: The number of random walks starting at the seed node
         :param reset_probability: The probability with which a random walk jumps back to the seed node
+        :param personalization: A dictionary of nodes and weights with which the random walks start at them, None to
+        start all random walks at the seed node
         """
-        self.graph = graph
-        self.node = node
-        self.number_of_random_walks = number_of_random_walks
-        self.reset_probability = reset_probability
-
-        self.random_walks = list()
-        self.added_edges = list()
-        self.removed_edges = list()
-
-    def initial_random_walks(self):
-        """
-        Initiates the random_walk_from_node function starting from the seed node, number_of_random_walks times
-        """
-        while len(self.random_walks) < self.number_of_random_walks:
-            self.regular_random_walk(self.node)
-        return
+        super(IncrementalPersonalizedPageRank2, self).__init__(graph, node, number_of_random_walks, reset_probability,
+                                                               personalization)
 
     def regular_random_walk(self, node):
         """
@@ -64,24 +58,9 @@ class IncrementalPersonalizedPageRank2(object):
         :param node: The node at which the random walk begins
         """
         random_walk = [node]
-        c = random.uniform(0, 1)
-        while c > self.reset_probability:
-            if len(list(self.graph.neighbors(random_walk[-1]))) > 0:
-                current_node = random_walk[-1]
-                current_neighbors = list(self.graph.neighbors(current_node))
-                current_edge_weights = array(
-                    [self.graph[current_node][neighbor]['weight'] for neighbor in current_neighbors])
-                cumulated_edge_weights = cumsum(current_edge_weights)
-                if cumulated_edge_weights[-1] == 0:
-                    break
-                random_id = list(
-                    cumulated_edge_weights < (random.uniform(0, 1) * cumulated_edge_weights[-1])).index(
-                    False)
-                next_node = current_neighbors[random_id]
-                random_walk.append(next_node)
-                c = random.uniform(0, 1)
-            else:
-                break
+        self.continue_random_walk(random_walk)
+        self.walk_index.add_walk(len(self.random_walks), random_walk)
+        self.walk_index.add_origin(len(self.random_walks), node)
         self.random_walks.append(random_walk)
         return
 
@@ -93,6 +72,38 @@ class IncrementalPersonalizedPageRank2(object):
         :param previous_random_walk: A random walk segment which is not as long as random_walk_length
         """
         random_walk = previous_random_walk
+        self.continue_random_walk(random_walk)
+        self.walk_index.add_walk(len(self.random_walks), random_walk)
+        self.walk_index.add_origin(len(self.random_walks), random_walk[0])
+        self.random_walks.append(random_walk)
+        return
+
+    def restart_random_walk(self, walk_id):
+        """
+        Recomputes a random walk whose origin has been removed from a node drawn from the personalization. If the
+        removed node is the only node of the personalization, the random walk only consists of it and adds nothing to
+        the page ranks.
+        :param walk_id: The position of the random walk in the list of random walks
+        """
+        random_walk = self.random_walks[walk_id]
+        self.walk_index.remove_walk(walk_id, random_walk)
+        self.walk_index.remove_origin(walk_id, random_walk[0])
+        random_walk = [self.personalization_table.sample()]
+        if random_walk[0] in self.graph:
+            self.continue_random_walk(random_walk)
+        self.walk_index.add_walk(walk_id, random_walk)
+        self.walk_index.add_origin(walk_id, random_walk[0])
+        self.random_walks[walk_id] = random_walk
+        return
+
+    def continue_random_walk(self, random_walk):
+        """
+        Continues a random walk from its final node, appending all nodes it passes through, until it is reset or
+        reaches a dangling node
+        :param random_walk: The random walk that is continued
+        """
+        start_length = len(random_walk)
+        dangling_hits = 0
         c = random.uniform(0, 1)
         while c > self.reset_probability:
             if len(list(self.graph.neighbors(random_walk[-1]))) > 0:
@@ -100,133 +111,70 @@ class IncrementalPersonalizedPageRank2(object):
                 current_neighbors = list(self.graph.neighbors(current_node))
                 current_edge_weights = array(
                     [self.graph[current_node][neighbor]['weight'] for neighbor in current_neighbors])
-                cumulated_current_edge_weights = cumsum(current_edge_weights)
-                if cumulated_current_edge_weights[-1] == 0:
+                cumulated_edge_weights = cumsum(current_edge_weights)
+                if cumulated_edge_weights[-1] == 0:
+                    dangling_hits = 1
                     break
                 random_id = list(
-                    cumulated_current_edge_weights < (random.uniform(0, 1) * cumulated_current_edge_weights[-1])).index(
+                    cumulated_edge_weights < (random.uniform(0, 1) * cumulated_edge_weights[-1])).index(
                     False)
                 next_node = current_neighbors[random_id]
                 random_walk.append(next_node)
                 c = random.uniform(0, 1)
             else:
+                dangling_hits = 1
                 break
-        self.random_walks.append(random_walk)
-        return
-
-    def compute_personalized_page_ranks(self):
-        """
-        Determines the personalized page ranks based the random walks in the list random_walks
-        :return: A dictionary of nodes and corresponding page ranks
-        """
-        zeros = [0 for _ in range(len(list(self.graph.nodes())))]
-        page_ranks = dict(zip(list(self.graph.nodes()), zeros))
-        visit_times = dict(zip(list(self.graph.nodes()), zeros))
-        nodes_in_random_walks = []
-        for random_walk in self.random_walks:
-            nodes_in_random_walks.extend(random_walk)
-        for node in self.graph.nodes():
-            visit_times[node] = nodes_in_random_walks.count(node)
-        for node in self.graph.nodes():
-            try:
-                page_ranks[node] = float(visit_times[node]) / sum(visit_times.values())
-            except ZeroDivisionError:
-                print "List of visit times is empty..."
-        return page_ranks
-
-    def add_edge(self, source, destination, weight):
-        """
-        Adds an edge to the graph. Then adds the edge to the list added_edges
-        :param source: source node
-        :param destination: destination node
-        :param weight: weight of the edge
-        """
-        if weight == 0 or source not in self.graph or destination not in self.graph:
-            return
-        if self.graph.has_edge(source, destination):
-            self.add_weight_to_edge(source, destination, weight)
-        elif self.graph.has_edge(destination, source):
-            self.add_weight_to_edge(destination, source, -weight)
-        else:
-            if weight > 0:
-                edge = (source, destination, weight)
-            elif weight < 0:
-                edge = (destination, source, -weight)
-            self.graph.add_weighted_edges_from([edge])
-            self.added_edges.append(edge)
-
-    def add_weight_to_edge(self, source, destination, weight):
-        """
-        Takes an existing edge and updates its weight. Then adds the edge to the list added_edges
-        :param source: source node of the edge
-        :param destination: destination node of the edge
-        :param weight: weight added to the edge
-        """
-        if weight == 0:
-            return
-        if self.graph.has_edge(source, destination):
-            self.graph[source][destination]['weight'] += weight
-            if self.graph[source][destination]['weight'] < 0:
-                edge = (destination, source, -self.graph[source][destination]['weight'])
-                self.graph.remove_edge(source, destination)
-                self.graph.add_weighted_edges_from([edge])
-                self.removed_edges.append((source, destination))
-                self.added_edges.append(edge)
-            elif self.graph[source][destination]['weight'] > 0:
-                edge = (source, destination, self.graph[source][destination]['weight'])
-                self.graph.remove_edge(source, destination)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-            elif self.graph[source][destination]['weight'] == 0:
-                self.graph.remove_edge(source, destination)
-                self.removed_edges.append((source, destination))
-
-        elif self.graph.has_edge(destination, source):
-            self.graph[destination][source]['weight'] -= weight
-            if self.graph[destination][source]['weight'] < 0:
-                edge = (source, destination, -self.graph[destination][source]['weight'])
-                self.graph.remove_edge(destination, source)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-                self.removed_edges.append((destination, source))
-            elif self.graph[destination][source]['weight'] > 0:
-                edge = (destination, source, self.graph[destination][source]['weight'])
-                self.graph.remove_edge(destination, source)
-                self.graph.add_weighted_edges_from([edge])
-                self.added_edges.append(edge)
-            elif self.graph[destination][source]['weight'] == 0:
-                self.graph.remove_edge(destination, source)
-                self.removed_edges.append((destination, source))
-        else:
-            self.add_edge(source, destination, weight)
-        return
-
-    def remove_edge(self, source, destination):
-        """
-        Removes an edge from the graph and adds it to the list added_edges
-        :param source: source node of the edge
-        :param destination: destination node of the edge
-        """
-        if self.graph.has_edge(source, destination):
-            edge = (source, destination)
-            self.graph.remove_edge(source, destination)
-            self.removed_edges.append(edge)
-        elif self.graph.has_edge(destination, source):
-            edge = (destination, source)
-            self.graph.remove_edge(destination, source)
-            self.removed_edges.append(edge)
-        return
+        if self.statistics is not None:
+            self.statistics.record_walk(len(random_walk) - start_length, 1 - dangling_hits, dangling_hits)
+        return random_walk
 
-    def add_node(self, node):
+    @timed_phase('update')
+    def set_personalization(self, personalization):
         """
-        Adds a node to the graph
-        :param node: Node that is to be added
+        Changes the weights of the personalization and resamples the origins of as few random walks as possible.
+        The old and the new origin of every random walk are coupled: a random walk started at a node whose
+        probability decreases from p to q keeps its origin with probability q / p and otherwise gets a new origin,
+        drawn from the nodes whose probability increases, in proportion to the increase. The origins are then
+        distributed according to the new personalization, while the expected fraction of random walks that are
+        recomputed equals the total variation distance between the old and the new personalization. Pending
+        modifications of the graph are applied to the random walks first, also if lazy_repair is set, since they are
+        coupled to the outgoing edges of the nodes before the modifications, which the new random walks never saw.
+        :param personalization: A dictionary of nodes and their new weights
+        :return: The number of random walks that have been recomputed
         """
-        if node not in self.graph.nodes():
-            self.graph.add_node(node)
-        else:
-            print "node already in graph"
-        return
+        self.update_random_walks()
+        self.repair_random_walks()
+        old_table = self.personalization_table
+        new_table = AliasTable(personalization)
+        self.personalization = dict(personalization)
+        self.personalization_table = new_table
+        increases = {node: new_table.probability(node) - old_table.probability(node) for node in new_table.nodes
+                     if new_table.probability(node) > old_table.probability(node)}
+        if not increases:
+            return 0
+        increase_table = AliasTable(increases)
+
+        resampled_walks = []
+        for origin in old_table.nodes:
+            keep_probability = new_table.probability(origin) / old_table.probability(origin)
+            if keep_probability >= 1:
+                continue
+            for walk_id in self.walk_index.walks_from_node(origin):
+                if random.uniform(0, 1) >= keep_probability:
+                    resampled_walks.append(walk_id)
+        for walk_id in resampled_walks:
+            random_walk = self.random_walks[walk_id]
+            self.walk_index.remove_walk(walk_id, random_walk)
+            self.walk_index.remove_origin(walk_id, random_walk[0])
+            self.dirty_walks.pop(walk_id, None)
+            random_walk = [increase_table.sample()]
+            self.continue_random_walk(random_walk)
+            self.walk_index.add_walk(walk_id, random_walk)
+            self.walk_index.add_origin(walk_id, random_walk[0])
+            self.random_walks[walk_id] = random_walk
+        if self.rank_events is not None:
+            self.rank_events.emit()
+        return len(resampled_walks)
 
     def remove_node(self, node):
         """
@@ -234,6 +182,8 @@ class IncrementalPersonalizedPageRank2(object):
         :param node: node that is to be removed
         """
         if node in self.graph.nodes():
+            for predecessor in self.graph.predecessors(node):
+                self.remember_out_edges(predecessor)
             for successor in self.graph.successors(node):
                 if (node, successor) in self.added_edges:
                     self.added_edges.remove((node, successor))
@@ -244,6 +194,7 @@ class IncrementalPersonalizedPageRank2(object):
                     self.removed_edges.append((predecessor, node))
                 if (predecessor, node) in self.added_edges:
                     self.added_edges.remove((predecessor, node))
+            self.removed_nodes.append(node)
             """for edge in reversed(self.removed_edges):
                 if edge[0] == node:
                     self.removed_edges.remove(edge)
@@ -251,6 +202,7 @@ class IncrementalPersonalizedPageRank2(object):
                 if edge[0] == node:
                     self.added_edges.remove(edge)"""
             self.graph.remove_node(node)
+            self.remove_from_personalization(node)
         return
 
     """def update_graph(self, new_graph):
@@ -263,38 +215,52 @@ class IncrementalPersonalizedPageRank2(object):
         for edge in list(set(new_edges) - set(old_edges)):
             self.add_edge(edge[0][0], edge[0][1], edge[1])"""
 
-    def update_random_walks(self):
+    @timed_phase('update')
+    def repair_random_walks(self, walk_ids=None):
         """
-        Takes the lists added_edges and removed_edges and recomputes all random walks that have traversed these
-        edges, starting from their respective source nodes. The new random walks then replace the old ones in the
-        list random_walks. Finally the edges are removed from the lists added_edges and removed_edges
+        Repairs dirty random walks. A random walk is recomputed from its first step that is rerouted by the coupling
+        of its node, or otherwise from its truncation position, and is clean afterwards. A random walk whose origin
+        has been removed is started again with restart_random_walk. The recomputed random walks keep their position in
+        the list random_walks.
+        :param walk_ids: The ids of the random walks to repair, None for all dirty random walks. Clean random walks
+        are skipped.
+        :return: The number of random walks that have been recomputed
         """
-        for edge in reversed(self.added_edges):
-            self.added_edges.remove(edge)
-            random_walks_to_change = [random_walk for random_walk in self.random_walks if edge[0] in random_walk]
-            for random_walk in random_walks_to_change:
-                self.random_walks.remove(random_walk)
-                del random_walk[random_walk.index(edge[0])+1:]
-                self.add_random_walk(random_walk)
-
-        for edge in reversed(self.removed_edges):
-            self.removed_edges.remove(edge)
-            random_walks_to_change = [random_walk for random_walk in self.random_walks if edge[0] in random_walk]
-            for random_walk in random_walks_to_change:
-                self.random_walks.remove(random_walk)
-                del random_walk[random_walk.index(edge[0]) + 1:]
-                self.add_random_walk(random_walk)
-        return
-
-
-
-
-
-
-
-
-
-
-
-
-
+        if walk_ids is None:
+            walk_ids = list(self.dirty_walks)
+        truncation_positions = []
+        for walk_id in walk_ids:
+            if walk_id not in self.dirty_walks:
+                continue
+            coupled_position, position, batch = self.dirty_walks.pop(walk_id)
+            random_walk = self.random_walks[walk_id]
+            rerouted_step = None
+            if batch is not None:
+                # Steps after a truncation position are recomputed anyway
+                for step in xrange(coupled_position, position if position is not None else len(random_walk) - 1):
+                    coupling = batch[1].get(random_walk[step])
+                    if coupling is None:
+                        continue
+                    keep_probability = coupling.keep_probability(random_walk[step + 1])
+                    if keep_probability < 1 and random.uniform(0, 1) >= keep_probability:
+                        position = step
+                        rerouted_step = coupling.reroute()
+                        break
+            if position is None:
+                continue
+            if position < 0:
+                self.restart_random_walk(walk_id)
+                truncation_positions.append(0)
+                continue
+            self.walk_index.remove_walk(walk_id, random_walk, position + 1)
+            del random_walk[position + 1:]
+            if rerouted_step is not None:
+                random_walk.append(rerouted_step)
+            self.continue_random_walk(random_walk)
+            self.walk_index.add_walk(walk_id, random_walk, position + 1)
+            truncation_positions.append(position)
+        if self.statistics is not None:
+            self.statistics.record_update(truncation_positions)
+        if self.rank_events is not None:
+            self.rank_events.emit()
+        return len(truncation_positions)
@@ -0,0 +1,405 @@
+"""
+The code in this file is shared by the engines that compute the PageRanks using the Monte Carlo algorithm.
+"""
+
+from Random_Walk_Index import RandomWalkIndex
+from Alias_Table import AliasTable
+from Transition_Coupling import transition_coupling
+from Engine_Statistics import EngineStatistics, timed_phase
+from Rank_Events import RankEvents
+from Rank_Vectors import NodeOrder, PageRankView, sparse_page_ranks, dense_page_ranks
+
+
+class IncrementalPageRankBase(object):
+    """
+    Base class of the incremental personalized page rank engines, which keeps the random walks, the walk index and
+    the pending modifications of the graph.
+
+    The engines differ in how a random walk is continued, reset and recomputed, i.e. they implement
+    regular_random_walk, restart_random_walk, continue_random_walk, set_personalization, remove_node and
+    repair_random_walks. The modifications of the graph, the marking of dirty random walks, the computation of the
+    page ranks from the visit times, the statistics and the rank events are the same for all of them and are
+    implemented here.
+    """
+
+    def __init__(self, graph, node, number_of_random_walks, reset_probability, personalization=None):
+        """
+        Initializes the state shared by the engines
+        :param graph: The graph for which the incremental page rank is computed
+        :param node: The seed node at which all random walks begin
+        :param number_of_random_walks: The number of random walks starting at the seed node
+        :param reset_probability: The probability with which a random walk jumps back to the seed node
+        :param personalization: A dictionary of nodes and weights with which the random walks start at them, None to
+        start all random walks at the seed node
+        """
+        self.graph = graph
+        self.node = node
+        self.number_of_random_walks = number_of_random_walks
+        self.reset_probability = reset_probability
+        self.personalization = dict(personalization) if personalization is not None else {node: 1}
+        self.personalization_table = AliasTable(self.personalization)
+
+        self.random_walks = list()
+        self.added_edges = list()
+        self.removed_edges = list()
+        self.removed_nodes = list()
+        self.walk_index = RandomWalkIndex()
+        self.node_order = NodeOrder(graph.nodes())
+        self.previous_out_edges = dict()
+        self.dirty_walks = dict()
+        self.lazy_repair = False
+        self.statistics = None
+        self.rank_events = None
+
+    def enable_statistics(self, profile=False):
+        """
+        Starts collecting counters of the random walks and timers of the phases generate, update and compute
+        :param profile: If true, the phases are also run under cProfile
+        :return: The statistics
+        """
+        self.disable_statistics()
+        self.statistics = EngineStatistics(profile)
+        return self.statistics
+
+    def disable_statistics(self):
+        """
+        Stops collecting statistics
+        """
+        self.statistics = None
+        return
+
+    def stats(self):
+        """
+        :return: A dictionary of the collected counters and timers, or an empty dictionary if statistics are disabled
+        """
+        if self.statistics is None:
+            return dict()
+        return self.statistics.stats()
+
+    def enable_rank_events(self, thresholds=(), epsilon=None):
+        """
+        Starts tracking the changes of the visit times, from which every repair of the random walks emits events for
+        the nodes whose page ranks cross one of the thresholds or change by more than epsilon
+        :param thresholds: The page ranks at which a node changes its category
+        :param epsilon: The change of the page rank of a node from which on an event is emitted, None to disable
+        :return: The RankEvents, to which listeners can be added
+        """
+        self.disable_rank_events()
+        self.rank_events = RankEvents(thresholds, epsilon)
+        self.rank_events.attach(self)
+        return self.rank_events
+
+    def disable_rank_events(self):
+        """
+        Stops tracking the changes of the visit times
+        """
+        if self.rank_events is not None:
+            self.rank_events.detach()
+            self.rank_events = None
+        return
+
+    @timed_phase('generate')
+    def initial_random_walks(self):
+        """
+        Initiates the random_walk_from_node function starting from nodes drawn from the personalization,
+        number_of_random_walks times
+        """
+        while len(self.random_walks) < self.number_of_random_walks:
+            self.regular_random_walk(self.personalization_table.sample())
+        return
+
+    @timed_phase('compute')
+    def compute_personalized_page_ranks(self):
+        """
+        Determines the personalized page ranks based the random walks in the list random_walks, using the visit times
+        kept in the walk index
+        :return: A dictionary of nodes and corresponding page ranks
+        """
+        page_ranks = dict.fromkeys(self.graph.nodes, 0)
+        visit_times = {node: visits for node, visits in self.walk_index.visit_times.iteritems() if node in page_ranks}
+        total_visit_times = sum(visit_times.values())
+        if total_visit_times == 0:
+            if page_ranks:
+                print "List of visit times is empty..."
+            return page_ranks
+        for node, visits in visit_times.iteritems():
+            page_ranks[node] = float(visits) / total_visit_times
+        return page_ranks
+
+    @timed_phase('compute')
+    def compute_sparse_page_ranks(self):
+        """
+        Determines the page ranks of the visited nodes only, without creating a float object for every node
+        :return: A pair of NumPy arrays, the increasing ids of the visited nodes in node_order and their page ranks
+        """
+        return sparse_page_ranks(self.walk_index.visit_times, self.graph, self.node_order)
+
+    @timed_phase('compute')
+    def compute_dense_page_ranks(self):
+        """
+        Determines the page ranks of all nodes as a float array aligned with node_order
+        :return: A float array with the page rank of the node with id i at position i
+        """
+        return dense_page_ranks(self.walk_index.visit_times, self.graph, self.node_order)
+
+    def page_rank_view(self):
+        """
+        :return: A PageRankView, i.e. a dictionary of the page ranks of all nodes whose entries are only created when
+        they are looked up
+        """
+        return PageRankView(self.graph, self.node_order, self.compute_dense_page_ranks())
+
+    def remember_out_edges(self, node):
+        """
+        Keeps a copy of the outgoing edges of a node before they are modified for the first time since the last call
+        of update_random_walks, which reroutes the steps of the random walks according to the old and new edges
+        :param node: The node whose outgoing edges are about to be modified
+        """
+        if node in self.graph and node not in self.previous_out_edges:
+            self.previous_out_edges[node] = self.out_edge_weights(node)
+        return
+
+    def out_edge_weights(self, node):
+        """
+        :return: A dictionary of the successors of a node and the weights of the edges to them
+        """
+        return {neighbor: data['weight'] for neighbor, data in self.graph[node].iteritems()}
+
+    def rescale_weights(self, factor):
+        """
+        Multiplies the weights of all edges by the same positive factor, e.g. to renormalize time-decayed weights.
+        The transition probabilities do not change, so no random walk has to be repaired and nothing is added to the
+        lists of modifications.
+        :param factor: The positive factor
+        """
+        for source, destination, data in self.graph.edges(data=True):
+            data['weight'] *= factor
+        for out_edges in self.previous_out_edges.itervalues():
+            for successor in out_edges:
+                out_edges[successor] *= factor
+        return
+
+    def add_edge(self, source, destination, weight):
+        """
+        Adds an edge to the graph. Then adds the edge to the list added_edges
+        :param source: source node
+        :param destination: destination node
+        :param weight: weight of the edge
+        """
+        if weight == 0 or source not in self.graph or destination not in self.graph:
+            return
+        self.remember_out_edges(source)
+        self.remember_out_edges(destination)
+        if self.graph.has_edge(source, destination):
+            self.add_weight_to_edge(source, destination, weight)
+        elif self.graph.has_edge(destination, source):
+            self.add_weight_to_edge(destination, source, -weight)
+        else:
+            if weight > 0:
+                edge = (source, destination, weight)
+            elif weight < 0:
+                edge = (destination, source, -weight)
+            self.graph.add_weighted_edges_from([edge])
+            self.added_edges.append(edge)
+
+    def add_weight_to_edge(self, source, destination, weight):
+        """
+        Takes an existing edge and updates its weight. Then adds the edge to the list added_edges
+        :param source: source node of the edge
+        :param destination: destination node of the edge
+        :param weight: weight added to the edge
+        """
+        if weight == 0:
+            return
+        self.remember_out_edges(source)
+        self.remember_out_edges(destination)
+        if self.graph.has_edge(source, destination):
+            self.graph[source][destination]['weight'] += weight
+            if self.graph[source][destination]['weight'] < 0:
+                edge = (destination, source, -self.graph[source][destination]['weight'])
+                self.graph.remove_edge(source, destination)
+                self.graph.add_weighted_edges_from([edge])
+                self.removed_edges.append((source, destination))
+                self.added_edges.append(edge)
+            elif self.graph[source][destination]['weight'] > 0:
+                edge = (source, destination, self.graph[source][destination]['weight'])
+                self.graph.remove_edge(source, destination)
+                self.graph.add_weighted_edges_from([edge])
+                self.added_edges.append(edge)
+            elif self.graph[source][destination]['weight'] == 0:
+                self.graph.remove_edge(source, destination)
+                self.removed_edges.append((source, destination))
+
+        elif self.graph.has_edge(destination, source):
+            self.graph[destination][source]['weight'] -= weight
+            if self.graph[destination][source]['weight'] < 0:
+                edge = (source, destination, -self.graph[destination][source]['weight'])
+                self.graph.remove_edge(destination, source)
+                self.graph.add_weighted_edges_from([edge])
+                self.added_edges.append(edge)
+                self.removed_edges.append((destination, source))
+            elif self.graph[destination][source]['weight'] > 0:
+                edge = (destination, source, self.graph[destination][source]['weight'])
+                self.graph.remove_edge(destination, source)
+                self.graph.add_weighted_edges_from([edge])
+                self.added_edges.append(edge)
+            elif self.graph[destination][source]['weight'] == 0:
+                self.graph.remove_edge(destination, source)
+                self.removed_edges.append((destination, source))
+        else:
+            self.add_edge(source, destination, weight)
+        return
+
+    def remove_edge(self, source, destination):
+        """
+        Removes an edge from the graph and adds it to the list added_edges
+        :param source: source node of the edge
+        :param destination: destination node of the edge
+        """
+        self.remember_out_edges(source)
+        self.remember_out_edges(destination)
+        if self.graph.has_edge(source, destination):
+            edge = (source, destination)
+            self.graph.remove_edge(source, destination)
+            self.removed_edges.append(edge)
+        elif self.graph.has_edge(destination, source):
+            edge = (destination, source)
+            self.graph.remove_edge(destination, source)
+            self.removed_edges.append(edge)
+        return
+
+    def add_node(self, node):
+        """
+        Adds a node to the graph
+        :param node: Node that is to be added
+        """
+        if node not in self.graph.nodes:
+            self.graph.add_node(node)
+            self.node_order.intern(node)
+        else:
+            print "node already in graph"
+        return
+
+    def remove_from_personalization(self, node):
+        """
+        Takes a removed node out of the personalization, so that no random walk is started or reset at it any more,
+        unless it is the only node of the personalization with a positive weight
+        :param node: The removed node
+        """
+        if node not in self.personalization:
+            return
+        personalization = dict(self.personalization)
+        del personalization[node]
+        if any(weight > 0 for weight in personalization.itervalues()):
+            self.personalization = personalization
+            self.personalization_table = AliasTable(personalization)
+        return
+
+    @timed_phase('update')
+    def update_random_walks(self):
+        """
+        Marks the random walks affected by the modifications in added_edges and removed_edges dirty with
+        mark_dirty_walks and then repairs all dirty random walks with repair_random_walks. If lazy_repair is set, the
+        random walks are only marked dirty, and are repaired when their page ranks are queried.
+        :return: The number of random walks that have been recomputed, or marked dirty if lazy_repair is set
+        """
+        number_of_dirty_walks = self.mark_dirty_walks()
+        if self.lazy_repair:
+            return number_of_dirty_walks
+        return self.repair_random_walks()
+
+    @timed_phase('update')
+    def mark_dirty_walks(self):
+        """
+        Takes the lists added_edges and removed_edges and marks all random walks that pass through the source nodes of
+        these edges dirty, without recomputing them. For every such node the outgoing edges before the first and after
+        the last modification are coupled by a TransitionCoupling, and every step a random walk has taken from the node
+        is kept or rerouted accordingly when it is repaired, so that a random walk is only recomputed from its first
+        rerouted step on and most random walks through a node with many edges are left alone. Only steps along edges
+        that were removed or whose transition probability has decreased can be rerouted, so only the random walks
+        stepping along such edges are looked up in the edge index. If a node was or has become a dangling node, the
+        random walks are recomputed from the first visit of the node instead. Random walks passing through a node that
+        has been removed are recomputed from the node preceding the removed node. A random walk that is still dirty
+        from earlier modifications has not been coupled yet, so its steps from a node are coupled to the outgoing edges
+        of the node before the earliest modification it has missed. Finally the edges are removed from the lists
+        added_edges and removed_edges.
+        :return: The number of random walks that have been marked dirty
+        """
+        changed_nodes = set(edge[0] for edge in self.added_edges)
+        changed_nodes.update(edge[0] for edge in self.removed_edges)
+        changed_nodes.update(self.removed_nodes)
+        previous_out_edges = self.previous_out_edges
+        self.previous_out_edges = dict()
+        del self.added_edges[:]
+        del self.removed_edges[:]
+        del self.removed_nodes[:]
+
+        truncation_positions = dict()
+        coupled_positions = dict()
+        first_visits = dict()
+        batch = (dict(), dict())
+        for node in changed_nodes:
+            if node in self.graph:
+                coupling = transition_coupling(previous_out_edges.get(node), self.out_edge_weights(node))
+                if coupling is not None:
+                    batch[0][node] = previous_out_edges[node]
+                    # Only the steps along edges whose transition probability has decreased may be rerouted
+                    if coupling.keep_probabilities:
+                        batch[1][node] = coupling
+                    for successor in coupling.keep_probabilities:
+                        for walk_id, position in self.walk_index.walks_along_edge(node, successor).iteritems():
+                            if walk_id not in coupled_positions or position < coupled_positions[walk_id]:
+                                coupled_positions[walk_id] = position
+                    # Any step of a dirty random walk from the node may have to be rerouted
+                    walks = self.walk_index.walks_through_node(node)
+                    for walk_id in (self.dirty_walks if len(self.dirty_walks) < len(walks) else walks):
+                        if walk_id in walks and walk_id in self.dirty_walks and \
+                                (walk_id not in first_visits or walks[walk_id] < first_visits[walk_id]):
+                            first_visits[walk_id] = walks[walk_id]
+                    continue
+            offset = 0 if node in self.graph else 1
+            for walk_id, position in self.walk_index.walks_through_node(node).iteritems():
+                if walk_id not in truncation_positions or position - offset < truncation_positions[walk_id]:
+                    truncation_positions[walk_id] = position - offset
+
+        marked_walks = set(truncation_positions).union(coupled_positions, first_visits)
+        merged_batches = dict()
+        for walk_id in marked_walks:
+            if walk_id not in self.dirty_walks:
+                self.dirty_walks[walk_id] = (coupled_positions.get(walk_id), truncation_positions.get(walk_id),
+                                             batch if walk_id in coupled_positions else None)
+                continue
+            coupled_position, truncation_position, dirty_batch = self.dirty_walks[walk_id]
+            if walk_id in first_visits:
+                coupled_position = min(first_visits[walk_id], coupled_position) if coupled_position is not None \
+                    else first_visits[walk_id]
+                if dirty_batch is None:
+                    dirty_batch = batch
+                else:
+                    if id(dirty_batch) not in merged_batches:
+                        merged_batches[id(dirty_batch)] = self.merge_batches(dirty_batch, batch)
+                    dirty_batch = merged_batches[id(dirty_batch)]
+            if walk_id in truncation_positions and (truncation_position is None or
+                                                    truncation_positions[walk_id] < truncation_position):
+                truncation_position = truncation_positions[walk_id]
+            self.dirty_walks[walk_id] = (coupled_position, truncation_position, dirty_batch)
+        return len(marked_walks)
+
+    def merge_batches(self, old_batch, new_batch):
+        """
+        Combines the couplings of two batches of modifications for the random walks that have missed both of them
+        :param old_batch: The outgoing edges before and the couplings of the earlier batch
+        :param new_batch: The outgoing edges before and the couplings of the later batch
+        :return: The outgoing edges of every node before the earlier of the batches that modified it, and the
+        couplings of these outgoing edges to the current ones
+        """
+        old_out_edges = dict(new_batch[0])
+        old_out_edges.update(old_batch[0])
+        couplings = dict(old_batch[1])
+        for node in new_batch[0]:
+            coupling = transition_coupling(old_out_edges[node], self.out_edge_weights(node))
+            if coupling is not None and coupling.keep_probabilities:
+                couplings[node] = coupling
+            else:
+                couplings.pop(node, None)
+        return old_out_edges, couplings
@@ -0,0 +1,226 @@
+"""
+The code in this file computes the personalized page ranks with random walks that are stitched together from short
+precomputed random walk segments, so that the seed node can be changed without walking the graph again.
+"""
+from __future__ import division
+import math
+import random
+
+from Alias_Table import AliasTable
+from Engine_Statistics import timed_phase
+from Page_Rank2 import IncrementalPersonalizedPageRank2
+from Random_Walk_Index import RandomWalkIndex
+
+
+class StitchedPersonalizedPageRank(IncrementalPersonalizedPageRank2):
+    """
+    Class to incrementally compute personalized page ranks from random walks stitched together from segments, in the
+    style of the algorithms of Das Sarma et al. and FAST-PPR.
+
+    For every node a pool of segments_per_node segments is kept, i.e. short random walks of segment_length steps
+    without resets, which only stop early at dangling nodes. The pool of a node is computed the first time a random
+    walk needs it, or in advance by precompute_segments. A random walk of the personalized page rank is assembled by
+    first drawing its number of steps before the reset, which is geometrically distributed, and then following
+    segments: the random walk takes a segment of the node it has reached, appends as many of its steps as it still
+    needs and continues from the end of the segment. Within one random walk every segment is used at most once,
+    starting at a random segment of the pool, and once all segments of a node are used the random walk continues
+    with single random steps. Every random walk is therefore distributed like a random walk of
+    IncrementalPersonalizedPageRank2, although random walks that share segments are not independent of each other.
+    Computing the random walks of a new seed node with set_seed mostly copies segments, so that the page ranks of a
+    seed node that has not been seen before are available long before all of its random walks could have been
+    walked. The segments are maintained like the random walks: a segment passing through a node whose outgoing edges
+    have changed is recomputed from the first visit of that node by update_random_walks, before the random walks of
+    the seed node are updated. The positions of the segments of a removed node in the list segments are set to None
+    and reused by the segments of later pools, so that the ids of the other segments in the segment index remain
+    valid.
+    """
+
+    def __init__(self, graph, node, number_of_random_walks, reset_probability, personalization=None,
+                 segment_length=None, segments_per_node=4):
+        """
+        Initializes the engine with empty segment pools
+        :param graph: The graph for which the incremental page rank is computed
+        :param node: The seed node at which all random walks begin
+        :param number_of_random_walks: The number of random walks starting at the seed node
+        :param reset_probability: The probability with which a random walk jumps back to the seed node
+        :param personalization: A dictionary of nodes and weights with which the random walks start at them, None to
+        start all random walks at the seed node
+        :param segment_length: The number of steps of a segment, None for the expected number of steps of a random
+        walk, 1 / reset_probability
+        :param segments_per_node: The number of segments in the pool of every node, at least 1
+        """
+        super(StitchedPersonalizedPageRank, self).__init__(graph, node, number_of_random_walks, reset_probability,
+                                                           personalization)
+        if segment_length is None:
+            segment_length = max(int(round(1 / reset_probability)), 1)
+        self.segment_length = segment_length
+        self.segments_per_node = segments_per_node
+
+        self.segments = list()
+        self.free_segment_ids = list()
+        self.pools = dict()
+        self.segment_index = RandomWalkIndex(index_edges=False)
+
+    def random_step(self, node):
+        """
+        Takes a single step of a random walk without reset
+        :param node: The current node
+        :return: A successor of node, drawn in proportion to the edge weights, or None if node is a dangling node
+        """
+        neighbors = self.graph[node]
+        total_weight = sum(data['weight'] for data in neighbors.itervalues())
+        if total_weight <= 0:
+            return None
+        threshold = random.uniform(0, 1) * total_weight
+        for neighbor, data in neighbors.iteritems():
+            threshold -= data['weight']
+            if threshold < 0:
+                return neighbor
+        return neighbor
+
+    def extend_segment(self, segment):
+        """
+        Appends random steps to a segment until it has segment_length steps or reaches a dangling node
+        :param segment: The segment
+        """
+        while len(segment) <= self.segment_length:
+            next_node = self.random_step(segment[-1])
+            if next_node is None:
+                break
+            segment.append(next_node)
+        return segment
+
+    def pool(self, node):
+        """
+        Returns the pool of a node, computing its segments if the pool does not exist yet
+        :param node: The node
+        :return: The list of ids of the segments starting at node
+        """
+        pool = self.pools.get(node)
+        if pool is None:
+            pool = []
+            for _ in xrange(self.segments_per_node):
+                segment = self.extend_segment([node])
+                if self.free_segment_ids:
+                    segment_id = self.free_segment_ids.pop()
+                    self.segments[segment_id] = segment
+                else:
+                    segment_id = len(self.segments)
+                    self.segments.append(segment)
+                self.segment_index.add_walk(segment_id, segment)
+                pool.append(segment_id)
+            self.pools[node] = pool
+        return pool
+
+    @timed_phase('generate')
+    def precompute_segments(self, nodes=None):
+        """
+        Computes the pools of the given nodes in advance
+        :param nodes: The nodes, None for all nodes of the graph
+        """
+        for node in (nodes if nodes is not None else self.graph.nodes()):
+            self.pool(node)
+        return
+
+    def continue_random_walk(self, random_walk):
+        """
+        Continues a random walk from its final node by stitching segments together until it is reset or reaches a
+        dangling node
+        :param random_walk: The random walk that is continued
+        """
+        start_length = len(random_walk)
+        # The number of steps before the reset is geometrically distributed, P(steps >= k) = (1 - reset_probability)^k
+        if self.reset_probability >= 1:
+            steps = 0
+        else:
+            steps = int(math.log(1 - random.random()) / math.log(1 - self.reset_probability))
+        used_segments = dict()
+        dangling_hits = 0
+        while steps > 0:
+            node = random_walk[-1]
+            pool = self.pool(node)
+            if node not in used_segments:
+                used_segments[node] = (random.randrange(len(pool)), 0)
+            first_segment, number_of_used_segments = used_segments[node]
+            if number_of_used_segments < len(pool):
+                used_segments[node] = (first_segment, number_of_used_segments + 1)
+                segment = self.segments[pool[(first_segment + number_of_used_segments) % len(pool)]]
+                taken_steps = min(steps, len(segment) - 1)
+                random_walk.extend(segment[1:taken_steps + 1])
+                steps -= taken_steps
+                if steps > 0 and len(segment) <= self.segment_length:
+                    dangling_hits = 1
+                    break
+            else:
+                next_node = self.random_step(node)
+                if next_node is None:
+                    dangling_hits = 1
+                    break
+                random_walk.append(next_node)
+                steps -= 1
+        if self.statistics is not None:
+            self.statistics.record_walk(len(random_walk) - start_length, 1 - dangling_hits, dangling_hits)
+        return random_walk
+
+    def update_segments(self):
+        """
+        Recomputes the segments passing through the source nodes of the edges in added_edges and removed_edges from
+        the first visit of such a node, and the segments passing through a removed node from the node preceding it.
+        The pools of removed nodes are deleted. The lists of modifications are left to update_random_walks.
+        :return: The number of segments that have been recomputed
+        """
+        changed_nodes = set(edge[0] for edge in self.added_edges)
+        changed_nodes.update(edge[0] for edge in self.removed_edges)
+        changed_nodes.update(self.removed_nodes)
+
+        for node in self.removed_nodes:
+            for segment_id in self.pools.pop(node, []):
+                self.segment_index.remove_walk(segment_id, self.segments[segment_id])
+                self.segments[segment_id] = None
+                self.free_segment_ids.append(segment_id)
+
+        truncation_positions = dict()
+        for node in changed_nodes:
+            offset = 0 if node in self.graph else 1
+            for segment_id, position in self.segment_index.walks_through_node(node).iteritems():
+                if segment_id not in truncation_positions or position - offset < truncation_positions[segment_id]:
+                    truncation_positions[segment_id] = position - offset
+
+        for segment_id, position in truncation_positions.iteritems():
+            segment = self.segments[segment_id]
+            self.segment_index.remove_walk(segment_id, segment, position + 1)
+            del segment[position + 1:]
+            self.extend_segment(segment)
+            self.segment_index.add_walk(segment_id, segment, position + 1)
+        return len(truncation_positions)
+
+    @timed_phase('update')
+    def update_random_walks(self):
+        """
+        Updates the segments and then the random walks of the seed node
+        :return: The number of random walks that have been recomputed
+        """
+        self.update_segments()
+        return super(StitchedPersonalizedPageRank, self).update_random_walks()
+
+    @timed_phase('update')
+    def set_seed(self, node):
+        """
+        Discards the random walks of the current seed node and stitches number_of_random_walks random walks from a new
+        seed node. Pending modifications of the graph are applied first, so that the segments are up to date before
+        they are stitched together. The segment pools are kept, and the rank change events start over from the page
+        ranks of the new seed node.
+        :param node: The new seed node
+        """
+        self.update_random_walks()
+        self.node = node
+        self.personalization = {node: 1}
+        self.personalization_table = AliasTable(self.personalization)
+        self.random_walks = list()
+        self.walk_index = RandomWalkIndex()
+        self.dirty_walks = dict()
+        self.initial_random_walks()
+        if self.rank_events is not None:
+            # The page ranks of the new seed node are not compared to those of the old one
+            self.rank_events.attach(self)
+        return
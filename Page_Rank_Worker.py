@@ -0,0 +1,313 @@
+"""
+The code in this file runs an incremental personalized page rank engine on a background thread. Modifications of the
+graph are queued and applied in batches by a single writer thread, while readers are served immutable snapshots of
+the page ranks, so that rank queries can be answered while a large update is in flight.
+"""
+from __future__ import division
+import logging
+import threading
+import Queue
+from heapq import nlargest
+
+from Update_Scheduler import UpdateScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class RankSnapshot(object):
+    """
+    Immutable view of the visit times of all random walks at a given version of the page rank engine.
+
+    A snapshot is never modified after it has been published by the worker. After every batch of updates the worker
+    copies the visit times of the walk index into a new dictionary, which takes time linear in the number of visited
+    nodes, so a reader holding on to a snapshot always sees consistent page ranks, no matter how many batches the
+    worker has applied in the meantime.
+    """
+
+    __slots__ = ('version', '_visit_times', '_total_visit_times')
+
+    def __init__(self, version, visit_times):
+        """
+        Initializes the snapshot
+        :param version: Number of batches of updates applied to the random walks when the snapshot was taken
+        :param visit_times: Dictionary of nodes and the number of times the random walks pass through them
+        """
+        self.version = version
+        self._visit_times = visit_times
+        self._total_visit_times = sum(visit_times.values())
+
+    def page_rank(self, node):
+        """
+        Determines the personalized page rank of a single node
+        :param node: The node of which the page rank is requested
+        :return: The page rank of the node, 0 if no random walk passes through the node
+        """
+        if self._total_visit_times == 0:
+            return 0.0
+        return self._visit_times.get(node, 0) / self._total_visit_times
+
+    def page_ranks(self):
+        """
+        Determines the personalized page ranks of all nodes visited by the random walks
+        :return: A dictionary of nodes and corresponding page ranks
+        """
+        if self._total_visit_times == 0:
+            return {}
+        return {node: visits / self._total_visit_times for node, visits in self._visit_times.iteritems()}
+
+    def top(self, k):
+        """
+        Determines the k nodes with the highest personalized page ranks
+        :param k: Number of nodes to return
+        :return: A list of (node, page rank) pairs in decreasing order of page rank
+        """
+        if self._total_visit_times == 0:
+            return []
+        return [(node, visits / self._total_visit_times)
+                for node, visits in nlargest(k, self._visit_times.iteritems(), key=lambda item: item[1])]
+
+
+class PageRankWorker(object):
+    """
+    Class to apply modifications of the graph to an incremental personalized page rank engine on a background thread.
+
+    The page rank classes are not safe to read while update_random_walks is changing the list random_walks. The
+    worker therefore owns the engine: all modifications of the graph are put in a queue and a single writer thread
+    drains that queue and applies the queued modifications to the graph. When update_random_walks is called is
+    decided by an UpdateScheduler, so that a batch of modifications is repaired at once. After every batch the visit
+    times are published as a new RankSnapshot, which readers can fetch at any time without waiting for the writer.
+    Like the example worker in threadingExample.py, the thread is stopped gracefully through the running variable.
+    """
+
+    def __init__(self, page_rank, batch_size=100, batch_window=0, max_affected_walks=None, poll_interval=0.1,
+                 initial_batches=1, on_publish=None):
+        """
+        Initializes the worker
+        :param page_rank: The incremental personalized page rank engine that is updated by the worker
+        :param batch_size: The maximal number of queued modifications applied per call of update_random_walks
+        :param batch_window: The number of seconds the writer keeps collecting modifications after the first
+        modification of a batch has arrived, so that modifications arriving within this window are coalesced into a
+        single call of update_random_walks
+        :param max_affected_walks: The estimated number of affected random walks at which a batch is applied without
+        waiting for the batch window to end, None to disable
+        :param poll_interval: The number of seconds the writer waits for new modifications before checking whether
+        it has been stopped
+        :param initial_batches: The number of batches in which the initial random walks are computed. A snapshot is
+        published after every batch, so that readers get a rough estimate of the page ranks early on, which is
+        refined as more random walks are added.
+        :param on_publish: A function that is called with every new snapshot on the writer thread, e.g. to notify a
+        user interface
+        """
+        self.page_rank = page_rank
+        self.poll_interval = poll_interval
+        self.initial_batches = initial_batches
+        self.on_publish = on_publish
+        self.scheduler = UpdateScheduler(page_rank, max_pending_mutations=batch_size, max_delay=batch_window,
+                                         max_affected_walks=max_affected_walks)
+
+        self.mutations = Queue.Queue()
+        self.snapshot = RankSnapshot(0, {})
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the writer thread. If the engine has no random walks yet, the initial random walks are computed by the
+        writer thread as well, so that this function returns immediately.
+        """
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, args=[])
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def stop(self, flush=True):
+        """
+        Stops the writer thread after it has finished the batch it is working on
+        :param flush: If true, all modifications queued before this call are applied before the thread is stopped
+        """
+        if not self.running:
+            return
+        if flush:
+            self.flush()
+        self.running = False
+        self.mutations.put(('stop', None))
+        self.thread.join()
+        return
+
+    def flush(self, timeout=None):
+        """
+        Blocks until all modifications queued before this call have been applied and published in a snapshot
+        :param timeout: Maximal number of seconds to wait, or None to wait until the modifications are applied
+        :return: True if the modifications have been applied, False if the timeout expired or the worker is not running
+        """
+        if not self.running:
+            return False
+        flushed = threading.Event()
+        self.mutations.put(('flush', flushed))
+        return flushed.wait(timeout)
+
+    def get_snapshot(self):
+        """
+        Returns the most recently published snapshot. Reading it never blocks on the writer thread.
+        """
+        return self.snapshot
+
+    def add_edge(self, source, destination, weight):
+        """
+        Queues the addition of an edge, see IncrementalPersonalizedPageRank2.add_edge
+        """
+        self.mutations.put(('add_edge', (source, destination, weight)))
+
+    def add_weight_to_edge(self, source, destination, weight):
+        """
+        Queues a change of the weight of an edge, see IncrementalPersonalizedPageRank2.add_weight_to_edge
+        """
+        self.mutations.put(('add_weight_to_edge', (source, destination, weight)))
+
+    def remove_edge(self, source, destination):
+        """
+        Queues the removal of an edge, see IncrementalPersonalizedPageRank2.remove_edge
+        """
+        self.mutations.put(('remove_edge', (source, destination)))
+
+    def add_node(self, node):
+        """
+        Queues the addition of a node, see IncrementalPersonalizedPageRank2.add_node
+        """
+        self.mutations.put(('add_node', (node,)))
+
+    def remove_node(self, node):
+        """
+        Queues the removal of a node, see IncrementalPersonalizedPageRank2.remove_node
+        """
+        self.mutations.put(('remove_node', (node,)))
+
+    def add_interaction(self, source, destination, weight):
+        """
+        Queues the net flow of data of an interaction between two peers. Unlike add_edge, peers that are not in the
+        graph yet are added to it first.
+        :param source: The peer that has uploaded the data
+        :param destination: The peer that has downloaded the data
+        :param weight: The amount of data that has been transferred
+        """
+        self.mutations.put(('add_interaction', (source, destination, weight)))
+
+    def rescale_weights(self, factor):
+        """
+        Queues multiplying the weights of all edges by the same factor, e.g. as the rescale function of a TimeDecay
+        :param factor: The positive factor
+        """
+        self.mutations.put(('rescale_weights', (factor,)))
+
+    def run(self):
+        """
+        Main loop of the writer thread. Waits for queued modifications and applies everything that is queued to the
+        graph. The random walks are updated whenever the scheduler decides so, at the latest batch_window seconds
+        after the first modification of a batch has arrived, and when a flush is requested.
+        """
+        if len(self.page_rank.random_walks) < self.page_rank.number_of_random_walks:
+            self.initial_random_walks()
+        else:
+            self.publish()
+        while self.running:
+            timeout = self.scheduler.time_until_flush()
+            try:
+                if timeout is None:
+                    item = self.mutations.get(timeout=self.poll_interval)
+                elif timeout > 0:
+                    item = self.mutations.get(timeout=timeout)
+                else:
+                    item = self.mutations.get_nowait()
+            except Queue.Empty:
+                item = None
+
+            flushes = []
+            while item is not None:
+                method, arguments = item
+                if method == 'flush':
+                    flushes.append(arguments)
+                elif method != 'stop':
+                    self.apply(method, arguments)
+                    self.update(self.scheduler.poll, False)
+                try:
+                    item = self.mutations.get_nowait()
+                except Queue.Empty:
+                    item = None
+
+            if flushes:
+                try:
+                    self.update(self.scheduler.flush, 'flush')
+                finally:
+                    for flushed in flushes:
+                        flushed.set()
+            else:
+                self.update(self.scheduler.poll)
+        return
+
+    def update(self, scheduler_call, *arguments):
+        """
+        Lets the scheduler update the random walks and publishes a snapshot if it has done so. Errors are logged, so
+        that the writer thread keeps running and waiting callers of flush and stop are released.
+        :param scheduler_call: The method of the scheduler, poll or flush
+        :param arguments: Arguments of the method
+        """
+        try:
+            if scheduler_call(*arguments) is not None:
+                self.publish()
+        except Exception:
+            logger.exception("Failed to update the random walks")
+        return
+
+    def initial_random_walks(self):
+        """
+        Computes the missing initial random walks of the engine in initial_batches batches and publishes a snapshot
+        after every batch. If the worker is stopped in between, the remaining random walks are computed when it is
+        started again.
+        """
+        number_of_random_walks = self.page_rank.number_of_random_walks
+        try:
+            for batch in xrange(1, self.initial_batches + 1):
+                if not self.running:
+                    break
+                self.page_rank.number_of_random_walks = number_of_random_walks * batch // self.initial_batches
+                self.page_rank.initial_random_walks()
+                self.publish()
+        finally:
+            self.page_rank.number_of_random_walks = number_of_random_walks
+        return
+
+    def apply(self, method, arguments):
+        """
+        Applies a single queued modification to the graph of the engine through the scheduler
+        :param method: Name of the modifying method, e.g. 'add_edge'
+        :param arguments: Arguments of the method
+        """
+        try:
+            if method == 'rescale_weights':
+                # Rescaling does not change the transition probabilities, so it is no pending modification
+                self.page_rank.rescale_weights(*arguments)
+                return
+            if method == 'add_interaction':
+                for node in arguments[:2]:
+                    if node not in self.page_rank.graph:
+                        self.scheduler.record('add_node', (node,))
+                method = 'add_edge'
+            self.scheduler.record(method, arguments)
+        except Exception:
+            logger.exception("Failed to apply %s%s", method, arguments)
+        return
+
+    def publish(self):
+        """
+        Copies the visit times kept in the walk index of the engine and publishes them as a new snapshot
+        """
+        self.snapshot = RankSnapshot(self.snapshot.version + 1, dict(self.page_rank.walk_index.visit_times))
+        if self.on_publish is not None:
+            try:
+                self.on_publish(self.snapshot)
+            except Exception:
+                logger.exception("Failed to notify snapshot %d", self.snapshot.version)
+        return
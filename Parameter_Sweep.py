@@ -0,0 +1,289 @@
+"""
+In this code we measure the accuracy and the cost of the incremental personalized page rank classes for a grid of
+numbers of random walks, random walk lengths and reset probabilities, so that the parameters used in production can
+be chosen by cost instead of by reading the plots of Convergence Testing.py. The exact personalized page ranks only
+depend on the graph, the seed node and the reset probability, so they are computed once per reset probability with
+the power iteration of networkx and cached, optionally in a file. The grid points are run in a pool of processes.
+For every reset probability, the configurations that are not beaten by a configuration that is both cheaper and more
+accurate form the Pareto front, which is printed as a table.
+
+Usage:
+    python "Parameter_Sweep.py" --random-walks 100 300 1000 --reset-probabilities 0.05 0.15 0.3 --processes 4
+"""
+from __future__ import division
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import sys
+from timeit import default_timer
+
+import networkx as nx
+from numpy import array
+from numpy.linalg import norm
+from Page_Rank import IncrementalPersonalizedPageRank
+from Page_Rank2 import IncrementalPersonalizedPageRank2
+from Benchmark import ENGINES, generate_graph
+
+# Graph and exact page ranks of the worker processes, set once per process by initialize_worker
+worker_graph = None
+worker_exact_page_ranks = None
+
+
+def graph_key(graph, seed_node):
+    """
+    Computes a fingerprint of a weighted graph and a seed node, under which the exact page ranks are cached
+    :param graph: The graph
+    :param seed_node: The seed node
+    :return: A hexadecimal digest
+    """
+    digest = hashlib.sha1(repr(seed_node))
+    for edge in sorted(graph.edges(data='weight')):
+        digest.update(repr(edge))
+    for node in sorted(nx.isolates(graph)):
+        digest.update(repr(node))
+    return digest.hexdigest()
+
+
+class ExactPageRankCache(object):
+    """
+    Class to cache the personalized page ranks computed with the power iteration per graph, seed node and reset
+    probability. If a file name is given, the cache is loaded from and saved to this file, so that repeated sweeps
+    over the same graph never run the power iteration again.
+    """
+
+    def __init__(self, file_name=None):
+        """
+        Initializes the cache
+        :param file_name: Name of the pickle file the cache is kept in, None to keep it in memory only
+        """
+        self.file_name = file_name
+        self.page_ranks = dict()
+        self.computations = 0
+        if file_name is not None and os.path.exists(file_name):
+            with open(file_name, 'rb') as cache_file:
+                self.page_ranks = pickle.load(cache_file)
+
+    def get(self, graph, seed_node, reset_probability):
+        """
+        Returns the exact personalized page ranks, computing them if they are not cached
+        :param graph: The graph
+        :param seed_node: The seed node
+        :param reset_probability: The reset probability of the random walks, i.e. 1 - alpha
+        :return: A dictionary of nodes and corresponding page ranks
+        """
+        key = (graph_key(graph, seed_node), round(reset_probability, 10))
+        if key not in self.page_ranks:
+            self.page_ranks[key] = nx.pagerank(graph, alpha=1 - reset_probability, personalization={seed_node: 1},
+                                               max_iter=500, tol=1e-10, weight='weight')
+            self.computations += 1
+        return self.page_ranks[key]
+
+    def save(self):
+        if self.file_name is not None:
+            with open(self.file_name, 'wb') as cache_file:
+                pickle.dump(self.page_ranks, cache_file, pickle.HIGHEST_PROTOCOL)
+        return
+
+
+def relative_error(page_ranks, exact_page_ranks):
+    """
+    Computes the relative error of the estimated page ranks in the euclidean norm
+    :param page_ranks: The estimated page ranks
+    :param exact_page_ranks: The exact page ranks
+    :return: ||page_ranks - exact_page_ranks|| / ||exact_page_ranks||
+    """
+    nodes = list(exact_page_ranks)
+    exact = array([exact_page_ranks[node] for node in nodes])
+    estimated = array([page_ranks.get(node, 0) for node in nodes])
+    return norm(estimated - exact) / norm(exact)
+
+
+def initialize_worker(graph, exact_page_ranks):
+    """
+    Stores the graph and the exact page ranks in a worker process, so that they are sent to every process only once
+    :param graph: The graph
+    :param exact_page_ranks: A dictionary of reset probabilities and the corresponding exact page ranks
+    """
+    global worker_graph, worker_exact_page_ranks
+    worker_graph = graph
+    worker_exact_page_ranks = exact_page_ranks
+    return
+
+
+def run_configuration(configuration):
+    """
+    Runs an engine for a single grid point in a worker process
+    :param configuration: A tuple (engine, seed node, number of random walks, random walk length, reset probability,
+    repetition, random seed)
+    :return: A result dictionary with the error and the cost of the configuration
+    """
+    engine, seed_node, number_of_random_walks, random_walk_length, reset_probability, repetition, seed = configuration
+    random.seed(seed)
+    if engine == 'IncrementalPersonalizedPageRank':
+        pr = IncrementalPersonalizedPageRank(worker_graph, seed_node, number_of_random_walks, reset_probability,
+                                             random_walk_length)
+    else:
+        pr = IncrementalPersonalizedPageRank2(worker_graph, seed_node, number_of_random_walks, reset_probability)
+    pr.enable_statistics()
+    start_time = default_timer()
+    pr.initial_random_walks()
+    page_ranks = pr.compute_personalized_page_ranks()
+    seconds = default_timer() - start_time
+    stats = pr.stats()
+    return {'engine': engine,
+            'random_walks': number_of_random_walks,
+            'random_walk_length': random_walk_length,
+            'reset_probability': reset_probability,
+            'repetition': repetition,
+            'error': relative_error(page_ranks, worker_exact_page_ranks[reset_probability]),
+            'seconds': seconds,
+            'steps': stats['steps'],
+            'phase_times': stats['phase_times']}
+
+
+def grid(engines, numbers_of_random_walks, random_walk_lengths, reset_probabilities):
+    """
+    Enumerates the grid points. IncrementalPersonalizedPageRank2 has no random walk length, so it is run once per
+    number of random walks and reset probability, with the random walk length None.
+    :return: A list of (engine, number of random walks, random walk length, reset probability) tuples
+    """
+    points = []
+    for engine in engines:
+        lengths = random_walk_lengths if engine == 'IncrementalPersonalizedPageRank' else [None]
+        points.extend((engine,) + point for point in itertools.product(numbers_of_random_walks, lengths,
+                                                                         reset_probabilities))
+    return points
+
+
+def sweep(graph, seed_node, points, repeat=1, processes=None, cache=None, seed=1):
+    """
+    Runs all grid points in a pool of processes
+    :param graph: The graph
+    :param seed_node: The seed node of the personalized page ranks
+    :param points: The grid points returned by grid
+    :param repeat: The number of repetitions of every grid point, each with a different random seed
+    :param processes: The number of processes, None for the number of CPUs and 1 to run in the current process
+    :param cache: The ExactPageRankCache, None for a new in-memory cache
+    :param seed: The random seed of the first repetition of the first grid point
+    :return: A list of result dictionaries, one per grid point, with the errors and costs averaged over repetitions
+    """
+    cache = cache if cache is not None else ExactPageRankCache()
+    exact_page_ranks = {reset_probability: cache.get(graph, seed_node, reset_probability)
+                        for reset_probability in set(point[3] for point in points)}
+    configurations = [point[:1] + (seed_node,) + point[1:] + (repetition, seed + index * repeat + repetition)
+                      for index, point in enumerate(points) for repetition in xrange(repeat)]
+
+    if processes == 1:
+        initialize_worker(graph, exact_page_ranks)
+        runs = map(run_configuration, configurations)
+    else:
+        pool = multiprocessing.Pool(processes, initialize_worker, (graph, exact_page_ranks))
+        try:
+            runs = pool.map(run_configuration, configurations, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    results = []
+    for index in xrange(len(points)):
+        point_runs = runs[index * repeat:(index + 1) * repeat]
+        result = dict((key, point_runs[0][key]) for key in ['engine', 'random_walks', 'random_walk_length',
+                                                             'reset_probability'])
+        for key in ['error', 'seconds', 'steps']:
+            result[key] = sum(run[key] for run in point_runs) / repeat
+        result['max_error'] = max(run['error'] for run in point_runs)
+        results.append(result)
+    return results
+
+
+def pareto_front(results, cost='seconds'):
+    """
+    Selects the configurations for which no other configuration is both cheaper and at least as accurate
+    :param results: The result dictionaries returned by sweep
+    :param cost: The key of the cost, 'seconds' or 'steps'
+    :return: The Pareto optimal result dictionaries, sorted by increasing cost and decreasing error
+    """
+    front = []
+    for result in sorted(results, key=lambda result: (result[cost], result['error'])):
+        if not front or result['error'] < front[-1]['error']:
+            front.append(result)
+    return front
+
+
+def format_table(results, cost='seconds'):
+    """
+    :return: A printable table of result dictionaries
+    """
+    lines = ["{:<34}{:>8}{:>8}{:>8}{:>10}{:>10}{:>12}".format("Engine", "Walks", "Length", "Reset", "Error",
+                                                             "Max error", cost.capitalize())]
+    for result in results:
+        lines.append("{:<34}{:>8}{:>8}{:>8.2f}{:>10.4f}{:>10.4f}{:>12.4f}".format(
+            result['engine'], result['random_walks'], result['random_walk_length'] or '-',
+            result['reset_probability'], result['error'], result['max_error'], result[cost]))
+    return "\n".join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Sweep the parameters of the incremental personalized page rank "
+                                                 "classes and report the Pareto front of error versus cost")
+    parser.add_argument("--edges", type=int, default=2000, help="Number of edges of the generated graph")
+    parser.add_argument("--database", nargs=2, metavar=("FILE_PATH", "FILE_NAME"), default=None,
+                        help="Use the graph of this trustchain database instead of a generated graph")
+    parser.add_argument("--seed-node", default=None,
+                        help="Seed node of the page ranks, default: the node with the largest out-degree")
+    parser.add_argument("--engines", nargs='+', default=ENGINES, choices=ENGINES)
+    parser.add_argument("--random-walks", type=int, nargs='+', default=[100, 300, 1000])
+    parser.add_argument("--random-walk-lengths", type=int, nargs='+', default=[25, 50, 100])
+    parser.add_argument("--reset-probabilities", type=float, nargs='+', default=[0.05, 0.15, 0.3])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=None, help="Number of processes, default: number of CPUs")
+    parser.add_argument("--cost", choices=['seconds', 'steps'], default='seconds')
+    parser.add_argument("--cache", default=None, help="Pickle file in which the exact page ranks are cached")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="sweep_results.json")
+    arguments = parser.parse_args(argv)
+
+    if arguments.database is not None:
+        from Open_Database2 import GraphReduction2
+
+        gr = GraphReduction2(arguments.database[0], arguments.database[1])
+        gr.open_data_set()
+        graph = gr.generate_graph()
+    else:
+        graph = generate_graph(arguments.edges, random.Random(arguments.seed))
+    if arguments.seed_node is None:
+        seed_node = max(graph.nodes(), key=graph.out_degree)
+    else:
+        seed_node = arguments.seed_node
+        # The nodes of a generated graph are integers
+        if arguments.database is None and seed_node.isdigit():
+            seed_node = int(seed_node)
+        if seed_node not in graph:
+            parser.error("the seed node {} is not a node of the graph".format(arguments.seed_node))
+
+    cache = ExactPageRankCache(arguments.cache)
+    points = grid(arguments.engines, arguments.random_walks, arguments.random_walk_lengths,
+                  arguments.reset_probabilities)
+    results = sweep(graph, seed_node, points, arguments.repeat, arguments.processes, cache, arguments.seed)
+    cache.save()
+    print("{} grid points, {} exact page rank computations".format(len(points), cache.computations))
+
+    with open(arguments.output, 'w') as output_file:
+        json.dump({'arguments': vars(arguments), 'results': results}, output_file, indent=2)
+    print(format_table(sorted(results, key=lambda result: result[arguments.cost]), arguments.cost))
+    # The exact page ranks differ per reset probability, so only errors for the same reset probability are compared
+    for reset_probability in sorted(set(result['reset_probability'] for result in results)):
+        print("\nPareto front for reset probability {}:".format(reset_probability))
+        print(format_table(pareto_front([result for result in results
+                                         if result['reset_probability'] == reset_probability], arguments.cost),
+                           arguments.cost))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
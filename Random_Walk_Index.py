@@ -0,0 +1,169 @@
+"""
+The code in this file keeps track of which random walks pass through which nodes of the graph.
+"""
+
+
+class RandomWalkIndex(object):
+    """
+    Class to index the random walks of an incremental personalized page rank engine by the nodes they pass through.
+
+    Random walks are identified by their position in the list random_walks of the engine. For every node the index
+    stores the random walks passing through it together with the position of the first visit of the node in each of
+    these walks, which is exactly the position at which a random walk has to be recomputed once the outgoing edges of
+    the node are modified. In addition the index keeps the number of visits of every node, so that the page ranks can
+    be computed without counting the nodes in all random walks again. Similarly, for every edge the index stores the
+    random walks that step along it, i.e. pass through its source node and then its destination node, together with
+    the position of the source node at the first such step, so that the random walks affected by removing an edge or
+    reducing its weight can be found without looking at the random walks that merely pass through its source node.
+    Finally the index stores for every origin, i.e. every node drawn from the personalization as the start or reset
+    node of a random walk, how often each random walk was started at it, so that the random walks affected by a change
+    of the personalization can be looked up.
+    All of these are maintained incrementally: when a random walk is recomputed from a given position, only the part of
+    the random walk after that position is removed from the index and added again.
+    If visit_deltas is a dictionary, the changes of the visit times of every node are accumulated in it as well, so
+    that the nodes whose page ranks have changed can be found without comparing the visit times of all nodes.
+    """
+
+    def __init__(self, index_edges=True):
+        """
+        Initializes an empty index
+        :param index_edges: If false, the edges the random walks step along are not indexed
+        """
+        self.index_edges = index_edges
+        self.walks_through = dict()
+        self.walks_along = dict()
+        self.visit_times = dict()
+        self.total_visit_times = 0
+        self.walks_from = dict()
+        self.visit_deltas = None
+
+    def add_walk(self, walk_id, random_walk, start=0):
+        """
+        Adds the nodes of a random walk to the index
+        :param walk_id: The position of the random walk in the list of random walks
+        :param random_walk: The random walk
+        :param start: The position in the random walk from which on the nodes are added. The nodes before this
+        position must already be in the index.
+        """
+        visit_times = self.visit_times
+        walks_through = self.walks_through
+        for position in xrange(start, len(random_walk)):
+            node = random_walk[position]
+            visit_times[node] = visit_times.get(node, 0) + 1
+            walks = walks_through.get(node)
+            if walks is None:
+                walks_through[node] = {walk_id: position}
+            elif walk_id not in walks:
+                walks[walk_id] = position
+        if self.index_edges:
+            walks_along = self.walks_along
+            for position in xrange(max(start - 1, 0), len(random_walk) - 1):
+                edge = (random_walk[position], random_walk[position + 1])
+                walks = walks_along.get(edge)
+                if walks is None:
+                    walks_along[edge] = {walk_id: position}
+                elif walk_id not in walks:
+                    walks[walk_id] = position
+        if self.visit_deltas is not None:
+            visit_deltas = self.visit_deltas
+            for position in xrange(start, len(random_walk)):
+                visit_deltas[random_walk[position]] = visit_deltas.get(random_walk[position], 0) + 1
+        self.total_visit_times += len(random_walk) - start
+        return
+
+    def remove_walk(self, walk_id, random_walk, start=0):
+        """
+        Removes the nodes of a random walk from the index
+        :param walk_id: The position of the random walk in the list of random walks
+        :param random_walk: The random walk, as it was added to the index
+        :param start: The position in the random walk from which on the nodes are removed
+        """
+        visit_times = self.visit_times
+        walks_through = self.walks_through
+        for position in xrange(start, len(random_walk)):
+            node = random_walk[position]
+            visit_times[node] -= 1
+            if visit_times[node] == 0:
+                del visit_times[node]
+            walks = walks_through.get(node)
+            if walks is not None and walks.get(walk_id, -1) >= start:
+                del walks[walk_id]
+                if not walks:
+                    del walks_through[node]
+        if self.index_edges:
+            walks_along = self.walks_along
+            for position in xrange(max(start - 1, 0), len(random_walk) - 1):
+                edge = (random_walk[position], random_walk[position + 1])
+                walks = walks_along.get(edge)
+                if walks is not None and walk_id in walks and walks[walk_id] >= start - 1:
+                    del walks[walk_id]
+                    if not walks:
+                        del walks_along[edge]
+        if self.visit_deltas is not None:
+            visit_deltas = self.visit_deltas
+            for position in xrange(start, len(random_walk)):
+                visit_deltas[random_walk[position]] = visit_deltas.get(random_walk[position], 0) - 1
+        self.total_visit_times -= len(random_walk) - start
+        return
+
+    def walks_through_node(self, node):
+        """
+        Returns the random walks passing through a node
+        :param node: The node
+        :return: A dictionary of the ids of all random walks passing through the node and the positions of the first
+        visit of the node in these random walks
+        """
+        return self.walks_through.get(node, {})
+
+    def walks_along_edge(self, source, destination):
+        """
+        Returns the random walks stepping along an edge
+        :param source: The source node of the edge
+        :param destination: The destination node of the edge
+        :return: A dictionary of the ids of all random walks stepping from source to destination and the positions of
+        source at the first such step in these random walks
+        """
+        return self.walks_along.get((source, destination), {})
+
+    def number_of_walks_through_node(self, node):
+        """
+        Returns the number of random walks passing through a node
+        :param node: The node
+        """
+        return len(self.walks_through.get(node, ()))
+
+    def add_origin(self, walk_id, origin):
+        """
+        Records that a random walk was started or reset at a node drawn from the personalization
+        :param walk_id: The position of the random walk in the list of random walks
+        :param origin: The drawn node
+        """
+        walks = self.walks_from.get(origin)
+        if walks is None:
+            self.walks_from[origin] = {walk_id: 1}
+        else:
+            walks[walk_id] = walks.get(walk_id, 0) + 1
+        return
+
+    def remove_origin(self, walk_id, origin):
+        """
+        Removes a start or reset of a random walk at a node drawn from the personalization
+        :param walk_id: The position of the random walk in the list of random walks
+        :param origin: The drawn node
+        """
+        walks = self.walks_from[origin]
+        walks[walk_id] -= 1
+        if walks[walk_id] == 0:
+            del walks[walk_id]
+            if not walks:
+                del self.walks_from[origin]
+        return
+
+    def walks_from_node(self, origin):
+        """
+        Returns the random walks started or reset at a node
+        :param origin: The node
+        :return: A dictionary of the ids of all random walks started or reset at the node and the number of times they
+        were started or reset at it
+        """
+        return self.walks_from.get(origin, {})
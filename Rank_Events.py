@@ -0,0 +1,130 @@
+"""
+The code in this file turns the changes of the visit times of an incremental personalized page rank engine into a
+stream of rank change events, so that consumers do not have to compare whole page rank dictionaries.
+"""
+from __future__ import division
+import math
+
+
+class RankEvents(object):
+    """
+    Class to emit an event (node, old_rank, new_rank) for every node whose page rank crosses one of the thresholds or
+    changes by more than epsilon.
+
+    The page rank of a node is its share of the visit times in the walk index of the engine. While the events are
+    attached to an engine, the walk index accumulates the changes of the visit times of every node, and whenever the
+    engine has repaired random walks it calls emit, which only looks at the nodes whose visit times have changed. The
+    page ranks of the other nodes only change because the total number of visits changes, by the factor old_total /
+    new_total. They are looked at as well if some number of visits could cross a threshold or change by more than
+    epsilon with this factor, which never happens for random walks of a fixed length.
+    The events of every emission are passed to the listeners and kept in the list events until they are taken with
+    take_events, so that consumers can either react to them right away or poll them.
+    """
+
+    def __init__(self, thresholds=(), epsilon=None):
+        """
+        Initializes the event stream
+        :param thresholds: The page ranks at which a node changes its category, e.g. UNTRUSTED_RANK and TRUSTED_RANK
+        of Network_View
+        :param epsilon: The change of the page rank of a node from which on an event is emitted, None to only emit
+        events for crossed thresholds
+        """
+        self.thresholds = sorted(thresholds)
+        self.epsilon = epsilon
+        self.listeners = list()
+        self.events = list()
+        self.page_rank = None
+        self.total_visit_times = 0
+
+    def attach(self, page_rank):
+        """
+        Starts tracking the changes of the visit times of an engine
+        :param page_rank: The incremental personalized page rank engine
+        """
+        self.page_rank = page_rank
+        page_rank.walk_index.visit_deltas = dict()
+        self.total_visit_times = page_rank.walk_index.total_visit_times
+        return
+
+    def detach(self):
+        """
+        Stops tracking the changes of the visit times
+        """
+        if self.page_rank is not None:
+            self.page_rank.walk_index.visit_deltas = None
+            self.page_rank = None
+        return
+
+    def add_listener(self, listener):
+        """
+        :param listener: A function that is called with the list of events of every emission
+        """
+        self.listeners.append(listener)
+        return
+
+    def is_event(self, old_rank, new_rank):
+        """
+        :return: True if a page rank change crosses a threshold or exceeds epsilon
+        """
+        if self.epsilon is not None and abs(new_rank - old_rank) > self.epsilon:
+            return True
+        return any((old_rank < threshold) != (new_rank < threshold) for threshold in self.thresholds)
+
+    def rescaling_matters(self, old_total, new_total):
+        """
+        Checks whether a node whose visit times have not changed can cause an event because the total number of
+        visits has changed
+        :param old_total: The total number of visits at the last emission
+        :param new_total: The current total number of visits
+        :return: True if some number of visits crosses a threshold or changes by more than epsilon
+        """
+        if old_total == new_total or old_total == 0 or new_total == 0:
+            return False
+        lower_total, upper_total = min(old_total, new_total), max(old_total, new_total)
+        for threshold in self.thresholds:
+            # The rank visits / total crosses the threshold for the visits between both totals times the threshold
+            if math.ceil(threshold * lower_total) <= threshold * upper_total:
+                return True
+        if self.epsilon is not None and self.page_rank.walk_index.visit_times:
+            largest_visits = max(self.page_rank.walk_index.visit_times.itervalues())
+            if largest_visits * abs(1 / new_total - 1 / old_total) > self.epsilon:
+                return True
+        return False
+
+    def emit(self):
+        """
+        Emits the events of all changes of the visit times since the last emission
+        :return: The list of events, tuples (node, old_rank, new_rank)
+        """
+        walk_index = self.page_rank.walk_index
+        visit_deltas = walk_index.visit_deltas
+        walk_index.visit_deltas = dict()
+        old_total = self.total_visit_times
+        new_total = walk_index.total_visit_times
+        self.total_visit_times = new_total
+
+        if self.rescaling_matters(old_total, new_total):
+            nodes = set(walk_index.visit_times).union(visit_deltas)
+        else:
+            nodes = [node for node, delta in visit_deltas.iteritems() if delta != 0]
+        events = list()
+        for node in nodes:
+            new_visits = walk_index.visit_times.get(node, 0)
+            old_visits = new_visits - visit_deltas.get(node, 0)
+            old_rank = old_visits / old_total if old_total > 0 else 0
+            new_rank = new_visits / new_total if new_total > 0 else 0
+            if self.is_event(old_rank, new_rank):
+                events.append((node, old_rank, new_rank))
+        if events:
+            self.events.extend(events)
+            for listener in self.listeners:
+                listener(events)
+        return events
+
+    def take_events(self):
+        """
+        :return: The events emitted since the last call, which are removed from the list events
+        """
+        events = self.events
+        self.events = list()
+        return events
@@ -0,0 +1,196 @@
+"""
+The code below runs the incremental personalized page rank engine as a small local service. Peers and crawlers send
+edge deltas and rank queries as newline delimited JSON messages over a TCP or Unix socket. Deltas are coalesced by a
+PageRankWorker into batched calls of update_random_walks and queries are answered from the latest published snapshot,
+so that the page ranks do not have to be recomputed by rerunning main.py.
+
+Messages and replies:
+    {"type": "delta", "source": s, "destination": d, "weight": w}  ->  {"queued": true}
+    {"type": "ranks"}                                               ->  {"version": v, "ranks": [[node, rank], ...]}
+    {"type": "top", "k": k}                                         ->  {"version": v, "ranks": [[node, rank], ...]}
+    {"type": "rank", "node": n}                                     ->  {"version": v, "node": n, "rank": r}
+    {"type": "flush"}                                               ->  {"version": v}
+    {"type": "metrics"}                                             ->  statistics of the update scheduler
+Malformed messages are answered with {"error": message}.
+"""
+import argparse
+import json
+import random
+import socket
+import SocketServer
+import threading
+
+from Page_Rank_Worker import PageRankWorker
+
+
+class RankRequestHandler(SocketServer.StreamRequestHandler):
+    """
+    Handles a single client connection. Every line received is a JSON message and is answered with a single line.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        while line:
+            if line.strip():
+                try:
+                    reply = self.server.rank_service.process_message(json.loads(line))
+                except (ValueError, KeyError, TypeError), e:
+                    reply = {"error": str(e)}
+                self.wfile.write(json.dumps(reply) + "\n")
+                self.wfile.flush()
+            line = self.rfile.readline()
+
+
+class ThreadingTCPRankServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ThreadingUnixRankServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class RankService(object):
+    """
+    Class to serve the page ranks of an incremental personalized page rank engine over a local socket.
+
+    All edge deltas are handed to a PageRankWorker, which applies the deltas arriving within batch_window seconds of
+    each other with a single call of update_random_walks. Rank queries never wait for the worker, they are answered
+    from the snapshot the worker has published most recently.
+    """
+
+    def __init__(self, page_rank, address, batch_size=1000, batch_window=0.05):
+        """
+        Initializes the service
+        :param page_rank: The incremental personalized page rank engine that is served
+        :param address: A (host, port) tuple to listen on a TCP socket or a file path to listen on a Unix socket
+        :param batch_size: The maximal number of deltas applied per call of update_random_walks
+        :param batch_window: The number of seconds during which arriving deltas are coalesced into one update
+        """
+        self.worker = PageRankWorker(page_rank, batch_size=batch_size, batch_window=batch_window)
+        if isinstance(address, tuple):
+            self.server = ThreadingTCPRankServer(address, RankRequestHandler)
+        else:
+            self.server = ThreadingUnixRankServer(address, RankRequestHandler)
+        self.server.rank_service = self
+        self.address = self.server.server_address
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the page rank worker and serves requests on a background thread
+        """
+        self.worker.start()
+        self.thread = threading.Thread(target=self.server.serve_forever, args=[])
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def serve_forever(self):
+        """
+        Starts the page rank worker and serves requests until the service is shut down
+        """
+        self.worker.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.worker.stop()
+        return
+
+    def shutdown(self):
+        """
+        Stops serving requests, applies all queued deltas and stops the page rank worker
+        """
+        self.server.shutdown()
+        if self.thread is not None:
+            self.thread.join()
+            self.server.server_close()
+            self.worker.stop()
+        return
+
+    def process_message(self, message):
+        """
+        Processes a single message received from a client
+        :param message: The decoded JSON message
+        :return: The reply to the message
+        """
+        if message["type"] == "delta":
+            self.worker.add_interaction(message["source"], message["destination"], message["weight"])
+            return {"queued": True}
+        if message["type"] == "flush":
+            self.worker.flush()
+            return {"version": self.worker.get_snapshot().version}
+        if message["type"] == "metrics":
+            return self.worker.scheduler.metrics()
+
+        snapshot = self.worker.get_snapshot()
+        if message["type"] == "ranks":
+            return {"version": snapshot.version, "ranks": snapshot.page_ranks().items()}
+        elif message["type"] == "top":
+            return {"version": snapshot.version, "ranks": snapshot.top(int(message["k"]))}
+        elif message["type"] == "rank":
+            return {"version": snapshot.version, "node": message["node"], "rank": snapshot.page_rank(message["node"])}
+        raise ValueError("Unknown message type: %s" % message["type"])
+
+
+class RankClient(object):
+    """
+    Minimal client of the RankService, e.g. to load test the service from a local script
+    """
+
+    def __init__(self, address):
+        """
+        Connects to a running service
+        :param address: A (host, port) tuple of a TCP service or the file path of a Unix socket service
+        """
+        if isinstance(address, tuple):
+            self.socket = socket.create_connection(address)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(address)
+        self.file = self.socket.makefile('rb')
+
+    def request(self, message):
+        """
+        Sends a message to the service and waits for the reply
+        :param message: The message as a dictionary
+        :return: The decoded reply
+        """
+        self.socket.sendall(json.dumps(message) + "\n")
+        return json.loads(self.file.readline())
+
+    def send_delta(self, source, destination, weight):
+        return self.request({"type": "delta", "source": source, "destination": destination, "weight": weight})
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+if __name__ == "__main__":
+    from Open_Database2 import GraphReduction2
+    from Page_Rank2 import IncrementalPersonalizedPageRank2
+
+    parser = argparse.ArgumentParser(description="Serve incremental personalized page ranks over a local socket")
+    parser.add_argument("--file-path", default="", help="Path of the trustchain database file")
+    parser.add_argument("--file-name", default="trustchain", help="Name of the database file without '.db'")
+    parser.add_argument("--seed-node", default=None, help="Seed node of the personalized page rank")
+    parser.add_argument("--random-walks", type=int, default=300)
+    parser.add_argument("--reset-probability", type=float, default=0.05)
+    parser.add_argument("--batch-window", type=float, default=0.05)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket instead of TCP")
+    arguments = parser.parse_args()
+
+    gr = GraphReduction2(arguments.file_path, arguments.file_name)
+    gr.open_data_set()
+    graph = gr.generate_graph()
+    seed_node = arguments.seed_node or random.choice(list(graph.nodes()))
+
+    pr = IncrementalPersonalizedPageRank2(graph, seed_node, arguments.random_walks, arguments.reset_probability)
+    service = RankService(pr, arguments.unix_socket or (arguments.host, arguments.port),
+                          batch_window=arguments.batch_window)
+    print("Serving page ranks of {} on {}".format(seed_node, service.address))
+    service.serve_forever()
@@ -0,0 +1,138 @@
+"""
+The code in this file represents the page ranks of an incremental personalized page rank engine as NumPy arrays
+instead of dictionaries with a float object for every node of the graph.
+"""
+from __future__ import division
+from collections import Mapping
+import numpy as np
+
+
+class NodeOrder(object):
+    """
+    Class to intern the nodes of a graph, i.e. to number them consecutively in the order in which they are seen.
+
+    The id of a node never changes, even if the node is removed from the graph, so that arrays of page ranks computed
+    at different times are aligned: the page rank of the node with id i is at position i of every dense array, and
+    two dense arrays of the same engine can be compared with np.linalg.norm after padding the shorter one with zeros.
+    """
+
+    def __init__(self, nodes=()):
+        """
+        Initializes the order
+        :param nodes: The nodes that are interned first
+        """
+        self.nodes = list()
+        self.ids = dict()
+        self.intern_all(nodes)
+
+    def intern(self, node):
+        """
+        :return: The id of a node, which is assigned if the node has not been seen before
+        """
+        node_id = self.ids.get(node)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.ids[node] = node_id
+            self.nodes.append(node)
+        return node_id
+
+    def intern_all(self, nodes):
+        """
+        Interns several nodes
+        :param nodes: The nodes
+        """
+        for node in nodes:
+            self.intern(node)
+        return
+
+    def node_id(self, node):
+        """
+        :return: The id of a node, None if it has not been interned
+        """
+        return self.ids.get(node)
+
+    def dense(self, values):
+        """
+        Aligns a dictionary of values with the order, e.g. the page ranks of the power iteration
+        :param values: A dictionary of nodes and values
+        :return: A float array with the value of the node with id i at position i, 0 for missing nodes
+        """
+        self.intern_all(values)
+        array = np.zeros(len(self.nodes))
+        for node, value in values.iteritems():
+            array[self.ids[node]] = value
+        return array
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.ids
+
+
+def sparse_page_ranks(visit_times, graph, node_order):
+    """
+    Determines the page ranks of the visited nodes of a graph
+    :param visit_times: A dictionary of nodes and the number of times the random walks pass through them
+    :param graph: The graph, visits of nodes that are not in the graph are ignored
+    :param node_order: The NodeOrder in which the visited nodes are interned
+    :return: A pair of NumPy arrays, the increasing ids of the visited nodes and their page ranks
+    """
+    nodes = [node for node in visit_times if node in graph]
+    ids = np.fromiter((node_order.intern(node) for node in nodes), dtype=np.int64, count=len(nodes))
+    values = np.fromiter((visit_times[node] for node in nodes), dtype=float, count=len(nodes))
+    total_visit_times = values.sum()
+    if total_visit_times > 0:
+        values /= total_visit_times
+    order = np.argsort(ids)
+    return ids[order], values[order]
+
+
+def dense_page_ranks(visit_times, graph, node_order):
+    """
+    Determines the page ranks of all nodes of the order
+    :param visit_times: A dictionary of nodes and the number of times the random walks pass through them
+    :param graph: The graph, visits of nodes that are not in the graph are ignored
+    :param node_order: The NodeOrder in which the visited nodes are interned
+    :return: A float array with the page rank of the node with id i at position i
+    """
+    ids, values = sparse_page_ranks(visit_times, graph, node_order)
+    page_ranks = np.zeros(len(node_order))
+    page_ranks[ids] = values
+    return page_ranks
+
+
+class PageRankView(Mapping):
+    """
+    Read-only dictionary of the page ranks of all nodes of a graph, backed by a dense array.
+
+    The view behaves like the dictionary returned by compute_personalized_page_ranks, but a float object is only
+    created for a node when its page rank is looked up, and the dictionary is never built unless it is iterated over
+    completely. The nodes of the view are the nodes of the graph; nodes added to the graph after the page ranks were
+    computed have page rank 0.
+    """
+
+    def __init__(self, graph, node_order, page_ranks):
+        """
+        Initializes the view
+        :param graph: The graph whose nodes are the keys of the view
+        :param node_order: The NodeOrder with which page_ranks is aligned
+        :param page_ranks: The dense array of page ranks
+        """
+        self.graph = graph
+        self.node_order = node_order
+        self.page_ranks = page_ranks
+
+    def __getitem__(self, node):
+        if node not in self.graph:
+            raise KeyError(node)
+        node_id = self.node_order.node_id(node)
+        if node_id is None or node_id >= len(self.page_ranks):
+            return 0.0
+        return float(self.page_ranks[node_id])
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def __len__(self):
+        return self.graph.number_of_nodes()
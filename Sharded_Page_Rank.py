@@ -0,0 +1,589 @@
+"""
+The code in this file computes the personalized page ranks with random walks that are spread over several processes,
+each of which holds the outgoing edges and the visits of a part of the nodes of the graph, so that graphs and random
+walks that do not fit into a single process can be handled.
+"""
+from __future__ import division
+import bisect
+import multiprocessing
+import random
+import zlib
+from collections import deque
+
+from Alias_Table import AliasTable
+
+
+def shard_of(node, number_of_shards, partition=None):
+    """
+    Determines the shard that owns a node. The hash of the node is computed with zlib.crc32 instead of hash, so that
+    all processes agree on the owner of every node.
+    :param node: The node
+    :param number_of_shards: The number of shards
+    :param partition: A dictionary of nodes and the shards that own them, e.g. of partition_graph, None to distribute
+    all nodes by their hash. Nodes that are not in the partition are distributed by their hash.
+    :return: The index of the shard that owns the node
+    """
+    if partition is not None and node in partition:
+        return partition[node]
+    return (zlib.crc32(repr(node)) & 0xffffffff) % number_of_shards
+
+
+def partition_graph(graph, number_of_shards):
+    """
+    Partitions the nodes of a graph into connected blocks of equal size, so that the random walks are handed off
+    between the shards less often than with a partition by hash. The nodes are ordered by a breadth first search of
+    the graph without the directions of the edges, and every shard owns a consecutive part of this order.
+    :param graph: The graph
+    :param number_of_shards: The number of shards
+    :return: A dictionary of nodes and the shards that own them
+    """
+    order = list()
+    seen = set()
+    for root in graph.nodes():
+        if root in seen:
+            continue
+        seen.add(root)
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbor in list(graph.successors(node)) + list(graph.predecessors(node)):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    block_size = max(-(-len(order) // number_of_shards), 1)
+    return {node: position // block_size for position, node in enumerate(order)}
+
+
+class PageRankShard(object):
+    """
+    Class for the part of a sharded personalized page rank engine that runs in one worker process.
+
+    A shard owns a part of the nodes of the graph. For every owned node it keeps the net flows to its neighbors, so
+    the edges of the node are the neighbors with a positive net flow and an edge between nodes of different shards is
+    stored by both of them, with opposite signs. The shard takes all steps of the random walks from its nodes: when a
+    random walk arrives at one of its nodes, the shard records the visit, flips the coin of the reset and steps to a
+    neighbor, until the random walk is reset, reaches a dangling node or steps onto a node of another shard. In the
+    last case the random walk is handed off to the inbox of that shard as a message (walk id, position, node), and
+    otherwise the coordinator is told that the random walk has ended. For every owned node the shard keeps the visit
+    times and the position of the first visit in every random walk, like a RandomWalkIndex, so that the random walks
+    affected by modifications of its nodes can be found and truncated.
+    A shard starts without any nodes and builds its part of the graph from the messages load_node, which the
+    coordinator sends when the shards are started. The random numbers are drawn from a generator of the shard, which
+    is created in the worker process, so that the shards never share the state of their random numbers.
+    """
+
+    def __init__(self, shard_id, number_of_shards, reset_probability, inboxes, results, partition=None, seed=None):
+        """
+        Initializes the shard
+        :param shard_id: The index of the shard
+        :param number_of_shards: The number of shards
+        :param reset_probability: The probability with which a random walk jumps back to the seed node
+        :param inboxes: The queues of messages of all shards
+        :param results: The queue of messages to the coordinator
+        :param partition: The partition of the nodes, see shard_of
+        :param seed: The seed of the random numbers of the shard, None to seed them from the system
+        """
+        self.shard_id = shard_id
+        self.number_of_shards = number_of_shards
+        self.reset_probability = reset_probability
+        self.inboxes = inboxes
+        self.results = results
+        self.flows = dict()
+        self.partition = partition
+        self.seed = seed
+        self.random = None
+
+        self.transition_tables = dict()
+        self.visits = dict()
+        self.first_visits = dict()
+        self.visit_times = dict()
+        self.changed_nodes = set()
+        self.removed_nodes = set()
+        self.hand_offs = 0
+
+    def run(self):
+        """
+        Main loop of the worker process. Handles the messages of the inbox until it receives the message stop.
+        """
+        self.random = random.Random(self.seed)
+        handlers = {'load_node': self.load_node, 'report_loaded': self.report_loaded,
+                    'walk': self.walk, 'continue_walk': self.continue_walk, 'add_node': self.add_node,
+                    'remove_node': self.remove_node, 'add_flow': self.add_flow, 'remove_flow': self.remove_flow,
+                    'rescale_weights': self.rescale_weights, 'affected_walks': self.affected_walks,
+                    'truncate_walks': self.truncate_walks, 'report_visits': self.report_visits}
+        inbox = self.inboxes[self.shard_id]
+        while True:
+            method, arguments = inbox.get()
+            if method == 'stop':
+                break
+            handlers[method](*arguments)
+        return
+
+    def random_step(self, node):
+        """
+        Draws the successor of a node in proportion to the positive net flows to its neighbors
+        :param node: An owned node
+        :return: The successor, None if the node is a dangling node
+        """
+        table = self.transition_tables.get(node)
+        if table is None:
+            successors = [neighbor for neighbor, flow in self.flows[node].iteritems() if flow > 0]
+            cumulated_flows = list()
+            total_flow = 0
+            for successor in successors:
+                total_flow += self.flows[node][successor]
+                cumulated_flows.append(total_flow)
+            table = self.transition_tables[node] = (successors, cumulated_flows)
+        successors, cumulated_flows = table
+        if not successors:
+            return None
+        index = bisect.bisect_right(cumulated_flows, self.random.uniform(0, 1) * cumulated_flows[-1])
+        return successors[min(index, len(successors) - 1)]
+
+    def record_visit(self, walk_id, position, node):
+        """
+        Adds the visit of an owned node by a random walk to the visit times and first visits
+        """
+        self.visits.setdefault(walk_id, list()).append((position, node))
+        self.visit_times[node] = self.visit_times.get(node, 0) + 1
+        walks = self.first_visits.setdefault(node, dict())
+        if walk_id not in walks:
+            walks[walk_id] = position
+        return
+
+    def walk(self, walk_id, position, node):
+        """
+        Continues a random walk that has arrived at an owned node, which it visits at the given position
+        """
+        if node not in self.flows:
+            self.results.put(('done', (walk_id,)))
+            return
+        self.record_visit(walk_id, position, node)
+        self.continue_walk(walk_id, position, node)
+        return
+
+    def continue_walk(self, walk_id, position, node):
+        """
+        Continues a random walk from an owned node whose visit has already been recorded, until the random walk ends
+        or is handed off to another shard
+        :param walk_id: The id of the random walk
+        :param position: The position of the node in the random walk
+        :param node: The node
+        """
+        while self.random.uniform(0, 1) > self.reset_probability:
+            successor = self.random_step(node)
+            if successor is None:
+                break
+            position += 1
+            owner = shard_of(successor, self.number_of_shards, self.partition)
+            if owner != self.shard_id:
+                self.hand_offs += 1
+                self.inboxes[owner].put(('walk', (walk_id, position, successor)))
+                return
+            self.record_visit(walk_id, position, successor)
+            node = successor
+        self.results.put(('done', (walk_id,)))
+        return
+
+    def load_node(self, node, flows):
+        """
+        Adds an owned node of the initial graph with its net flows, without marking its outgoing edges changed
+        :param node: The node
+        :param flows: A dictionary of the neighbors of the node and its net flows to them
+        """
+        self.flows[node] = flows
+        return
+
+    def report_loaded(self):
+        """
+        Tells the coordinator that all nodes of the initial graph sent before have been loaded
+        """
+        self.results.put(('loaded', (self.shard_id,)))
+        return
+
+    def add_node(self, node):
+        """
+        Adds an owned node without any edges
+        """
+        if node not in self.flows:
+            self.flows[node] = dict()
+        return
+
+    def remove_node(self, node):
+        """
+        Removes a node, whether it is owned or not, and the net flows of the owned nodes to it
+        """
+        if node in self.flows:
+            del self.flows[node]
+            self.transition_tables.pop(node, None)
+            self.removed_nodes.add(node)
+        for neighbor, flows in self.flows.iteritems():
+            flow = flows.pop(node, None)
+            if flow is not None and flow > 0:
+                self.changed_nodes.add(neighbor)
+                self.transition_tables.pop(neighbor, None)
+        return
+
+    def add_flow(self, node, neighbor, flow):
+        """
+        Adds to the net flow from an owned node to a neighbor. The outgoing edges of the node have changed if the net
+        flow was or has become positive.
+        """
+        if node not in self.flows:
+            return
+        old_flow = self.flows[node].get(neighbor, 0)
+        new_flow = old_flow + flow
+        if new_flow == 0:
+            self.flows[node].pop(neighbor, None)
+        else:
+            self.flows[node][neighbor] = new_flow
+        if old_flow > 0 or new_flow > 0:
+            self.changed_nodes.add(node)
+            self.transition_tables.pop(node, None)
+        return
+
+    def remove_flow(self, node, neighbor):
+        """
+        Sets the net flow from an owned node to a neighbor to 0
+        """
+        if node not in self.flows:
+            return
+        if self.flows[node].pop(neighbor, 0) > 0:
+            self.changed_nodes.add(node)
+            self.transition_tables.pop(node, None)
+        return
+
+    def rescale_weights(self, factor):
+        """
+        Multiplies all net flows by the same positive factor, which does not change the transition probabilities
+        """
+        for flows in self.flows.itervalues():
+            for neighbor in flows:
+                flows[neighbor] *= factor
+        self.transition_tables.clear()
+        return
+
+    def affected_walks(self):
+        """
+        Reports the random walks that pass through the owned nodes whose outgoing edges have changed since the last
+        call, with the position of the first such node in every random walk. A random walk starting at a removed node
+        is reported with position -1, random walks passing through a removed node later on are reported by the
+        shard of the preceding node, whose edge to the removed node has been removed.
+        """
+        positions = dict()
+        for node in self.changed_nodes:
+            if node not in self.flows:
+                continue
+            for walk_id, position in self.first_visits.get(node, {}).iteritems():
+                if walk_id not in positions or position < positions[walk_id][0]:
+                    positions[walk_id] = (position, node)
+        for node in self.removed_nodes:
+            for walk_id, position in self.first_visits.get(node, {}).iteritems():
+                if position == 0:
+                    positions[walk_id] = (-1, None)
+        self.changed_nodes.clear()
+        self.removed_nodes.clear()
+        self.results.put(('affected_walks', (positions,)))
+        return
+
+    def truncate_walks(self, positions):
+        """
+        Removes the visits of random walks after their truncation positions
+        :param positions: A dictionary of walk ids and pairs of their truncation position and the node at it
+        """
+        for walk_id, (position, node) in positions.iteritems():
+            steps = self.visits.get(walk_id)
+            if steps is None:
+                continue
+            while steps and steps[-1][0] > position:
+                step_position, step_node = steps.pop()
+                self.visit_times[step_node] -= 1
+                if self.visit_times[step_node] == 0:
+                    del self.visit_times[step_node]
+                walks = self.first_visits[step_node]
+                if walks.get(walk_id) == step_position:
+                    del walks[walk_id]
+                    if not walks:
+                        del self.first_visits[step_node]
+            if not steps:
+                del self.visits[walk_id]
+        self.results.put(('truncated_walks', (self.shard_id,)))
+        return
+
+    def report_visits(self):
+        """
+        Reports the visit times of the owned nodes and the number of random walks handed off to other shards
+        """
+        self.results.put(('visits', (dict(self.visit_times), self.hand_offs)))
+        return
+
+
+class ShardedPersonalizedPageRank(object):
+    """
+    Class to compute the personalized page ranks of a graph with random walks spread over several worker processes.
+
+    The nodes of the graph are partitioned between number_of_shards PageRankShards, by the hash of the nodes or by a
+    given partition, e.g. of partition_graph, and every shard runs in its own process on the local machine. The
+    shards exchange the random walks through multiprocessing queues: a random walk is started by sending it to the
+    shard of its origin, and it is handed off from shard to shard whenever it steps onto a node of another shard, so
+    that no shard holds the whole graph or whole random walks. When the shards are started, the coordinator streams
+    the net flows of every node of the graph to the shard owning it, one node at a time, and then drops its reference
+    to the graph, so that afterwards it only keeps the set of nodes and the personalization. Like the engines, it
+    treats the edges as net flows between the nodes, and every modification is routed to the shards owning the nodes
+    whose net flows change.
+    update_random_walks works in three rounds: every shard reports the random walks passing through its nodes with
+    modified outgoing edges, every affected random walk is truncated after the first of these nodes on all shards,
+    and finally the random walks are continued by the shards owning the nodes at which they have been truncated.
+    Unlike the engines, the steps of the affected random walks are not coupled, i.e. a random walk is always
+    recomputed from its first visit of a modified node. A random walk whose origin has been removed is started again
+    at a node drawn from the personalization, from which the removed node is taken out, so that the number of random
+    walks stays the same as long as the personalization has other nodes. The page ranks are the merged visit times of
+    all shards.
+    """
+
+    def __init__(self, graph, node, number_of_random_walks, reset_probability, number_of_shards=2,
+                 personalization=None, partition=None, seed=None):
+        """
+        Initializes the engine. The graph is distributed over the shards by start, which starts their processes.
+        :param graph: The graph for which the page ranks are computed, which is not modified
+        :param node: The seed node at which all random walks begin
+        :param number_of_random_walks: The number of random walks
+        :param reset_probability: The probability with which a random walk jumps back to the seed node
+        :param number_of_shards: The number of worker processes
+        :param personalization: A dictionary of nodes and weights with which the random walks start at them, None to
+        start all random walks at the seed node
+        :param partition: A dictionary of nodes and the shards that own them, None to distribute the nodes by hash
+        :param seed: The seed of the random numbers of the coordinator and the shards, None to seed them from the system
+        """
+        self.graph = graph
+        self.node = node
+        self.number_of_random_walks = number_of_random_walks
+        self.reset_probability = reset_probability
+        self.number_of_shards = number_of_shards
+        self.personalization = dict(personalization) if personalization is not None else {node: 1}
+        self.personalization_table = AliasTable(self.personalization)
+        self.partition = partition
+        self.nodes = set(graph.nodes())
+        self.number_of_started_walks = 0
+        self.hand_offs = 0
+        self.seed = seed
+        self.random = random.Random(seed)
+
+        self.inboxes = [multiprocessing.Queue() for _ in xrange(number_of_shards)]
+        self.results = multiprocessing.Queue()
+        self.processes = list()
+
+    def owner(self, node):
+        """
+        :return: The index of the shard that owns a node
+        """
+        return shard_of(node, self.number_of_shards, self.partition)
+
+    def start(self):
+        """
+        Starts the worker processes of the shards and sends every node of the graph with its net flows to the shard
+        owning it. Returns once all shards have loaded their nodes, so that no random walk is handed off to a shard
+        that has not loaded its nodes yet.
+        """
+        if self.processes:
+            return
+        if self.graph is None:
+            raise RuntimeError("The shards of a stopped engine cannot be started again")
+        for shard_id in xrange(self.number_of_shards):
+            shard = PageRankShard(shard_id, self.number_of_shards, self.reset_probability, self.inboxes, self.results,
+                                  self.partition, self.seed + shard_id + 1 if self.seed is not None else None)
+            process = multiprocessing.Process(target=shard.run, args=[])
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+
+        for graph_node in self.nodes:
+            flows = dict()
+            for neighbor, data in self.graph.succ[graph_node].iteritems():
+                flows[neighbor] = flows.get(neighbor, 0) + data['weight']
+            for neighbor, data in self.graph.pred[graph_node].iteritems():
+                flows[neighbor] = flows.get(neighbor, 0) - data['weight']
+            self.send(graph_node, 'load_node', (graph_node, {neighbor: flow for neighbor, flow in flows.iteritems()
+                                                             if flow != 0}))
+        self.graph = None
+        self.broadcast('report_loaded')
+        self.collect('loaded', self.number_of_shards)
+        return
+
+    def stop(self):
+        """
+        Stops the worker processes of the shards, after they have handled all messages sent to them. The state of the
+        shards is lost, so the engine cannot be started again.
+        """
+        for inbox in self.inboxes:
+            inbox.put(('stop', ()))
+        for process in self.processes:
+            process.join()
+        self.processes = list()
+        return
+
+    def send(self, node, method, arguments):
+        """
+        Sends a message to the shard owning a node
+        """
+        self.inboxes[self.owner(node)].put((method, arguments))
+        return
+
+    def broadcast(self, method, arguments=()):
+        """
+        Sends a message to all shards
+        """
+        for inbox in self.inboxes:
+            inbox.put((method, arguments))
+        return
+
+    def collect(self, method, number_of_messages):
+        """
+        Waits for a number of messages of the shards to the coordinator
+        :param method: The expected kind of the messages
+        :param number_of_messages: The number of messages
+        :return: A list of the arguments of the messages
+        """
+        messages = list()
+        while len(messages) < number_of_messages:
+            message_method, arguments = self.results.get()
+            if message_method != method:
+                raise RuntimeError("Expected %s from the shards, received %s" % (method, message_method))
+            messages.append(arguments)
+        return messages
+
+    def initial_random_walks(self):
+        """
+        Starts the missing random walks at nodes drawn from the personalization and waits until they have ended
+        """
+        number_of_new_walks = self.number_of_random_walks - self.number_of_started_walks
+        for walk_id in xrange(self.number_of_started_walks, self.number_of_random_walks):
+            origin = self.personalization_table.sample(self.random)
+            self.send(origin, 'walk', (walk_id, 0, origin))
+        self.number_of_started_walks = max(self.number_of_started_walks, self.number_of_random_walks)
+        self.collect('done', max(number_of_new_walks, 0))
+        return
+
+    def add_edge(self, source, destination, weight):
+        """
+        Adds weight to the net flow from source to destination, see IncrementalPersonalizedPageRank2.add_edge
+        :param source: source node
+        :param destination: destination node
+        :param weight: weight of the edge
+        """
+        if weight == 0 or source not in self.nodes or destination not in self.nodes:
+            return
+        self.send(source, 'add_flow', (source, destination, weight))
+        self.send(destination, 'add_flow', (destination, source, -weight))
+        return
+
+    def add_weight_to_edge(self, source, destination, weight):
+        """
+        Adds weight to the net flow from source to destination, see IncrementalPersonalizedPageRank2.add_weight_to_edge
+        :param source: source node of the edge
+        :param destination: destination node of the edge
+        :param weight: weight added to the edge
+        """
+        self.add_edge(source, destination, weight)
+        return
+
+    def remove_edge(self, source, destination):
+        """
+        Removes the edge between two nodes, whatever its direction
+        :param source: source node of the edge
+        :param destination: destination node of the edge
+        """
+        if source not in self.nodes or destination not in self.nodes:
+            return
+        self.send(source, 'remove_flow', (source, destination))
+        self.send(destination, 'remove_flow', (destination, source))
+        return
+
+    def add_node(self, node):
+        """
+        Adds a node to the graph
+        :param node: Node that is to be added
+        """
+        if node not in self.nodes:
+            self.nodes.add(node)
+            self.send(node, 'add_node', (node,))
+        return
+
+    def remove_node(self, node):
+        """
+        Removes a node from the graph. All shards are told, so that they remove the net flows of their nodes to it.
+        The node is also taken out of the personalization, unless it is its only node.
+        :param node: node that is to be removed
+        """
+        if node in self.nodes:
+            self.nodes.discard(node)
+            self.broadcast('remove_node', (node,))
+            if node in self.personalization and len(self.personalization) > 1:
+                del self.personalization[node]
+                self.personalization_table = AliasTable(self.personalization)
+        return
+
+    def rescale_weights(self, factor):
+        """
+        Multiplies the weights of all edges by the same positive factor, e.g. as the rescale function of a TimeDecay
+        :param factor: The positive factor
+        """
+        self.broadcast('rescale_weights', (factor,))
+        return
+
+    def update_random_walks(self):
+        """
+        Recomputes the random walks passing through nodes whose outgoing edges have been modified, from the first
+        visit of such a node on, and starts the random walks whose origin has been removed again from the
+        personalization
+        :return: The number of random walks that have been recomputed
+        """
+        self.broadcast('affected_walks')
+        positions = dict()
+        for shard_positions, in self.collect('affected_walks', self.number_of_shards):
+            for walk_id, (position, node) in shard_positions.iteritems():
+                if walk_id not in positions or position < positions[walk_id][0]:
+                    positions[walk_id] = (position, node)
+        if not positions:
+            return 0
+        # All visits after the truncation positions must be removed before the random walks continue
+        self.broadcast('truncate_walks', (positions,))
+        self.collect('truncated_walks', self.number_of_shards)
+        number_of_continued_walks = 0
+        for walk_id, (position, node) in positions.iteritems():
+            if position >= 0:
+                self.send(node, 'continue_walk', (walk_id, position, node))
+            else:
+                origin = self.personalization_table.sample(self.random)
+                self.send(origin, 'walk', (walk_id, 0, origin))
+            number_of_continued_walks += 1
+        self.collect('done', number_of_continued_walks)
+        return number_of_continued_walks
+
+    def visit_times(self):
+        """
+        :return: A dictionary of nodes and the number of times the random walks pass through them, merged from the
+        visit times of all shards
+        """
+        self.broadcast('report_visits')
+        visit_times = dict()
+        self.hand_offs = 0
+        for shard_visit_times, hand_offs in self.collect('visits', self.number_of_shards):
+            visit_times.update(shard_visit_times)
+            self.hand_offs += hand_offs
+        return visit_times
+
+    def compute_personalized_page_ranks(self):
+        """
+        Determines the personalized page ranks from the visit times of all shards
+        :return: A dictionary of nodes and corresponding page ranks
+        """
+        page_ranks = dict.fromkeys(self.nodes, 0)
+        visit_times = {node: visits for node, visits in self.visit_times().iteritems() if node in page_ranks}
+        total_visit_times = sum(visit_times.values())
+        if total_visit_times == 0:
+            return page_ranks
+        for node, visits in visit_times.iteritems():
+            page_ranks[node] = float(visits) / total_visit_times
+        return page_ranks
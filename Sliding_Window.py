@@ -0,0 +1,174 @@
+"""
+The code in this file restricts the graph of an incremental personalized page rank engine to the interactions of a
+sliding window of time, e.g. the last 30 days, by expiring old interactions incrementally.
+"""
+from __future__ import division
+import heapq
+
+
+class SlidingWindow(object):
+    """
+    Class to feed the interactions between peers into an incremental personalized page rank engine and to take them
+    out again once they are older than the window.
+
+    The net flows of data between every pair of peers are kept in buckets of bucket_size units of time, i.e. all
+    interactions whose timestamps fall into the same bucket are summed up per pair. A bucket expires as soon as its
+    newest possible interaction is older than the window, so an interaction is taken out of the graph between window
+    and window + bucket_size after it took place. The expiry times of the buckets are kept in a heap, and advance
+    pops the expired buckets and subtracts their net flows from the edges with add_weight_to_edge, which flips the
+    direction of an edge when the sign of the net flow changes and removes the edge when the net flow becomes 0.
+    Every interaction and expiry is therefore an ordinary modification of the engine, whose random walks are repaired
+    incrementally by update_random_walks, and the window slides without ever recomputing the page ranks.
+    Only the interactions added through the window expire, so the graph of the engine should not contain other edges.
+    The engine can be wrapped, e.g. by an UpdateScheduler or a LazyPageRank, as long as it offers add_node and
+    add_weight_to_edge. While a data set is ingested there is no engine yet, so the window then modifies a plain
+    graph through a WindowGraph, and the engine built on that graph is attached afterwards.
+    """
+
+    def __init__(self, page_rank, window, bucket_size=None, graph=None):
+        """
+        Initializes an empty window
+        :param page_rank: The engine, or a wrapper of it, to which the modifications are passed
+        :param window: The length of the window in units of the timestamps
+        :param bucket_size: The length of a bucket in units of the timestamps, None for a hundredth of the window
+        :param graph: The graph of the engine, None for page_rank.graph
+        """
+        self.page_rank = page_rank
+        self.window = window
+        self.bucket_size = bucket_size if bucket_size is not None else window / 100
+        self.graph = graph if graph is not None else page_rank.graph
+
+        self.buckets = dict()
+        self.expiry_heap = list()
+        self.net_flows = dict()
+        self.live_buckets = dict()
+        self.now = None
+
+    def attach(self, page_rank):
+        """
+        Passes all later modifications to an engine whose graph is the graph of the window, e.g. after ingestion
+        :param page_rank: The engine, or a wrapper of it, to which the modifications are passed
+        """
+        self.page_rank = page_rank
+        return
+
+    def add_interaction(self, source, destination, weight, timestamp):
+        """
+        Adds the net flow of data of an interaction to the graph and expires the buckets that have become too old
+        :param source: The peer that has uploaded the data
+        :param destination: The peer that has downloaded the data
+        :param weight: The amount of data that has been transferred
+        :param timestamp: The time of the interaction
+        :return: True if the interaction has been added, False if it is already older than the window
+        """
+        self.advance(timestamp)
+        if timestamp <= self.now - self.window or weight == 0 or source == destination:
+            return False
+        # The net flow of a pair is kept in the direction from the smaller to the larger peer
+        pair = (source, destination) if source < destination else (destination, source)
+        flow = weight if pair[0] == source else -weight
+
+        bucket_index = int(timestamp // self.bucket_size)
+        bucket = self.buckets.get(bucket_index)
+        if bucket is None:
+            bucket = self.buckets[bucket_index] = dict()
+            heapq.heappush(self.expiry_heap, ((bucket_index + 1) * self.bucket_size + self.window, bucket_index))
+        if pair not in bucket:
+            bucket[pair] = 0
+            self.live_buckets[pair] = self.live_buckets.get(pair, 0) + 1
+        bucket[pair] += flow
+
+        for node in pair:
+            if node not in self.graph:
+                self.page_rank.add_node(node)
+        self.change_net_flow(pair, self.net_flows.get(pair, 0) + flow)
+        return True
+
+    def advance(self, now):
+        """
+        Moves the window forward and expires all buckets whose interactions are older than the window
+        :param now: The current time, earlier times than the latest one are ignored
+        :return: The number of buckets that have expired
+        """
+        if self.now is None or now > self.now:
+            self.now = now
+        number_of_expired_buckets = 0
+        while self.expiry_heap and self.expiry_heap[0][0] <= self.now:
+            expiry_time, bucket_index = heapq.heappop(self.expiry_heap)
+            for pair, flow in self.buckets.pop(bucket_index).iteritems():
+                self.live_buckets[pair] -= 1
+                if self.live_buckets[pair] == 0:
+                    # Setting the net flow to 0 exactly removes the edge despite rounding errors
+                    del self.live_buckets[pair]
+                    self.change_net_flow(pair, 0)
+                else:
+                    self.change_net_flow(pair, self.net_flows[pair] - flow)
+            number_of_expired_buckets += 1
+        return number_of_expired_buckets
+
+    def change_net_flow(self, pair, net_flow):
+        """
+        Passes the change of the net flow of a pair of peers to the engine
+        :param pair: The pair of peers, ordered
+        :param net_flow: The new net flow from the first to the second peer
+        """
+        old_net_flow = self.net_flows.get(pair, 0)
+        delta = net_flow - old_net_flow
+        # The net flow is updated exactly like the weight of the edge in the engine, so that both remain equal
+        if old_net_flow + delta == 0:
+            self.net_flows.pop(pair, None)
+        else:
+            self.net_flows[pair] = old_net_flow + delta
+        if delta != 0:
+            self.page_rank.add_weight_to_edge(pair[0], pair[1], delta)
+        return
+
+    def window_graph_edges(self):
+        """
+        :return: A list of the edges (source, destination, net flow) that the graph has according to the window
+        """
+        return [(pair[0], pair[1], net_flow) if net_flow > 0 else (pair[1], pair[0], -net_flow)
+                for pair, net_flow in self.net_flows.iteritems()]
+
+
+class WindowGraph(object):
+    """
+    Class to apply the modifications of a SlidingWindow to a plain graph, before an engine is built on it.
+
+    add_weight_to_edge changes the weight of an edge exactly like IncrementalPersonalizedPageRank2.add_weight_to_edge,
+    flipping the edge when its weight becomes negative and removing it when its weight becomes 0, but without keeping
+    track of the modifications for random walks.
+    """
+
+    def __init__(self, graph):
+        """
+        Initializes the adapter
+        :param graph: The graph that is modified
+        """
+        self.graph = graph
+
+    def add_node(self, node):
+        """
+        Adds a node to the graph
+        :param node: Node that is to be added
+        """
+        self.graph.add_node(node)
+        return
+
+    def add_weight_to_edge(self, source, destination, weight):
+        """
+        Adds weight to the edge from source to destination, or subtracts it from the edge in the opposite direction
+        :param source: source node of the edge
+        :param destination: destination node of the edge
+        :param weight: weight added to the edge
+        """
+        if self.graph.has_edge(destination, source):
+            source, destination, weight = destination, source, -weight
+        if self.graph.has_edge(source, destination):
+            weight += self.graph[source][destination]['weight']
+            self.graph.remove_edge(source, destination)
+        if weight > 0:
+            self.graph.add_edge(source, destination, weight=weight)
+        elif weight < 0:
+            self.graph.add_edge(destination, source, weight=-weight)
+        return
@@ -12,10 +12,9 @@ from __future__ import division
 import networkx as nx
 import matplotlib.pyplot as plt
 import random
-import numpy as np
-from Page_Rank2 import IncrementalPersonalizedPageRank2
+from Sybil_Evaluation import SybilEvaluation
+from Sybil_Metrics import scores_and_labels, area_under_roc_curve, false_rates
 import matplotlib.patches as mpatches
-import copy
 
 
 random.seed(135)  # 7
@@ -57,67 +56,44 @@ initial_graph = nx.compose(honest_region, sybil_region)
 # nx.draw_circular(graph, node_size=30, edge_width=0.0005, node_color=node_color, with_labels=True)
 # plt.show()
 
-area_ROC = []
-false_positives = []
-false_negatives = []
-for reset_probability in reset_probabilities:
-    graph = copy.deepcopy(initial_graph)
-    for number_of_attack_edges in range(500):
-        for _ in range(number_of_attack_edges):
-            honest_node = random.choice(list(honest_region.nodes()))
-            sybil_node = random.choice(list(sybil_region.nodes()))
-
-            r = random.uniform(0, 1)
-            if r < 0.5:
-                graph.add_weighted_edges_from([(honest_node, sybil_node, random.randint(1, 10))])
-            else:
-                graph.add_weighted_edges_from([(sybil_node, honest_node, random.randint(1, 10))])
-
-        #  nx.draw_circular(graph, node_size=30, edge_width=0.0005, node_color=node_color, with_labels=True)
-        #  plt.show()
+def evaluate(page_ranks):
+    """
+    Computes the area under the ROC curve and the false rates of the ranked list of all nodes, where the pivot point
+    lies below the number_of_honest_nodes highest ranked nodes. Nodes that were never visited have the page rank 0.
+    :param page_ranks: A dictionary of nodes and corresponding page ranks
+    :return: A tuple of the area under the ROC curve, the false positive rate and the false negative rate
+    """
+    scores, labels = scores_and_labels(page_ranks, honest_nodes, sybil_nodes)
 
-        #  print nx.shortest_path(graph, 501, 502)
+    # ROC_abscissa, ROC_ordinate = roc_curve(scores, labels)
+    # plt.plot(ROC_abscissa, ROC_ordinate)
+    # plt.show()
 
-        """for i in sybil_nodes:
-            try:
-                print nx.shortest_path(graph, 0, i)
-            except nx.exception.NetworkXNoPath:
-                print "No path between 0 and ", i"""
+    false_positive_rate, false_negative_rate = false_rates(scores, labels, number_of_honest_nodes)
+    return area_under_roc_curve(scores, labels), false_positive_rate, false_negative_rate
 
-        pr = IncrementalPersonalizedPageRank2(graph, 0, 200, reset_probability)
-        pr.initial_random_walks()
-        page_ranks = pr.compute_personalized_page_ranks()
-        truncated_page_ranks = {k: v for k, v in page_ranks.items() if v != 0}
-        page_ranks_list = sorted(truncated_page_ranks.iteritems(), key=lambda (k, v): (v, k), reverse=True)
-        print page_ranks_list
-        ordered_nodes = list(zip(*page_ranks_list)[0])
 
-        ROC_abscissa = []
-        ROC_ordinate = []
-        for i in range(1, len(ordered_nodes)+1):
-            positives = ordered_nodes[:i]  # Non Sybils
-            negatives = ordered_nodes[i:]  # Sybils
-            ROC_abscissa.append(len(set(positives).intersection(set(sybil_region.nodes()))) / len(sybil_region.nodes()))
-            ROC_ordinate.append(len(set(positives).intersection(set(honest_region.nodes()))) / len(honest_region.nodes()))
-
-        # plt.plot(ROC_abscissa, ROC_ordinate)
-        # plt.show()
-
-        area_ROC.append(np.trapz(ROC_ordinate, ROC_abscissa))
-        false_positives.append(len(list(set(ordered_nodes[:number_of_honest_nodes]).intersection(set(sybil_nodes)))) /
-                               number_of_sybil_nodes)
-        false_negatives.append(len(list(set(ordered_nodes[number_of_honest_nodes:]).intersection(set(honest_nodes)))) /
-                               number_of_honest_nodes)
+# One engine per reset probability, updated incrementally after every new attack edge
+number_of_steps = 50
+evaluation = SybilEvaluation(honest_region, sybil_region, 0, reset_probabilities, 200, random.Random(135))
+results = evaluation.run(number_of_steps, attack_edges_per_step=1, evaluate=evaluate)
 
+area_ROC = []
+false_positives = []
+false_negatives = []
+for reset_probability in reset_probabilities:
+    area_ROC.extend(result[0] for result in results[reset_probability][:number_of_steps])
+    false_positives.extend(result[1] for result in results[reset_probability][:number_of_steps])
+    false_negatives.extend(result[2] for result in results[reset_probability][:number_of_steps])
 
 plt.plot(range(50), area_ROC[:50], 'r',
          range(50), area_ROC[50:100], 'g',
          range(50), area_ROC[100:150], 'b',
          range(50), area_ROC[150:200], 'y')
-red_patch = mpatches.Patch(color='red', label='Reset Probability 0.1')
-green_patch = mpatches.Patch(color='green', label='Reset Probability 0.3')
-blue_patch = mpatches.Patch(color='blue', label='Reset Probability 0.5')
-yellow_patch = mpatches.Patch(color='yellow', label='Reset Probability 0.7')
+red_patch = mpatches.Patch(color='red', label='Reset Probability 0.001')
+green_patch = mpatches.Patch(color='green', label='Reset Probability 0.005')
+blue_patch = mpatches.Patch(color='blue', label='Reset Probability 0.01')
+yellow_patch = mpatches.Patch(color='yellow', label='Reset Probability 0.05')
 plt.legend(handles=[red_patch, green_patch, blue_patch, yellow_patch])
 plt.xlabel("Number of Attack Edges")
 plt.ylabel("Area under ROC Curve")
@@ -129,10 +105,10 @@ plt.plot(range(50), false_positives[:50], 'r',
          range(50), false_positives[50:100], 'g',
          range(50), false_positives[100:150], 'b',
          range(50), false_positives[150:200], 'y')
-red_patch = mpatches.Patch(color='red', label='Reset Probability 0.1')
-green_patch = mpatches.Patch(color='green', label='Reset Probability 0.3')
-blue_patch = mpatches.Patch(color='blue', label='Reset Probability 0.5')
-yellow_patch = mpatches.Patch(color='yellow', label='Reset Probability 0.7')
+red_patch = mpatches.Patch(color='red', label='Reset Probability 0.001')
+green_patch = mpatches.Patch(color='green', label='Reset Probability 0.005')
+blue_patch = mpatches.Patch(color='blue', label='Reset Probability 0.01')
+yellow_patch = mpatches.Patch(color='yellow', label='Reset Probability 0.05')
 plt.legend(handles=[red_patch, green_patch, blue_patch, yellow_patch])
 plt.xlabel("Number of Attack Edges")
 plt.ylabel("Proportion of False Positives")
@@ -144,10 +120,10 @@ plt.plot(range(50), false_negatives[:50], 'r',
          range(50), false_negatives[50:100], 'g',
          range(50), false_negatives[100:150], 'b',
          range(50), false_negatives[150:200], 'y')
-red_patch = mpatches.Patch(color='red', label='Reset Probability 0.1')
-green_patch = mpatches.Patch(color='green', label='Reset Probability 0.3')
-blue_patch = mpatches.Patch(color='blue', label='Reset Probability 0.5')
-yellow_patch = mpatches.Patch(color='yellow', label='Reset Probability 0.7')
+red_patch = mpatches.Patch(color='red', label='Reset Probability 0.001')
+green_patch = mpatches.Patch(color='green', label='Reset Probability 0.005')
+blue_patch = mpatches.Patch(color='blue', label='Reset Probability 0.01')
+yellow_patch = mpatches.Patch(color='yellow', label='Reset Probability 0.05')
 plt.legend(handles=[red_patch, green_patch, blue_patch, yellow_patch])
 plt.xlabel("Number of Attack Edges")
 plt.ylabel("Proportion of False Negatives")
@@ -0,0 +1,107 @@
+"""
+The code in this file evaluates the Sybil resistance of the incremental personalized page rank while a Sybil region
+gradually attaches itself to an honest region by means of attack edges.
+"""
+import random
+
+import networkx as nx
+from Page_Rank2 import IncrementalPersonalizedPageRank2
+
+
+class SybilEvaluation(object):
+    """
+    Class to evaluate the page ranks of an honest and a Sybil region for a growing number of attack edges.
+
+    Instead of computing new random walks on the entire graph after every batch of attack edges, a single incremental
+    personalized page rank engine is kept per reset probability. The random walks of each engine are computed once,
+    on the graph without attack edges. Thereafter every batch of attack edges is added to the engines with add_edge
+    and only the random walks passing through the source nodes of the attack edges are recomputed with
+    update_random_walks. A sweep over many attack edges therefore costs roughly one initial computation of the random
+    walks plus the updates. All engines receive the same attack edges, so that the reset probabilities are compared on
+    the same sequence of graphs.
+    An attack edge connects a random honest node and a random Sybil node, in either direction with equal probability.
+    """
+
+    def __init__(self, honest_region, sybil_region, seed_node, reset_probabilities, number_of_random_walks=200,
+                 rng=None):
+        """
+        Initializes the evaluation and computes the initial random walks of every engine
+        :param honest_region: The graph of the honest region, which contains the seed node
+        :param sybil_region: The graph of the Sybil region
+        :param seed_node: The seed node of the personalized page ranks
+        :param reset_probabilities: The reset probabilities for which the page ranks are evaluated
+        :param number_of_random_walks: The number of random walks of every engine
+        :param rng: The random number generator with which attack edges are drawn
+        """
+        self.honest_nodes = list(honest_region.nodes())
+        self.sybil_nodes = list(sybil_region.nodes())
+        self.reset_probabilities = reset_probabilities
+        self.rng = rng if rng is not None else random.Random()
+        self.number_of_attack_edges = 0
+
+        graph = nx.compose(honest_region, sybil_region)
+        self.page_ranks = dict()
+        self.results = dict()
+        for reset_probability in reset_probabilities:
+            pr = IncrementalPersonalizedPageRank2(graph.copy(), seed_node, number_of_random_walks, reset_probability)
+            pr.initial_random_walks()
+            self.page_ranks[reset_probability] = pr
+            self.results[reset_probability] = list()
+
+    def attack_edges(self, number_of_attack_edges):
+        """
+        Draws a batch of attack edges
+        :param number_of_attack_edges: The number of attack edges in the batch
+        :return: A list of (source, destination, weight) tuples
+        """
+        edges = []
+        for _ in xrange(number_of_attack_edges):
+            honest_node = self.rng.choice(self.honest_nodes)
+            sybil_node = self.rng.choice(self.sybil_nodes)
+            weight = self.rng.randint(1, 10)
+            if self.rng.uniform(0, 1) < 0.5:
+                edges.append((honest_node, sybil_node, weight))
+            else:
+                edges.append((sybil_node, honest_node, weight))
+        return edges
+
+    def add_attack_edges(self, edges):
+        """
+        Adds a batch of attack edges to the graphs of all engines and updates their random walks
+        :param edges: A list of (source, destination, weight) tuples
+        """
+        for reset_probability in self.reset_probabilities:
+            pr = self.page_ranks[reset_probability]
+            for source, destination, weight in edges:
+                pr.add_edge(source, destination, weight)
+            pr.update_random_walks()
+        self.number_of_attack_edges += len(edges)
+        return
+
+    def record(self, evaluate=None):
+        """
+        Computes the page ranks of all engines and records them, or the result of evaluating them
+        :param evaluate: A function taking the dictionary of page ranks and returning the recorded result, None to
+        record the page ranks themselves
+        """
+        for reset_probability in self.reset_probabilities:
+            page_ranks = self.page_ranks[reset_probability].compute_personalized_page_ranks()
+            self.results[reset_probability].append(evaluate(page_ranks) if evaluate is not None else page_ranks)
+        return
+
+    def run(self, number_of_steps, attack_edges_per_step=1, evaluate=None):
+        """
+        Records the page ranks before any attack edges are added and after every one of number_of_steps batches of
+        attack edges, so that the results of every reset probability consist of number_of_steps + 1 entries
+        :param number_of_steps: The number of batches of attack edges
+        :param attack_edges_per_step: The number of attack edges per batch
+        :param evaluate: A function taking the dictionary of page ranks and returning the recorded result, None to
+        record the page ranks themselves
+        :return: A dictionary of reset probabilities and the corresponding lists of results
+        """
+        if not any(self.results.values()):
+            self.record(evaluate)
+        for _ in xrange(number_of_steps):
+            self.add_attack_edges(self.attack_edges(attack_edges_per_step))
+            self.record(evaluate)
+        return self.results
@@ -0,0 +1,116 @@
+"""
+The code in this file measures how well a ranking of the nodes, e.g. by their personalized page ranks, separates the
+honest nodes from the Sybil nodes. A node above the pivot point in the ranked list is considered honest and a node
+below it a Sybil. If a Sybil is ranked above the pivot point it is a false positive and if an honest node is ranked
+below the pivot point it is a false negative. The ROC curve plots the true positive rate against the false positive
+rate as the pivot point moves down the ranked list and the area under the ROC curve is the probability that a random
+honest node is ranked higher than a random Sybil.
+
+All functions take an array of scores and an array of labels, True for honest nodes and False for Sybils, and need a
+single sort and cumulative sums, so that they run in O(n log n). Nodes with equal scores cannot be ordered, so the
+pivot point moves past a group of tied nodes at once, i.e. the ROC curve connects the points before and after the
+group by a straight line and a pivot point inside the group counts every node of the group in proportion to how much
+of the group lies above the pivot point. Nodes that were never visited by a random walk have the score 0 and form one
+such group at the bottom of the ranked list.
+"""
+from __future__ import division
+import numpy as np
+
+
+def scores_and_labels(page_ranks, honest_nodes, sybil_nodes):
+    """
+    Converts page ranks into arrays of scores and labels. Nodes without a page rank get the score 0.
+    :param page_ranks: A dictionary of nodes and corresponding page ranks
+    :param honest_nodes: The honest nodes
+    :param sybil_nodes: The Sybil nodes
+    :return: A tuple of an array of scores and an array of labels, True for honest nodes
+    """
+    honest_nodes = list(honest_nodes)
+    sybil_nodes = list(sybil_nodes)
+    scores = np.array([page_ranks.get(node, 0) for node in honest_nodes] +
+                      [page_ranks.get(node, 0) for node in sybil_nodes], dtype=float)
+    labels = np.zeros(len(scores), dtype=bool)
+    labels[:len(honest_nodes)] = True
+    return scores, labels
+
+
+def ranked_counts(scores, labels):
+    """
+    Sorts the nodes by decreasing score and counts the honest nodes and Sybils above every boundary between two groups
+    of tied nodes
+    :param scores: An array of scores
+    :param labels: An array of labels, True for honest nodes
+    :return: A tuple of three arrays of length number of groups + 1: the number of nodes, the number of honest nodes
+    and the number of Sybils above every boundary, starting with the boundary at the top of the ranked list
+    """
+    scores = np.asarray(scores, dtype=float)
+    labels = np.asarray(labels, dtype=bool)
+    order = np.argsort(-scores, kind='mergesort')
+    ranked_scores = scores[order]
+    ranked_labels = labels[order]
+    group_ends = np.flatnonzero(ranked_scores[1:] != ranked_scores[:-1])
+    if len(ranked_scores) > 0:
+        group_ends = np.append(group_ends, len(ranked_scores) - 1)
+    honest = np.concatenate(([0], np.cumsum(ranked_labels)[group_ends]))
+    nodes = np.concatenate(([0], group_ends + 1))
+    return nodes, honest, nodes - honest
+
+
+def roc_curve(scores, labels):
+    """
+    Computes the ROC curve
+    :param scores: An array of scores
+    :param labels: An array of labels, True for honest nodes
+    :return: A tuple of an array of false positive rates and an array of true positive rates, from (0, 0) to (1, 1)
+    """
+    nodes, honest, sybils = ranked_counts(scores, labels)
+    return sybils / max(sybils[-1], 1), honest / max(honest[-1], 1)
+
+
+def area_under_roc_curve(scores, labels):
+    """
+    Computes the area under the ROC curve, i.e. the probability that a random honest node has a higher score than a
+    random Sybil, where ties count for one half
+    :param scores: An array of scores
+    :param labels: An array of labels, True for honest nodes
+    :return: The area under the ROC curve
+    """
+    false_positive_rates, true_positive_rates = roc_curve(scores, labels)
+    return np.trapz(true_positive_rates, false_positive_rates)
+
+
+def false_rates(scores, labels, pivots):
+    """
+    Computes the false positive and false negative rates for pivot points at given positions of the ranked list
+    :param scores: An array of scores
+    :param labels: An array of labels, True for honest nodes
+    :param pivots: The numbers of nodes above the pivot points, an integer or an array of integers
+    :return: A tuple of the false positive rates, i.e. the fraction of Sybils above the pivot points, and the false
+    negative rates, i.e. the fraction of honest nodes below the pivot points
+    """
+    nodes, honest, sybils = ranked_counts(scores, labels)
+    pivots = np.clip(pivots, 0, nodes[-1])
+    # Linear interpolation between the boundaries of the groups counts a group in proportion to its part above a pivot
+    honest_above = np.interp(pivots, nodes, honest)
+    sybils_above = np.interp(pivots, nodes, sybils)
+    return sybils_above / max(sybils[-1], 1), (honest[-1] - honest_above) / max(honest[-1], 1)
+
+
+def false_negative_rate_at(scores, labels, false_positive_rate):
+    """
+    Moves the pivot point down the ranked list until the given false positive rate is reached and computes the false
+    negative rate at that pivot point
+    :param scores: An array of scores
+    :param labels: An array of labels, True for honest nodes
+    :param false_positive_rate: The fixed false positive rate, e.g. 0.2
+    :return: The false negative rate
+    """
+    false_positive_rates, true_positive_rates = roc_curve(scores, labels)
+    # The false positive rates do not decrease along the curve, so the last point at which the false positive rate
+    # is not exceeded is the lowest pivot point between groups, from which the pivot point moves into the next group
+    index = np.searchsorted(false_positive_rates, false_positive_rate, side='right') - 1
+    if index >= len(false_positive_rates) - 1:
+        return 1 - true_positive_rates[-1]
+    fraction = (false_positive_rate - false_positive_rates[index]) / \
+        (false_positive_rates[index + 1] - false_positive_rates[index])
+    return 1 - (true_positive_rates[index] + fraction * (true_positive_rates[index + 1] - true_positive_rates[index]))
@@ -0,0 +1,245 @@
+"""
+In this code we run many Sybil attack scenarios, i.e. combinations of a reset probability, a number of attack edges
+and a random seed, in a pool of processes and collect the area under the ROC curve and the false rates of every
+scenario in one table. The honest and the Sybil region are published once in shared memory in compressed sparse row
+form, from which every worker process builds the graphs a single time, and every scenario adds its attack edges to
+its own copy of these graphs.
+Scenarios with the same reset probability and seed only differ in the number of attack edges, so they are run as one
+task by a SybilEvaluation, which adds the attack edges incrementally and updates the random walks after every number
+of attack edges instead of computing them again.
+
+Usage:
+    python Sybil_Scenarios.py --reset-probabilities 0.001 0.01 0.05 --attack-edges 0 10 50 100 500 --seeds 1 2 3
+"""
+from __future__ import division
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+from multiprocessing.sharedctypes import RawArray
+from timeit import default_timer
+
+import networkx as nx
+from Sybil_Evaluation import SybilEvaluation
+from Sybil_Metrics import scores_and_labels, area_under_roc_curve, false_rates, false_negative_rate_at
+
+# Regions of the worker processes, built once per process from the shared graph by initialize_worker
+worker_regions = None
+worker_arguments = None
+
+
+class SharedGraph(object):
+    """
+    Class to publish a weighted directed graph of an honest and a Sybil region in shared memory.
+
+    The nodes are numbered in the order of the list nodes, the honest nodes first. The outgoing edges of node i are
+    stored in indices[indptr[i]:indptr[i + 1]] with the weights in weights[indptr[i]:indptr[i + 1]], where the arrays
+    are RawArrays that are shared with the worker processes of a pool instead of being pickled for every task.
+    """
+
+    def __init__(self, honest_region, sybil_region):
+        """
+        Converts the regions into shared arrays
+        :param honest_region: The graph of the honest region
+        :param sybil_region: The graph of the Sybil region
+        """
+        self.nodes = list(honest_region.nodes()) + list(sybil_region.nodes())
+        self.number_of_honest_nodes = honest_region.number_of_nodes()
+        node_ids = {node: node_id for node_id, node in enumerate(self.nodes)}
+        number_of_edges = honest_region.number_of_edges() + sybil_region.number_of_edges()
+
+        self.indptr = RawArray('l', len(self.nodes) + 1)
+        self.indices = RawArray('l', number_of_edges)
+        self.weights = RawArray('d', number_of_edges)
+        position = 0
+        for node_id, node in enumerate(self.nodes):
+            region = honest_region if node_id < self.number_of_honest_nodes else sybil_region
+            for neighbor, data in region[node].iteritems():
+                self.indices[position] = node_ids[neighbor]
+                self.weights[position] = data['weight']
+                position += 1
+            self.indptr[node_id + 1] = position
+
+    def regions(self):
+        """
+        Builds the graphs of the regions from the shared arrays
+        :return: A tuple of the graph of the honest region and the graph of the Sybil region
+        """
+        indptr = self.indptr[:]
+        indices = self.indices[:]
+        weights = self.weights[:]
+        regions = (nx.DiGraph(), nx.DiGraph())
+        regions[0].add_nodes_from(self.nodes[:self.number_of_honest_nodes])
+        regions[1].add_nodes_from(self.nodes[self.number_of_honest_nodes:])
+        for node_id, node in enumerate(self.nodes):
+            region = regions[0] if node_id < self.number_of_honest_nodes else regions[1]
+            region.add_weighted_edges_from((node, self.nodes[indices[position]], weights[position])
+                                           for position in xrange(indptr[node_id], indptr[node_id + 1]))
+        return regions
+
+
+def initialize_worker(shared_graph, arguments):
+    """
+    Builds the regions in a worker process
+    :param shared_graph: The SharedGraph
+    :param arguments: A dictionary with the seed node, the number of random walks, the pivot point and the fixed
+    false positive rate
+    """
+    global worker_regions, worker_arguments
+    worker_regions = shared_graph.regions()
+    worker_arguments = arguments
+    return
+
+
+def evaluate(page_ranks):
+    """
+    Evaluates the page ranks of the regions of the worker process
+    :param page_ranks: A dictionary of nodes and corresponding page ranks
+    :return: A dictionary with the area under the ROC curve, the false rates at the pivot point and the false
+    negative rate at the fixed false positive rate
+    """
+    scores, labels = scores_and_labels(page_ranks, worker_regions[0].nodes(), worker_regions[1].nodes())
+    false_positive_rate, false_negative_rate = false_rates(scores, labels, worker_arguments['pivot'])
+    return {'area_under_roc_curve': area_under_roc_curve(scores, labels),
+            'false_positive_rate': false_positive_rate,
+            'false_negative_rate': false_negative_rate,
+            'false_negative_rate_at_fixed_false_positive_rate':
+                false_negative_rate_at(scores, labels, worker_arguments['false_positive_rate'])}
+
+
+def run_scenarios(task):
+    """
+    Runs all scenarios with the same reset probability and seed in a worker process
+    :param task: A tuple (reset probability, seed, increasing list of numbers of attack edges)
+    :return: A list of result dictionaries, one per number of attack edges. The seconds of a result are the time of
+    its own step, i.e. adding its attack edges, updating the random walks and evaluating the page ranks, where the
+    first step also includes computing the initial random walks.
+    """
+    reset_probability, seed, numbers_of_attack_edges = task
+    random.seed(seed)
+    start_time = default_timer()
+    evaluation = SybilEvaluation(worker_regions[0], worker_regions[1], worker_arguments['seed_node'],
+                                 [reset_probability], worker_arguments['random_walks'], random.Random(seed))
+    results = []
+    for number_of_attack_edges in numbers_of_attack_edges:
+        evaluation.add_attack_edges(evaluation.attack_edges(number_of_attack_edges -
+                                                            evaluation.number_of_attack_edges))
+        evaluation.record(evaluate)
+        step_time = default_timer()
+        result = {'reset_probability': reset_probability,
+                  'attack_edges': number_of_attack_edges,
+                  'seed': seed,
+                  'seconds': step_time - start_time}
+        result.update(evaluation.results[reset_probability][-1])
+        results.append(result)
+        start_time = step_time
+    return results
+
+
+def run(honest_region, sybil_region, seed_node, reset_probabilities, numbers_of_attack_edges, seeds,
+        random_walks=200, pivot=None, false_positive_rate=0.2, processes=None):
+    """
+    Runs all combinations of reset probabilities, numbers of attack edges and seeds
+    :param honest_region: The graph of the honest region, which contains the seed node
+    :param sybil_region: The graph of the Sybil region
+    :param seed_node: The seed node of the personalized page ranks
+    :param reset_probabilities: The reset probabilities
+    :param numbers_of_attack_edges: The numbers of attack edges
+    :param seeds: The random seeds
+    :param random_walks: The number of random walks of every engine
+    :param pivot: The number of nodes above the pivot point, None for the number of honest nodes
+    :param false_positive_rate: The fixed false positive rate at which the false negative rate is reported
+    :param processes: The number of processes, None for the number of CPUs and 1 to run in the current process
+    :return: A list of result dictionaries, sorted by reset probability, number of attack edges and seed
+    """
+    shared_graph = SharedGraph(honest_region, sybil_region)
+    arguments = {'seed_node': seed_node,
+                 'random_walks': random_walks,
+                 'pivot': pivot if pivot is not None else honest_region.number_of_nodes(),
+                 'false_positive_rate': false_positive_rate}
+    tasks = [(reset_probability, seed, sorted(set(numbers_of_attack_edges)))
+             for reset_probability in reset_probabilities for seed in seeds]
+
+    if processes == 1:
+        initialize_worker(shared_graph, arguments)
+        task_results = map(run_scenarios, tasks)
+    else:
+        pool = multiprocessing.Pool(processes, initialize_worker, (shared_graph, arguments))
+        try:
+            task_results = pool.map(run_scenarios, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return sorted((result for results in task_results for result in results),
+                  key=lambda result: (result['reset_probability'], result['attack_edges'], result['seed']))
+
+
+def format_table(results):
+    """
+    Formats the results of the scenarios as a table with one row per scenario
+    :param results: The result dictionaries returned by run
+    :return: A printable table with the reset probability, number of attack edges, seed, area under the ROC curve,
+    false rates and seconds of the step of every scenario
+    """
+    lines = ["{:>8}{:>10}{:>8}{:>10}{:>10}{:>10}{:>14}{:>10}".format("Reset", "Attacks", "Seed", "AUC", "FPR", "FNR",
+                                                                    "FNR@fixed FPR", "Seconds")]
+    for result in results:
+        lines.append("{:>8}{:>10}{:>8}{:>10.4f}{:>10.4f}{:>10.4f}{:>14.4f}{:>10.2f}".format(
+            result['reset_probability'], result['attack_edges'], result['seed'], result['area_under_roc_curve'],
+            result['false_positive_rate'], result['false_negative_rate'],
+            result['false_negative_rate_at_fixed_false_positive_rate'], result['seconds']))
+    return "\n".join(lines)
+
+
+def random_region(nodes, number_of_edges, rng):
+    """
+    Generates a region as in Sybil Testing.py: random edges with weights between 1 and 10, at most one edge between
+    every pair of nodes
+    :param nodes: The nodes of the region
+    :param number_of_edges: The number of edges that are attempted to be added
+    :param rng: The random number generator
+    :return: The graph of the region
+    """
+    region = nx.DiGraph()
+    region.add_nodes_from(nodes)
+    for _ in xrange(number_of_edges):
+        node_1, node_2 = rng.sample(nodes, 2)
+        if not region.has_edge(node_1, node_2) and not region.has_edge(node_2, node_1):
+            region.add_edge(node_1, node_2, weight=rng.randint(1, 10))
+    return region
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run Sybil attack scenarios in parallel")
+    parser.add_argument("--honest-nodes", type=int, default=500)
+    parser.add_argument("--sybil-nodes", type=int, default=1000)
+    parser.add_argument("--reset-probabilities", type=float, nargs='+', default=[0.001, 0.005, 0.01, 0.05])
+    parser.add_argument("--attack-edges", type=int, nargs='+', default=[0, 10, 50, 100, 200, 500])
+    parser.add_argument("--seeds", type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument("--random-walks", type=int, default=200)
+    parser.add_argument("--false-positive-rate", type=float, default=0.2)
+    parser.add_argument("--processes", type=int, default=None, help="Number of processes, default: number of CPUs")
+    parser.add_argument("--graph-seed", type=int, default=135)
+    parser.add_argument("--output", default="sybil_scenarios.json")
+    arguments = parser.parse_args(argv)
+
+    rng = random.Random(arguments.graph_seed)
+    honest_nodes = range(arguments.honest_nodes)
+    sybil_nodes = range(arguments.honest_nodes, arguments.honest_nodes + arguments.sybil_nodes)
+    honest_region = random_region(honest_nodes, 4 * arguments.honest_nodes, rng)
+    sybil_region = random_region(sybil_nodes, arguments.sybil_nodes, rng)
+
+    start_time = default_timer()
+    results = run(honest_region, sybil_region, 0, arguments.reset_probabilities, arguments.attack_edges,
+                  arguments.seeds, arguments.random_walks, false_positive_rate=arguments.false_positive_rate,
+                  processes=arguments.processes)
+    print(format_table(results))
+    print("{} scenarios in {:.1f} seconds".format(len(results), default_timer() - start_time))
+    with open(arguments.output, 'w') as output_file:
+        json.dump({'arguments': vars(arguments), 'results': results}, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -3,13 +3,55 @@ The code below performs a set of tests on the Incremental Personalized PageRank
 """
 import unittest
 import networkx as nx
+import math
 import random
 import matplotlib.pyplot as plt
 import numpy
+import os
+import shutil
+import json
+import sqlite3
+import tempfile
+from Alias_Table import AliasTable
+from Encode import decode
+from Ego_Network import ego_network
+from Graph_Layout import LayoutCache
+from Network_View import NetworkView, trust_colors
+from matplotlib.colors import to_rgba
+from Generate_Database import TrustchainGenerator
+from Open_Database2 import GraphReduction2
+from Sybil_Evaluation import SybilEvaluation
+from Sybil_Scenarios import SharedGraph, random_region, run as run_sybil_scenarios
+from Sybil_Metrics import scores_and_labels, roc_curve, area_under_roc_curve, false_rates, false_negative_rate_at
+from Parameter_Sweep import ExactPageRankCache, grid, sweep, pareto_front, main as sweep_main
+from Benchmark import compare_with_baseline, summarize
 from Page_Rank2 import IncrementalPersonalizedPageRank2
 from Page_Rank import IncrementalPersonalizedPageRank
+from Page_Rank_Worker import PageRankWorker
+from Page_Rank_Stitching import StitchedPersonalizedPageRank
+from Global_Page_Rank import IncrementalGlobalPageRank
+from Rank_Service import RankService, RankClient
+from Update_Scheduler import UpdateScheduler
+from Sliding_Window import SlidingWindow
+from Sharded_Page_Rank import ShardedPersonalizedPageRank, partition_graph, shard_of
+from Time_Decay import TimeDecay
+from Lazy_Page_Rank import LazyPageRank
+from Transition_Coupling import transition_coupling
 
-class Tests(unittest.TestCase):
+
+class RandomStateTestCase(unittest.TestCase):
+    """
+    Base class of the tests that seed or draw from the global random state, which is restored after every test
+    """
+
+    def setUp(self):
+        self.random_state = random.getstate()
+
+    def tearDown(self):
+        random.setstate(self.random_state)
+
+
+class Tests(RandomStateTestCase):
 
     def test_page_rank_1(self):
         """
@@ -177,6 +219,9 @@ class Tests(unittest.TestCase):
         self.assertFalse(pr.added_edges)
 
     def test_page_rank_5(self):
+        # The distances to the power iteration are compared to fixed tolerances, so the graph and the random walks are
+        # seeded, and enough random walks are computed that the distances stay well below them for other seeds as well
+        random.seed(3)
         self.graph = nx.DiGraph()
         self.number_of_nodes = random.randint(2, 10000)
         self.nodes = range(self.number_of_nodes)
@@ -193,21 +238,23 @@ class Tests(unittest.TestCase):
                 weight = random.randint(1, 10)
                 self.graph.add_weighted_edges_from([(node_1, node_2, weight)])
 
-        pr = IncrementalPersonalizedPageRank2(self.graph, 0, 500, 0.3)
+        pr = IncrementalPersonalizedPageRank2(self.graph, 0, 5000, 0.3)
         pr.initial_random_walks()
         page_ranks = pr.compute_personalized_page_ranks()
+        # The power iteration stops at an error proportional to the number of nodes unless tol is scaled down
         page_ranks_2 = nx.pagerank(pr.graph, alpha=0.7, personalization=personalization_dict,
-                                   max_iter=500, weight='weight')
+                                   max_iter=500, tol=1e-10, weight='weight')
 
         # nx.draw_circular(pr.graph, with_labels=True, node_size=20, with_edge_labels=True)
         # plt.show()
         print self.number_of_nodes
-        diff = numpy.linalg.norm(numpy.array(page_ranks.values()) - numpy.array(page_ranks_2.values())) / \
-            numpy.linalg.norm(numpy.array(page_ranks_2.values()))
+        nodes = list(pr.graph.nodes())
+        diff = numpy.linalg.norm(numpy.array([page_ranks[node] - page_ranks_2[node] for node in nodes])) / \
+            numpy.linalg.norm(numpy.array([page_ranks_2[node] for node in nodes]))
         self.assertAlmostEqual(diff, 0, 1)
 
         # pr = IncrementalPersonalizedPageRank(self.graph, 0, 200, 0.05, 50)
-        pr = IncrementalPersonalizedPageRank2(self.graph, 0, 200, 0.05)
+        pr = IncrementalPersonalizedPageRank2(self.graph, 0, 5000, 0.05)
         pr.initial_random_walks()
         page_ranks = pr.compute_personalized_page_ranks()
         page_ranks_2 = nx.pagerank(pr.graph, alpha=0.95, personalization={0: 1},
@@ -253,16 +300,1254 @@ class Tests(unittest.TestCase):
 
         pr.update_random_walks()
         new_page_ranks = pr.compute_personalized_page_ranks()
-        new_page_ranks_2 = nx.pagerank(pr.graph, alpha=0.7, personalization={0: 1},
-                                       max_iter=1000, weight='weight')
+        new_page_ranks_2 = nx.pagerank(pr.graph, alpha=0.95, personalization={0: 1},
+                                       max_iter=1000, tol=1e-10, weight='weight')
         print self.number_of_nodes
-        diff = numpy.linalg.norm(numpy.array(new_page_ranks.values()) - numpy.array(new_page_ranks_2.values())) / \
-            numpy.linalg.norm(numpy.array(new_page_ranks_2.values()))
+        nodes = list(pr.graph.nodes())
+        diff = numpy.linalg.norm(numpy.array([new_page_ranks[node] - new_page_ranks_2[node] for node in nodes])) / \
+            numpy.linalg.norm(numpy.array([new_page_ranks_2[node] for node in nodes]))
         self.assertAlmostEqual(diff, 0, delta=0.06)
 
         # nx.draw_circular(self.graph, with_labels=True, node_size=20, with_edge_labels=True)
         # plt.show()
 
+    def test_page_rank_6(self):
+        """
+        Test that the walk index of both classes is consistent with the random walks after updating the graph
+        """
+        for pr in [IncrementalPersonalizedPageRank(nx.DiGraph(), 0, 100, 0.2, 20),
+                   IncrementalPersonalizedPageRank2(nx.DiGraph(), 0, 100, 0.2)]:
+            pr.graph.add_nodes_from(range(50))
+            for _ in range(150):
+                pr.add_edge(random.randrange(50), random.randrange(50), random.randint(1, 10))
+            pr.initial_random_walks()
+            for _ in range(30):
+                node_1, node_2 = random.sample(list(pr.graph.nodes), 2)
+                pr.add_weight_to_edge(node_1, node_2, random.randint(-10, 10))
+            for node in random.sample(range(1, 50), 5):
+                pr.remove_node(node)
+            self.assertGreater(pr.update_random_walks(), 0)
+
+            self.assertEqual(len(pr.random_walks), 100)
+            visit_times = dict()
+            first_visits = dict()
+            for walk_id, random_walk in enumerate(pr.random_walks):
+                for position, node in enumerate(random_walk):
+                    self.assertTrue(node in pr.graph)
+                    visit_times[node] = visit_times.get(node, 0) + 1
+                    first_visits.setdefault(node, dict()).setdefault(walk_id, position)
+            self.assertEqual(pr.walk_index.visit_times, visit_times)
+            self.assertEqual(pr.walk_index.walks_through, first_visits)
+            self.assertEqual(pr.walk_index.total_visit_times, sum(visit_times.values()))
+            self.assertAlmostEqual(sum(pr.compute_personalized_page_ranks().values()), 1)
+
+
+class PersonalizationTests(RandomStateTestCase):
+
+    def test_alias_table_1(self):
+        """
+        Test that the alias table draws nodes in proportion to their weights
+        """
+        random.seed(3)
+        table = AliasTable({'a': 1, 'b': 3, 'c': 0, 'd': 4})
+        samples = [table.sample() for _ in range(40000)]
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.probability('c'), 0)
+        self.assertAlmostEqual(table.probability('b'), 0.375)
+        for node in ['a', 'b', 'd']:
+            self.assertAlmostEqual(samples.count(node) / 40000.0, table.probability(node), 2)
+        self.assertEqual(AliasTable({'a': 2}).sample(), 'a')
+        self.assertRaises(ValueError, AliasTable, {'a': 0})
+
+    def test_personalization_1(self):
+        """
+        Test that random walks start at the nodes of the personalization and that changing the personalization only
+        resamples the random walks of nodes whose weight decreases
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 2), ('c', 'a', 1), ('d', 'c', 1), ('c', 'd', 1)])
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 2000, 0.2, personalization={'a': 1, 'd': 1})
+        pr.initial_random_walks()
+        walks_from_d = len(pr.walk_index.walks_from_node('d'))
+        self.assertEqual(walks_from_d + len(pr.walk_index.walks_from_node('a')), 2000)
+        self.assertAlmostEqual(walks_from_d / 2000.0, 0.5, 1)
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(self.graph, alpha=0.8, personalization={'a': 1, 'b': 0, 'c': 0, 'd': 1},
+                                   weight='weight')
+        for node in self.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+        self.assertEqual(pr.set_personalization({'a': 1, 'b': 1}), walks_from_d)
+        self.assertEqual(pr.walk_index.walks_from_node('d'), {})
+        self.assertEqual(set(walk[0] for walk in pr.random_walks), {'a', 'b'})
+        self.assertEqual(pr.set_personalization({'a': 2, 'b': 2}), 0)
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(self.graph, alpha=0.8, personalization={'a': 1, 'b': 1, 'c': 0, 'd': 0},
+                                   weight='weight')
+        for node in self.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+    def test_personalization_2(self):
+        """
+        Test that the reset nodes of random walks of fixed length are drawn from the personalization and kept in the
+        walk index when the graph or the personalization changes
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 2), ('c', 'a', 1), ('d', 'c', 1)])
+        pr = IncrementalPersonalizedPageRank(self.graph, 'a', 300, 0.3, 20, personalization={'a': 3, 'd': 1})
+        pr.initial_random_walks()
+        pr.add_weight_to_edge('b', 'a', 1)
+        pr.update_random_walks()
+        self.assertGreater(pr.set_personalization({'a': 1, 'd': 1, 'b': 2}), 0)
+
+        origins = dict()
+        visit_times = dict()
+        for walk_id, random_walk in enumerate(pr.random_walks):
+            self.assertEqual(len(random_walk), 20)
+            self.assertEqual(pr.origin_positions[walk_id][0], 0)
+            for position in pr.origin_positions[walk_id]:
+                origins[random_walk[position]] = origins.get(random_walk[position], 0) + 1
+            for node in random_walk:
+                visit_times[node] = visit_times.get(node, 0) + 1
+        self.assertTrue(set(origins) <= {'a', 'b', 'd'})
+        self.assertEqual(origins, {origin: sum(walks.values()) for origin, walks in pr.walk_index.walks_from.items()})
+        self.assertEqual(visit_times, pr.walk_index.visit_times)
+        self.assertAlmostEqual(origins['b'] / float(sum(origins.values())), 0.5, 1)
+
+    def test_personalization_3(self):
+        """
+        Test that pending modifications of the graph are applied to the random walks before the personalization is
+        changed, also if the random walks are repaired lazily
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 2), ('c', 'a', 1), ('d', 'c', 1), ('a', 'd', 1)])
+        for pr in [IncrementalPersonalizedPageRank(self.graph.copy(), 'a', 300, 0.3, 20, personalization={'a': 1}),
+                   IncrementalPersonalizedPageRank2(self.graph.copy(), 'a', 300, 0.3, personalization={'a': 1})]:
+            pr.initial_random_walks()
+            pr.lazy_repair = True
+            pr.remove_edge('a', 'b')
+            pr.add_edge('b', 'd', 1)
+            pr.set_personalization({'a': 1, 'b': 1})
+            self.assertEqual(pr.added_edges, [])
+            self.assertEqual(pr.removed_edges, [])
+            self.assertEqual(pr.dirty_walks, {})
+            resets = getattr(pr, 'origin_positions', None)
+            for walk_id, random_walk in enumerate(pr.random_walks):
+                for position in xrange(1, len(random_walk)):
+                    if resets is None or position not in resets[walk_id]:
+                        self.assertTrue(pr.graph.has_edge(random_walk[position - 1], random_walk[position]))
+            self.assertEqual(pr.update_random_walks(), 0)
+
+    def test_personalization_4(self):
+        """
+        Test that removing a node of the personalization takes it out of the personalization and restarts the random
+        walks started at it from the remaining nodes
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([(0, 2, 1), (2, 0, 1), (1, 3, 1), (3, 1, 1), (3, 4, 1)])
+        for pr in [IncrementalPersonalizedPageRank(self.graph.copy(), 0, 300, 0.3, 20, personalization={0: 1, 1: 1}),
+                   IncrementalPersonalizedPageRank2(self.graph.copy(), 0, 300, 0.3, personalization={0: 1, 1: 1})]:
+            pr.initial_random_walks()
+            self.assertGreater(len(pr.walk_index.walks_from_node(0)), 0)
+            pr.remove_node(0)
+            self.assertEqual(pr.personalization, {1: 1})
+            self.assertGreater(pr.update_random_walks(), 0)
+            self.assertEqual(pr.dirty_walks, {})
+            self.assertFalse(pr.walk_index.walks_from_node(0))
+            self.assertEqual(len(pr.random_walks), 300)
+            self.assertFalse(any(node in random_walk for random_walk in pr.random_walks for node in [0, 2]))
+            self.assertEqual(set(pr.walk_index.visit_times), {1, 3, 4})
+            page_ranks = pr.compute_personalized_page_ranks()
+            self.assertEqual(page_ranks[2], 0)
+            self.assertAlmostEqual(sum(page_ranks.values()), 1)
+
+
+class StitchingTests(RandomStateTestCase):
+
+    def assert_valid_segments(self, pr):
+        for node, pool in pr.pools.items():
+            self.assertTrue(node in pr.graph)
+            for segment_id in pool:
+                segment = pr.segments[segment_id]
+                self.assertEqual(segment[0], node)
+                self.assertLessEqual(len(segment), pr.segment_length + 1)
+                for source, destination in zip(segment, segment[1:]):
+                    self.assertTrue(pr.graph.has_edge(source, destination))
+                if len(segment) <= pr.segment_length:
+                    self.assertEqual(pr.graph.out_degree(segment[-1]), 0)
+
+    def test_stitched_page_rank_1(self):
+        """
+        Test that random walks stitched from segments give the personalized page ranks, also after switching the seed
+        node and modifying the graph
+        """
+        random.seed(11)
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(range(15))
+        for _ in range(45):
+            node_1, node_2 = random.sample(range(15), 2)
+            if not self.graph.has_edge(node_2, node_1):
+                self.graph.add_edge(node_1, node_2, weight=random.randint(1, 10))
+
+        pr = StitchedPersonalizedPageRank(self.graph, 0, 3000, 0.2, segment_length=3)
+        pr.initial_random_walks()
+        self.assertEqual(len(pr.random_walks), 3000)
+        self.assert_valid_segments(pr)
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(self.graph, alpha=0.8, personalization={0: 1}, weight='weight')
+        for node in self.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+        number_of_segments = len(pr.segments)
+        pr.set_seed(5)
+        self.assertEqual(len(pr.random_walks), 3000)
+        self.assertEqual(set(random_walk[0] for random_walk in pr.random_walks), {5})
+        self.assertLessEqual(len(pr.segments) - number_of_segments, 15 * pr.segments_per_node)
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(self.graph, alpha=0.8, personalization={5: 1}, weight='weight')
+        for node in self.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+        pr.remove_node(3)
+        pr.add_edge(5, 14, 20)
+        pr.remove_edge(*list(pr.graph.edges())[0])
+        pr.update_random_walks()
+        self.assertFalse(3 in pr.pools)
+        self.assert_valid_segments(pr)
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(pr.graph, alpha=0.8, personalization={5: 1}, weight='weight')
+        for node in pr.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+    def test_stitched_page_rank_2(self):
+        """
+        Test that switching the seed node applies pending modifications to the segments first and that the positions
+        of the segments of removed nodes are reused
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([(0, 1, 1), (1, 2, 1), (2, 0, 1), (2, 3, 1), (3, 1, 1)])
+        pr = StitchedPersonalizedPageRank(self.graph, 0, 200, 0.2, segment_length=3, segments_per_node=2)
+        pr.precompute_segments()
+        pr.initial_random_walks()
+        self.assertEqual(len(pr.segments), 8)
+
+        pr.remove_node(3)
+        pr.add_node(4)
+        pr.add_edge(1, 4, 1)
+        pr.add_edge(4, 0, 1)
+        pr.set_seed(1)
+        self.assertEqual(pr.added_edges, [])
+        self.assert_valid_segments(pr)
+        pr.precompute_segments()
+        self.assertEqual(len(pr.segments), 8)
+        self.assertEqual(pr.free_segment_ids, [])
+        self.assertEqual(sorted(segment[0] for segment in pr.segments), [0, 0, 1, 1, 2, 2, 4, 4])
+
+
+class GlobalPageRankTests(RandomStateTestCase):
+
+    def test_global_page_rank_1(self):
+        """
+        Test that random walks from every node give the global page ranks and that they follow modifications of the
+        graph
+        """
+        random.seed(5)
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(range(12))
+        for _ in range(30):
+            node_1, node_2 = random.sample(range(12), 2)
+            if not self.graph.has_edge(node_2, node_1):
+                self.graph.add_edge(node_1, node_2, weight=random.randint(1, 10))
+
+        pr = IncrementalGlobalPageRank(self.graph, 200, 0.15)
+        pr.initial_random_walks()
+        self.assertEqual(len(pr.random_walks), 2400)
+        self.assertEqual(len(pr.walk_index.walks_from_node(7)), 200)
+        page_ranks = pr.compute_page_ranks()
+        page_ranks_2 = nx.pagerank(self.graph, alpha=0.85, weight='weight')
+        for node in self.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+        pr.remove_node(3)
+        pr.add_node(12)
+        pr.add_edge(12, 0, 5)
+        pr.add_edge(1, 12, 5)
+        pr.add_node(13)
+        self.assertGreaterEqual(pr.update_random_walks(), 600)
+        self.assertEqual(pr.number_of_random_walks, 2600)
+        self.assertEqual(len([walk for walk in pr.random_walks if walk is not None]), 2600)
+        self.assertEqual(len(pr.random_walks), 2600)
+        self.assertFalse(pr.walk_index.walks_from_node(3))
+        self.assertFalse(any(3 in walk for walk in pr.random_walks))
+        self.assertEqual(len(pr.walk_index.walks_from_node(13)), 200)
+        page_ranks = pr.compute_page_ranks()
+        page_ranks_2 = nx.pagerank(pr.graph, alpha=0.85, weight='weight')
+        self.assertEqual(set(page_ranks), set(pr.graph.nodes()))
+        for node in pr.graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+    def test_global_page_rank_2(self):
+        """
+        Test that an update emits the rank change events once, and only if random walks have changed
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([(0, 1, 1), (1, 2, 1), (2, 0, 1), (2, 3, 1)])
+        pr = IncrementalGlobalPageRank(self.graph, 50, 0.2)
+        pr.initial_random_walks()
+        rank_events = pr.enable_rank_events(epsilon=0.01)
+        emissions = []
+        emit = rank_events.emit
+        rank_events.emit = lambda: emissions.append(emit())
+
+        pr.remove_node(3)
+        pr.add_node(4)
+        pr.add_edge(4, 0, 1)
+        pr.add_edge(1, 4, 1)
+        pr.update_random_walks()
+        self.assertEqual(len(emissions), 1)
+        self.assertTrue(any(event[0] == 4 for event in emissions[0]))
+
+        pr.lazy_repair = True
+        pr.add_edge(0, 2, 1)
+        self.assertGreater(pr.update_random_walks(), 0)
+        self.assertEqual(len(emissions), 1)
+        pr.repair_random_walks()
+        self.assertEqual(len(emissions), 2)
+
+
+class ReroutingTests(RandomStateTestCase):
+
+    def test_transition_coupling_1(self):
+        """
+        Test that only the steps to successors whose transition probability decreases are rerouted
+        """
+        coupling = transition_coupling({'a': 1, 'b': 3}, {'a': 1, 'b': 3, 'c': 4})
+        self.assertAlmostEqual(coupling.keep_probability('a'), 0.5)
+        self.assertAlmostEqual(coupling.keep_probability('b'), 0.5)
+        self.assertEqual(coupling.keep_probability('c'), 1)
+        self.assertEqual(coupling.reroute(), 'c')
+        self.assertIsNone(transition_coupling({}, {'a': 1}))
+        self.assertIsNone(transition_coupling({'a': 1}, {}))
+        self.assertIsNone(transition_coupling(None, {'a': 1}))
+        self.assertEqual(transition_coupling({'a': 1}, {'a': 2}).keep_probabilities, {})
+
+    def test_rerouting_1(self):
+        """
+        Test that adding a light edge to a hub only reroutes a proportional fraction of the random walks through the
+        hub and that the page ranks remain correct
+        """
+        random.seed(2)
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('hub', node, 1) for node in range(50)])
+        self.graph.add_weighted_edges_from([(node, 'hub', 1) for node in range(50)])
+        self.graph.add_node('new')
+
+        for pr in [IncrementalPersonalizedPageRank2(self.graph.copy(), 'hub', 2000, 0.2),
+                   IncrementalPersonalizedPageRank(self.graph.copy(), 'hub', 300, 0.2, 30)]:
+            pr.initial_random_walks()
+            pr.add_edge('hub', 'new', 1)
+            pr.add_edge('new', 'hub', 1)
+            recomputed_walks = pr.update_random_walks()
+            self.assertLess(recomputed_walks, 0.5 * pr.number_of_random_walks)
+            page_ranks = pr.compute_personalized_page_ranks()
+            page_ranks_2 = nx.pagerank(pr.graph, alpha=0.8, personalization={'hub': 1}, weight='weight')
+            self.assertAlmostEqual(page_ranks['new'], page_ranks_2['new'], 2)
+            self.assertAlmostEqual(page_ranks['hub'], page_ranks_2['hub'], 1)
+
+            visit_times = dict()
+            for random_walk in pr.random_walks:
+                for source, destination in zip(random_walk, random_walk[1:]):
+                    self.assertTrue(pr.graph.has_edge(source, destination) or destination == 'hub')
+                for node in random_walk:
+                    visit_times[node] = visit_times.get(node, 0) + 1
+            self.assertEqual(visit_times, pr.walk_index.visit_times)
+
+            pr.remove_edge('hub', 3)
+            pr.update_random_walks()
+            self.assertFalse(any(3 in random_walk for random_walk in pr.random_walks))
+
+    def test_edge_index_1(self):
+        """
+        Test that the walk index keeps the first step along every edge and that removing an edge only recomputes the
+        random walks stepping along it
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('a', 'c', 1), ('b', 'a', 1), ('c', 'a', 1), ('c', 'd', 1)])
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 1000, 0.2)
+        pr.initial_random_walks()
+        walks_along_a_b = dict(pr.walk_index.walks_along_edge('a', 'b'))
+        self.assertGreater(len(walks_along_a_b), 0)
+        self.assertLess(len(walks_along_a_b), len(pr.walk_index.walks_through_node('a')))
+        self.assertEqual(pr.update_random_walks(), 0)
+
+        pr.remove_edge('a', 'b')
+        self.assertEqual(pr.update_random_walks(), len(walks_along_a_b))
+        self.assertEqual(pr.walk_index.walks_along_edge('a', 'b'), {})
+        pr.add_weight_to_edge('c', 'd', -1)
+        pr.add_weight_to_edge('a', 'c', 1)
+        pr.update_random_walks()
+
+        walks_along = dict()
+        for walk_id, random_walk in enumerate(pr.random_walks):
+            for position, edge in enumerate(zip(random_walk, random_walk[1:])):
+                self.assertTrue(pr.graph.has_edge(*edge))
+                walks_along.setdefault(edge, dict()).setdefault(walk_id, position)
+        self.assertEqual(walks_along, pr.walk_index.walks_along)
+
+
+class LazyRepairTests(RandomStateTestCase):
+
+    def test_lazy_repair_1(self):
+        """
+        Test that modifications only mark random walks dirty, that queries repair them and that the page ranks are
+        correct after a full query, also if random walks are affected by several modifications before they are queried
+        """
+        random.seed(3)
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('hub', node, 1) for node in range(20)])
+        self.graph.add_weighted_edges_from([(node, 'hub', 1) for node in range(20)])
+        self.graph.add_weighted_edges_from([(node, node + 1, 1) for node in range(19)])
+        self.graph.add_nodes_from(['new', 'other'])
+
+        for pr in [IncrementalPersonalizedPageRank2(self.graph.copy(), 'hub', 2000, 0.2),
+                   IncrementalPersonalizedPageRank(self.graph.copy(), 'hub', 300, 0.2, 30)]:
+            pr.initial_random_walks()
+            lazy_page_rank = LazyPageRank(pr)
+            random_walks = [list(random_walk) for random_walk in pr.random_walks]
+            lazy_page_rank.add_edge('hub', 'new', 1)
+            self.assertGreater(lazy_page_rank.update_random_walks(), 0)
+            lazy_page_rank.add_weight_to_edge('hub', 'new', 1)
+            lazy_page_rank.add_edge('new', 4, 1)
+            lazy_page_rank.remove_edge('hub', 3)
+            lazy_page_rank.add_weight_to_edge(5, 6, 2)
+            lazy_page_rank.add_edge('hub', 'other', 2)
+            self.assertEqual(len(pr.added_edges), 4)
+            self.assertEqual(pr.random_walks, random_walks)
+            self.assertGreater(len(pr.dirty_walks), 0)
+
+            number_of_dirty_walks = len(pr.dirty_walks)
+            lazy_page_rank.page_rank_of(3)
+            self.assertFalse(any(walk_id in pr.dirty_walks for walk_id in pr.walk_index.walks_through_node(3)))
+            self.assertLess(len(pr.dirty_walks), number_of_dirty_walks)
+
+            page_ranks = lazy_page_rank.compute_personalized_page_ranks()
+            self.assertEqual(pr.dirty_walks, {})
+            page_ranks_2 = nx.pagerank(pr.graph, alpha=0.8, personalization={'hub': 1}, weight='weight')
+            for node in ['hub', 'new', 'other', 3, 6]:
+                self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+            self.assertAlmostEqual(page_ranks['other'], page_ranks_2['other'], 2)
+            for random_walk in pr.random_walks:
+                for source, destination in zip(random_walk, random_walk[1:]):
+                    self.assertTrue(pr.graph.has_edge(source, destination) or destination == 'hub')
+            self.assertEqual(lazy_page_rank.page_ranks_of(['new', 3]), {'new': page_ranks['new'], 3: page_ranks[3]})
+
+            metrics = lazy_page_rank.metrics()
+            self.assertLessEqual(metrics['repaired_walks'], metrics['marked_walks'])
+            self.assertEqual(metrics['dirty_walks'], 0)
+
+    def test_bounded_staleness_1(self):
+        """
+        Test that the last clean snapshot is served while it is not older than max_staleness
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'a', 1)])
+        self.graph.add_node('c')
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 200, 0.2)
+        pr.initial_random_walks()
+        lazy_page_rank = LazyPageRank(pr, max_staleness=3600)
+        page_ranks = lazy_page_rank.compute_personalized_page_ranks()
+        lazy_page_rank.add_edge('b', 'c', 1)
+        self.assertEqual(lazy_page_rank.compute_personalized_page_ranks(), page_ranks)
+        self.assertEqual(lazy_page_rank.page_rank_of('c'), 0)
+
+        lazy_page_rank.max_staleness = 0
+        lazy_page_rank.snapshot_time -= 1
+        # Only the random walks through b are repaired, which are the ones reaching c afterwards
+        self.assertGreater(lazy_page_rank.page_ranks_of(['b', 'c'])['c'], 0)
+        self.assertGreater(lazy_page_rank.compute_personalized_page_ranks()['c'], 0)
+
+
+class RankEventTests(RandomStateTestCase):
+
+    def test_rank_events_1(self):
+        """
+        Test that exactly the nodes whose page ranks cross a threshold or change by more than epsilon are reported
+        """
+        random.seed(4)
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('hub', node, 1) for node in range(20)])
+        self.graph.add_weighted_edges_from([(node, 'hub', 1) for node in range(20)])
+        self.graph.add_weighted_edges_from([(node, node + 1, 1) for node in range(19)])
+        self.graph.add_node('new')
+
+        for pr in [IncrementalPersonalizedPageRank2(self.graph.copy(), 'hub', 2000, 0.2),
+                   IncrementalPersonalizedPageRank(self.graph.copy(), 'hub', 300, 0.2, 30)]:
+            pr.initial_random_walks()
+            rank_events = pr.enable_rank_events(thresholds=[0.05, 0.02], epsilon=0.004)
+            emissions = []
+            rank_events.add_listener(emissions.append)
+            for modification in [lambda: pr.add_edge('hub', 'new', 10), lambda: pr.remove_edge('hub', 'new'),
+                                 lambda: pr.add_weight_to_edge(4, 5, 3)]:
+                total_visit_times = pr.walk_index.total_visit_times
+                old_ranks = {node: visits / float(total_visit_times)
+                             for node, visits in pr.walk_index.visit_times.iteritems()}
+                modification()
+                pr.update_random_walks()
+                new_ranks = {node: visits / float(pr.walk_index.total_visit_times)
+                             for node, visits in pr.walk_index.visit_times.iteritems()}
+                expected_events = set()
+                for node in set(old_ranks).union(new_ranks):
+                    old_rank, new_rank = old_ranks.get(node, 0), new_ranks.get(node, 0)
+                    if abs(new_rank - old_rank) > 0.004 or (old_rank < 0.05) != (new_rank < 0.05) or \
+                            (old_rank < 0.02) != (new_rank < 0.02):
+                        expected_events.add(node)
+                events = emissions.pop() if emissions else []
+                self.assertEqual(set(event[0] for event in events), expected_events)
+                for node, old_rank, new_rank in events:
+                    self.assertAlmostEqual(old_rank, old_ranks.get(node, 0))
+                    self.assertAlmostEqual(new_rank, new_ranks.get(node, 0))
+            self.assertIn('new', [event[0] for event in rank_events.take_events()])
+            self.assertEqual(rank_events.take_events(), [])
+            pr.disable_rank_events()
+            self.assertIsNone(pr.walk_index.visit_deltas)
+
+
+class RankVectorTests(unittest.TestCase):
+
+    def test_rank_vectors_1(self):
+        """
+        Test that the sparse and dense page ranks and the dictionary view agree with the page rank dictionary
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 2), ('c', 'a', 1), ('b', 'a', 1)])
+        self.graph.add_nodes_from(['d', 'e'])
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 500, 0.2)
+        pr.initial_random_walks()
+        pr.add_node('f')
+        pr.add_edge('c', 'f', 1)
+        pr.update_random_walks()
+        page_ranks = pr.compute_personalized_page_ranks()
+
+        ids, values = pr.compute_sparse_page_ranks()
+        self.assertEqual(list(ids), sorted(pr.node_order.node_id(node) for node in ['a', 'b', 'c', 'f']))
+        for node_id, value in zip(ids, values):
+            self.assertAlmostEqual(value, page_ranks[pr.node_order.nodes[node_id]])
+        dense_page_ranks = pr.compute_dense_page_ranks()
+        self.assertEqual(len(dense_page_ranks), 6)
+        self.assertAlmostEqual(numpy.linalg.norm(dense_page_ranks - pr.node_order.dense(page_ranks)), 0)
+
+        view = pr.page_rank_view()
+        self.assertEqual(len(view), 6)
+        self.assertEqual(view['d'], 0)
+        self.assertRaises(KeyError, lambda: view['g'])
+        self.assertEqual(set(view.items()), set((node, float(rank)) for node, rank in page_ranks.items()))
+
+
+class SlidingWindowTests(RandomStateTestCase):
+
+    def test_sliding_window_1(self):
+        """
+        Test that expired interactions are subtracted from the edges, flipping and removing edges, and that the page
+        ranks follow the graph of the window
+        """
+        random.seed(5)
+        self.graph = nx.DiGraph()
+        self.graph.add_node('a')
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 1000, 0.2)
+        pr.initial_random_walks()
+        window = SlidingWindow(pr, 10, bucket_size=1)
+        self.assertTrue(window.add_interaction('a', 'b', 5, 0.5))
+        self.assertTrue(window.add_interaction('b', 'a', 8, 5.5))
+        self.assertTrue(window.add_interaction('b', 'c', 0.1, 6.5))
+        self.assertTrue(window.add_interaction('c', 'a', 0.2, 6.7))
+        self.assertEqual(pr.graph['b']['a']['weight'], 3)
+        pr.update_random_walks()
+
+        self.assertEqual(window.advance(11), 1)
+        self.assertEqual(pr.graph['b']['a']['weight'], 8)
+        self.assertFalse(pr.graph.has_edge('a', 'b'))
+        self.assertFalse(window.add_interaction('a', 'c', 1, 0.9))
+        pr.add_edge('a', 'b', 1)
+        pr.update_random_walks()
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(pr.graph, alpha=0.8, personalization={'a': 1}, weight='weight')
+        for node in ['a', 'b', 'c']:
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+        self.assertEqual(window.advance(17.5), 2)
+        self.assertEqual(sorted(pr.graph.edges()), [('a', 'b')])
+        self.assertEqual(window.net_flows, {})
+        self.assertEqual(window.window_graph_edges(), [])
+        pr.update_random_walks()
+        self.assertTrue(all(set(random_walk) <= set(['a', 'b']) for random_walk in pr.random_walks))
+
+
+class ShardedPageRankTests(unittest.TestCase):
+
+    def assert_page_ranks(self, pr, graph):
+        page_ranks = pr.compute_personalized_page_ranks()
+        page_ranks_2 = nx.pagerank(graph, alpha=0.8, personalization={1: 1}, weight='weight')
+        self.assertEqual(set(page_ranks), set(graph.nodes()))
+        for node in graph.nodes():
+            self.assertAlmostEqual(page_ranks[node], page_ranks_2[node], 1)
+
+    def test_sharded_page_rank_1(self):
+        """
+        Test that the random walks are handed off between the shards and that the merged page ranks follow the
+        modifications routed to the shards, including flipped edges and removed nodes
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([(1, 2, 2), (2, 3, 1), (3, 1, 1), (2, 4, 3), (4, 5, 1), (5, 1, 2), (3, 6, 1)])
+        pr = ShardedPersonalizedPageRank(graph.copy(), 1, 2000, 0.2, number_of_shards=3, seed=7)
+        self.assertTrue(len(set(shard_of(node, 3) for node in graph.nodes())) > 1)
+        pr.start()
+        try:
+            pr.initial_random_walks()
+            self.assert_page_ranks(pr, graph)
+            self.assertTrue(pr.hand_offs > 0)
+
+            pr.add_weight_to_edge(6, 3, 4)
+            graph.remove_edge(3, 6)
+            graph.add_edge(6, 3, weight=3)
+            pr.remove_node(5)
+            graph.remove_node(5)
+            pr.add_node(7)
+            pr.add_edge(4, 7, 2)
+            graph.add_edge(4, 7, weight=2)
+            self.assertTrue(pr.update_random_walks() > 0)
+            self.assert_page_ranks(pr, graph)
+            self.assertEqual(pr.update_random_walks(), 0)
+        finally:
+            pr.stop()
+
+    def test_sharded_page_rank_2(self):
+        """
+        Test that the random walks whose origin is removed are started again from the personalization and that the
+        engine leaves the global random numbers alone
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([(1, 2, 2), (2, 3, 1), (3, 1, 1), (2, 4, 3), (4, 5, 1), (5, 1, 2), (3, 6, 1)])
+        random_state = random.getstate()
+        pr = ShardedPersonalizedPageRank(graph.copy(), 1, 2000, 0.2, number_of_shards=2,
+                                         personalization={1: 1, 5: 1}, seed=3)
+        pr.start()
+        try:
+            self.assertEqual(random.getstate(), random_state)
+            pr.initial_random_walks()
+            pr.remove_node(5)
+            graph.remove_node(5)
+            self.assertEqual(pr.personalization, {1: 1})
+            self.assertGreater(pr.update_random_walks(), 800)
+            self.assert_page_ranks(pr, graph)
+            visits = sum(pr.visit_times().values())
+        finally:
+            pr.stop()
+        self.assertRaises(RuntimeError, pr.start)
+
+        # Without the restarted random walks about half of the visits would be missing
+        fresh_pr = ShardedPersonalizedPageRank(graph, 1, 2000, 0.2, number_of_shards=2, seed=4)
+        fresh_pr.start()
+        try:
+            fresh_pr.initial_random_walks()
+            self.assertAlmostEqual(visits / float(sum(fresh_pr.visit_times().values())), 1, delta=0.15)
+        finally:
+            fresh_pr.stop()
+
+    def test_partition_graph_1(self):
+        """
+        Test that the partition of a graph assigns every node to one of the shards in connected blocks of equal size
+        """
+        graph = nx.path_graph(6, create_using=nx.DiGraph())
+        partition = partition_graph(graph, 3)
+        self.assertEqual(sorted(partition), range(6))
+        self.assertEqual([partition[node] for node in xrange(6)], [0, 0, 1, 1, 2, 2])
+        self.assertEqual(shard_of(4, 3, partition), 2)
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_compare_with_baseline_1(self):
+        """
+        Test that only benchmarks that are slower than the baseline by more than the tolerance and the minimal
+        difference are reported as regressions, and that benchmarks missing from the baseline are skipped
+        """
+        baseline = [summarize('Engine', 100, 'initial', [1.0, 2.0]),
+                    summarize('Engine', 100, 'update', [0.0001]),
+                    summarize('Engine', 100, 'compute', [0.0]),
+                    summarize('Engine', 1000, 'initial', [4.0])]
+        results = [summarize('Engine', 100, 'initial', [1.5, 1.3]),
+                   summarize('Engine', 100, 'update', [0.0005]),
+                   summarize('Engine', 100, 'compute', [0.5]),
+                   summarize('Engine', 1000, 'initial', [4.4]),
+                   summarize('Engine', 10000, 'initial', [9.0])]
+        self.assertEqual(results[0]['best'], 1.3)
+        self.assertAlmostEqual(results[0]['mean'], 1.4)
+
+        comparison = compare_with_baseline(results, baseline, 0.2)
+        self.assertEqual([row[:3] for row in comparison], [('Engine', 100, 'initial'), ('Engine', 100, 'update'),
+                                                           ('Engine', 100, 'compute'), ('Engine', 1000, 'initial')])
+        self.assertAlmostEqual(comparison[0][5], 1.3)
+        self.assertEqual([row[6] for row in comparison], [True, False, False, False])
+        self.assertAlmostEqual(comparison[1][5], 5)
+        self.assertEqual(comparison[2][5], 1.0)
+        self.assertEqual([row[6] for row in compare_with_baseline(results, baseline, 0.2, min_difference=0)],
+                         [True, True, False, False])
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def test_update_scheduler_1(self):
+        """
+        Test that the scheduler flushes when one of its policies fires and records statistics of the flushes
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(['a', 'b', 'c', 'd'])
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 1)])
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 100, 0.01)
+        pr.initial_random_walks()
+
+        scheduler = UpdateScheduler(pr, max_pending_mutations=3, max_delay=None, max_affected_walks=None)
+        self.assertIsNone(scheduler.add_edge('c', 'd', 1))
+        self.assertEqual(scheduler.pending_mutations, 1)
+        self.assertEqual(scheduler.affected_walks, pr.walk_index.number_of_walks_through_node('c'))
+        self.assertIsNone(scheduler.add_weight_to_edge('c', 'd', 1))
+        self.assertIsNone(scheduler.time_until_flush())
+        flush = scheduler.add_edge('d', 'a', 1)
+        self.assertEqual(flush['reason'], 'mutations')
+        self.assertEqual(flush['mutations'], 3)
+        self.assertGreater(flush['rerouted_walks'], 0)
+        self.assertLessEqual(flush['rerouted_walks'], flush['estimated_affected_walks'])
+        self.assertFalse(pr.added_edges)
+        self.assertEqual(scheduler.pending_mutations, 0)
+
+        scheduler = UpdateScheduler(pr, max_pending_mutations=None, max_delay=None, max_affected_walks=50)
+        self.assertEqual(scheduler.add_edge('a', 'c', 1)['reason'], 'affected_walks')
+
+        scheduler = UpdateScheduler(pr, max_pending_mutations=None, max_delay=0, max_affected_walks=None)
+        self.assertEqual(scheduler.remove_edge('a', 'c')['reason'], 'delay')
+        self.assertIsNone(scheduler.flush())
+
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics['flushes'], 1)
+        self.assertEqual(metrics['reasons'], {'delay': 1})
+        self.assertEqual(metrics['pending_mutations'], 0)
+
+
+class WorkerTests(unittest.TestCase):
+
+    def test_page_rank_worker_1(self):
+        """
+        Test that queued modifications are applied in the background and published as new snapshots
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(['a', 'b', 'c'])
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('a', 'c', 2)])
+
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 300, 0.05)
+        worker = PageRankWorker(pr, batch_size=10)
+        self.assertEqual(worker.get_snapshot().version, 0)
+        worker.start()
+        self.assertTrue(worker.flush())
+
+        snapshot = worker.get_snapshot()
+        self.assertEqual(len(pr.random_walks), 300)
+        self.assertAlmostEqual(sum(snapshot.page_ranks().values()), 1)
+        self.assertGreaterEqual(snapshot.page_rank('a'), snapshot.page_rank('b'))
+        self.assertEqual(snapshot.top(1)[0][0], 'a')
+
+        worker.remove_edge('a', 'b')
+        worker.add_weight_to_edge('a', 'c', -5)
+        worker.stop()
+
+        new_snapshot = worker.get_snapshot()
+        self.assertGreater(new_snapshot.version, snapshot.version)
+        self.assertEqual(new_snapshot.page_rank('a'), 1)
+        self.assertEqual(new_snapshot.page_rank('b'), 0)
+        self.assertNotEqual(snapshot.page_rank('b'), 0)
+        self.assertFalse(worker.flush())
+
+    def test_page_rank_worker_2(self):
+        """
+        Test that the initial random walks are published progressively in batches
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(['a', 'b', 'c'])
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 1), ('c', 'a', 1)])
+
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 100, 0.1)
+        snapshots = []
+        worker = PageRankWorker(pr, initial_batches=4,
+                                on_publish=lambda snapshot: snapshots.append((snapshot, len(pr.random_walks))))
+        worker.start()
+        self.assertTrue(worker.flush())
+        worker.stop()
+
+        self.assertEqual([number_of_random_walks for _, number_of_random_walks in snapshots[:4]], [25, 50, 75, 100])
+        self.assertEqual([snapshot.version for snapshot, _ in snapshots[:4]], [1, 2, 3, 4])
+        self.assertEqual(pr.number_of_random_walks, 100)
+        self.assertAlmostEqual(sum(snapshots[0][0].page_ranks().values()), 1)
+        self.assertIs(snapshots[-1][0], worker.get_snapshot())
+
+    def test_page_rank_worker_3(self):
+        """
+        Test that a failing update of the random walks neither stops the writer thread nor blocks flush and stop
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(['a', 'b'])
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 10, 0.1)
+        worker = PageRankWorker(pr, batch_size=10)
+        worker.start()
+        self.assertTrue(worker.flush())
+
+        def fail():
+            raise RuntimeError("update failed")
+        pr.update_random_walks = fail
+        worker.add_edge('a', 'b', 1)
+        self.assertTrue(worker.flush(timeout=5))
+        self.assertTrue(worker.thread.is_alive())
+        self.assertEqual(worker.scheduler.pending_mutations, 0)
+
+        del pr.update_random_walks
+        worker.add_edge('b', 'a', 2)
+        self.assertTrue(worker.flush(timeout=5))
+        self.assertEqual(worker.get_snapshot().page_rank('a'), 1)
+        worker.stop()
+        self.assertFalse(worker.thread.is_alive())
+
+    def test_rank_service_1(self):
+        """
+        Test that edge deltas sent to the rank service are coalesced and reflected in the served page ranks
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(['a', 'b'])
+        self.graph.add_weighted_edges_from([('a', 'b', 1)])
+
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 200, 0.3)
+        service = RankService(pr, ('127.0.0.1', 0), batch_window=0.01)
+        service.start()
+        client = RankClient(service.address)
+        try:
+            version = client.request({"type": "flush"})["version"]
+            self.assertEqual(client.request({"type": "rank", "node": "c"})["rank"], 0)
+
+            for _ in range(10):
+                self.assertTrue(client.send_delta('b', 'c', 1)["queued"])
+            reply = client.request({"type": "flush"})
+            self.assertGreater(reply["version"], version)
+            self.assertTrue('c' in pr.graph)
+            self.assertEqual(pr.graph['b']['c']['weight'], 10)
+
+            ranks = dict(client.request({"type": "ranks"})["ranks"])
+            self.assertEqual(set(ranks.keys()), {'a', 'b', 'c'})
+            self.assertAlmostEqual(sum(ranks.values()), 1)
+            self.assertGreater(client.request({"type": "rank", "node": "c"})["rank"], 0)
+            self.assertEqual(client.request({"type": "top", "k": 1})["ranks"][0][0], 'a')
+            self.assertTrue("error" in client.request({"type": "unknown"}))
+        finally:
+            client.close()
+            service.shutdown()
+
+
+class StatisticsTests(unittest.TestCase):
+
+    def test_statistics_1(self):
+        """
+        Test the counters and phase timers of both engines and that nested phases are only counted once
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 1), ('c', 'a', 1), ('a', 'd', 1)])
+
+        for pr in [IncrementalPersonalizedPageRank(graph.copy(), 'a', 100, 0.2, 20),
+                   IncrementalPersonalizedPageRank2(graph.copy(), 'a', 100, 0.2)]:
+            self.assertEqual(pr.stats(), {})
+            pr.enable_statistics(profile=True)
+            pr.initial_random_walks()
+            pr.compute_personalized_page_ranks()
+            stats = pr.stats()
+            self.assertEqual(stats['random_walks'], 100)
+            self.assertEqual(stats['steps'], sum(len(random_walk) - 1 for random_walk in pr.random_walks))
+            self.assertGreater(stats['resets'], 0)
+            self.assertGreater(stats['dangling_hits'], 0)
+            self.assertEqual(stats['phase_calls'], {'generate': 1, 'update': 0, 'compute': 1})
+            self.assertGreater(stats['phase_times']['generate'], 0)
+            self.assertIsNotNone(pr.statistics.profile_stats())
+
+            pr.add_edge('d', 'b', 1)
+            rerouted_walks = pr.update_random_walks()
+            stats = pr.stats()
+            self.assertEqual(stats['updates'], 1)
+            self.assertEqual(stats['rerouted_walks'], rerouted_walks)
+            self.assertEqual(stats['phase_calls']['update'], 1)
+
+            # A repair triggered outside of update_random_walks, as by a lazy query, is timed as an update as well
+            pr.lazy_repair = True
+            pr.remove_edge('d', 'b')
+            pr.update_random_walks()
+            pr.repair_random_walks()
+            self.assertEqual(pr.stats()['phase_calls'], {'generate': 1, 'update': 3, 'compute': 1})
+            self.assertEqual(pr.statistics.active_phases, [])
+
+            pr.disable_statistics()
+            self.assertEqual(pr.stats(), {})
+            pr.compute_personalized_page_ranks()
+
+
+class SweepTests(RandomStateTestCase):
+
+    def test_parameter_sweep_1(self):
+        """
+        Test that the exact page ranks are computed once per reset probability and that the Pareto front only keeps
+        configurations that are not beaten by a cheaper and more accurate one
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([('a', 'b', 1), ('b', 'c', 2), ('c', 'a', 1), ('a', 'c', 3)])
+        cache = ExactPageRankCache()
+        points = grid(['IncrementalPersonalizedPageRank', 'IncrementalPersonalizedPageRank2'], [50, 200], [10],
+                      [0.1, 0.3])
+        self.assertEqual(len(points), 8)
+
+        results = sweep(graph, 'a', points, repeat=2, processes=1, cache=cache)
+        self.assertEqual(cache.computations, 2)
+        sweep(graph.copy(), 'a', points, repeat=1, processes=1, cache=cache)
+        self.assertEqual(cache.computations, 2)
+        self.assertEqual(len(results), 8)
+        for result in results:
+            self.assertTrue(0 <= result['error'] <= result['max_error'])
+            self.assertGreater(result['steps'], 0)
+
+        front = pareto_front([{'seconds': 1, 'error': 0.3}, {'seconds': 2, 'error': 0.1},
+                              {'seconds': 3, 'error': 0.2}, {'seconds': 4, 'error': 0.05}])
+        self.assertEqual([result['seconds'] for result in front], [1, 2, 4])
+
+    def test_parameter_sweep_2(self):
+        """
+        Test that the seed node given on the command line is converted to a node of the generated graph, and that a
+        seed node that is not in the graph is reported
+        """
+        directory = tempfile.mkdtemp() + os.sep
+        try:
+            arguments = ["--edges", "40", "--engines", "IncrementalPersonalizedPageRank2", "--random-walks", "10",
+                         "--reset-probabilities", "0.3", "--repeat", "1", "--processes", "1",
+                         "--output", directory + "sweep.json"]
+            self.assertEqual(sweep_main(arguments + ["--seed-node", "3"]), 0)
+            with open(directory + "sweep.json") as output_file:
+                self.assertEqual(len(json.load(output_file)['results']), 1)
+            self.assertRaises(SystemExit, sweep_main, arguments + ["--seed-node", "99"])
+        finally:
+            shutil.rmtree(directory)
+
+
+class SybilTests(RandomStateTestCase):
+
+    def test_sybil_evaluation_1(self):
+        """
+        Test that the Sybil evaluation computes the random walks once per reset probability and applies the attack
+        edges incrementally
+        """
+        honest_region = nx.DiGraph()
+        honest_region.add_weighted_edges_from([(0, 1, 1), (1, 2, 1), (2, 0, 1), (0, 3, 2)])
+        sybil_region = nx.DiGraph()
+        sybil_region.add_weighted_edges_from([(10, 11, 1), (11, 12, 1), (12, 10, 1)])
+
+        evaluation = SybilEvaluation(honest_region, sybil_region, 0, [0.1, 0.3], 100, random.Random(2))
+        for pr in evaluation.page_ranks.values():
+            pr.enable_statistics()
+        results = evaluation.run(5, attack_edges_per_step=2)
+
+        self.assertEqual(evaluation.number_of_attack_edges, 10)
+        for reset_probability, pr in evaluation.page_ranks.items():
+            self.assertEqual(len(results[reset_probability]), 6)
+            self.assertEqual(pr.stats()['phase_calls']['generate'], 0)
+            self.assertEqual(pr.stats()['updates'], 5)
+            self.assertEqual(set(results[reset_probability][0].keys()), {0, 1, 2, 3, 10, 11, 12})
+            self.assertEqual(sum(1 for page_rank in results[reset_probability][0].values() if page_rank > 0), 4)
+            self.assertAlmostEqual(sum(results[reset_probability][-1].values()), 1)
+            attack_edges = [(u, v) for u, v in pr.graph.edges() if (u < 10) != (v < 10)]
+            self.assertGreater(len(attack_edges), 0)
+            for walk_id, random_walk in enumerate(pr.random_walks):
+                for position, node in enumerate(random_walk[:-1]):
+                    self.assertTrue(pr.graph.has_edge(node, random_walk[position + 1]))
+
+    def test_sybil_metrics_1(self):
+        """
+        Test the area under the ROC curve and the false rates on a ranked list with tied and unvisited nodes
+        """
+        page_ranks = {'h1': 0.4, 'h2': 0.2, 's1': 0.2, 'h3': 0.1, 's2': 0.1}
+        scores, labels = scores_and_labels(page_ranks, ['h1', 'h2', 'h3', 'h4'], ['s1', 's2', 's3', 's4'])
+        self.assertEqual(list(scores), [0.4, 0.2, 0.1, 0, 0.2, 0.1, 0, 0])
+
+        false_positive_rates, true_positive_rates = roc_curve(scores, labels)
+        self.assertEqual(list(false_positive_rates), [0, 0, 0.25, 0.5, 1])
+        self.assertEqual(list(true_positive_rates), [0, 0.25, 0.5, 0.75, 1])
+        honest_scores = scores[labels]
+        sybil_scores = scores[~labels]
+        probability = numpy.mean([(h > s) + 0.5 * (h == s) for h in honest_scores for s in sybil_scores])
+        self.assertAlmostEqual(area_under_roc_curve(scores, labels), probability)
+
+        false_positive_rate, false_negative_rate = false_rates(scores, labels, [1, 2, 3])
+        self.assertEqual(list(false_positive_rate), [0, 0.125, 0.25])
+        self.assertEqual(list(false_negative_rate), [0.75, 0.625, 0.5])
+        self.assertAlmostEqual(false_negative_rate_at(scores, labels, 0.25), 0.5)
+        self.assertAlmostEqual(false_negative_rate_at(scores, labels, 0.75), 0.125)
+
+    def test_sybil_scenarios_1(self):
+        """
+        Test that the regions survive the conversion to shared memory and that every scenario yields one result
+        """
+        honest_region = random_region(range(20), 60, random.Random(1))
+        sybil_region = random_region(range(20, 50), 40, random.Random(2))
+        regions = SharedGraph(honest_region, sybil_region).regions()
+        self.assertEqual(sorted(regions[0].edges(data='weight')), sorted(honest_region.edges(data='weight')))
+        self.assertEqual(sorted(regions[1].edges(data='weight')), sorted(sybil_region.edges(data='weight')))
+        self.assertEqual(set(regions[1].nodes()), set(sybil_region.nodes()))
+
+        results = run_sybil_scenarios(honest_region, sybil_region, 0, [0.1, 0.3], [0, 5, 20], [1, 2],
+                                      random_walks=50, processes=1)
+        self.assertEqual(len(results), 12)
+        self.assertEqual([(result['reset_probability'], result['attack_edges'], result['seed'])
+                          for result in results[:3]], [(0.1, 0, 1), (0.1, 0, 2), (0.1, 5, 1)])
+        for result in results:
+            self.assertTrue(0 <= result['area_under_roc_curve'] <= 1)
+            if result['attack_edges'] == 0:
+                # Without attack edges no Sybil is visited, so no Sybil is ranked above an honest node
+                self.assertGreaterEqual(result['area_under_roc_curve'], 0.5)
+
+
+class LayoutTests(unittest.TestCase):
+
+    def test_layout_cache_1(self):
+        """
+        Test that the layout of a neighbourhood is computed once and that new nodes are placed without moving the
+        nodes that were already displayed
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([(0, 1, 1), (2, 0, 1), (0, 3, 1), (1, 4, 1), (5, 1, 1), (2, 6, 1)])
+        neighbours = [1, 2, 3]
+        neighbours_of_neighbours = {1: [4, 5], 2: [6], 3: []}
+        cache = LayoutCache()
+
+        pos = cache.layout(graph, 0, neighbours, neighbours_of_neighbours)
+        self.assertEqual(set(pos.keys()), set(graph.nodes()))
+        self.assertEqual(list(pos[0]), [0, 0])
+        for node in neighbours:
+            self.assertAlmostEqual(numpy.linalg.norm(pos[node]), 20)
+        for node in [4, 5, 6]:
+            self.assertAlmostEqual(numpy.linalg.norm(pos[node]), 40)
+        self.assertTrue(cache.layout(graph.copy(), 0, neighbours, neighbours_of_neighbours) is pos)
+        self.assertEqual(cache.computations, 1)
+
+        old_pos = {node: position.copy() for node, position in pos.items()}
+        graph.add_weighted_edges_from([(3, 7, 1), (7, 6, 1)])
+        graph.remove_node(5)
+        new_pos = cache.layout(graph, 0, neighbours, {1: [4], 2: [6], 3: [7]})
+        self.assertEqual(cache.computations, 2)
+        self.assertEqual(set(new_pos.keys()), set(graph.nodes()))
+        for node in graph.nodes():
+            if node != 7:
+                self.assertEqual(list(new_pos[node]), list(old_pos[node]))
+        self.assertTrue(numpy.all(numpy.isfinite(new_pos[7])))
+        self.assertGreater(numpy.linalg.norm(new_pos[7]), 0)
+
+    def test_network_view_1(self):
+        """
+        Test that highlighting and recolouring change the existing artists and that edges are culled on large
+        neighbourhoods
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([(0, 1, 1), (0, 2, 5), (1, 2, 3), (2, 3, 2), (3, 1, 4)])
+        pos = {node: numpy.array([numpy.cos(node), numpy.sin(node)]) for node in graph.nodes()}
+        figure = plt.figure()
+        view = NetworkView(figure.add_subplot(111), max_edges=4)
+        view.draw(graph, pos, trust_colors({0: 0.5, 1: 0.0003, 2: 0.00001}, graph.nodes()), center=0)
+        figure.canvas.draw()
+        self.assertIsNotNone(view.background)
+        self.assertEqual(len(view.edges), 4)
+        self.assertTrue((2, 3) not in view.edges and (0, 1) in view.edges and (0, 2) in view.edges)
+
+        node_collection = view.node_collection
+        view.highlight([0, 2], [(0, 2)])
+        self.assertTrue(view.node_collection is node_collection)
+        alphas = node_collection.get_facecolors()[:, 3]
+        self.assertEqual([alphas[view.node_ids[node]] for node in [0, 1, 2, 3]], [1, 0.1, 1, 0.1])
+        self.assertEqual(len(view.highlighted_edge_collection.get_segments()), 1)
+
+        view.set_colors(trust_colors({node: 0.5 for node in graph.nodes()}, view.nodes))
+        colors = node_collection.get_facecolors()
+        self.assertTrue(numpy.all(colors[:, :3] == to_rgba('green')[:3]))
+        self.assertEqual(colors[view.node_ids[1], 3], 0.1)
+        view.highlight(None)
+        self.assertTrue(numpy.all(node_collection.get_facecolors()[:, 3] == 1))
+        plt.close(figure)
+
+    def test_ego_network_1(self):
+        """
+        Test that the neighbourhood of a node is divided into rings and that the degree caps keep the heaviest edges
+        """
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from([(0, 1, 1), (2, 0, 3), (0, 3, 2), (3, 0, 2), (1, 4, 1), (5, 1, 1), (2, 4, 1),
+                                       (4, 6, 1), (6, 7, 1), (8, 9, 1)])
+
+        ego = ego_network(graph, 0)
+        self.assertEqual(ego.rings[0], [0])
+        self.assertEqual(set(ego.rings[1]), {1, 2, 3})
+        self.assertEqual(set(ego.rings[2]), {4, 5})
+        self.assertEqual(ego.hops[5], 2)
+        self.assertEqual(ego.parents[5], 1)
+        self.assertTrue(ego.parents[4] in [1, 2])
+        self.assertEqual(sorted(ego.children[1] + ego.children[2] + ego.children[3]), [4, 5])
+        self.assertTrue(6 not in ego and len(ego) == 6)
+        self.assertEqual(set((u, v) for u, v, _ in ego.edges), {(0, 1), (2, 0), (0, 3), (3, 0), (1, 4), (5, 1),
+                                                                (2, 4)})
+        sub_graph = ego.graph()
+        self.assertEqual(set(sub_graph.edges()), set(graph.subgraph(ego.nodes()).edges()))
+        self.assertEqual(sub_graph[2][0]['weight'], 3)
+
+        self.assertEqual(ego_network(graph, 0, hops=3).rings[3], [6])
+        self.assertEqual(len(ego_network(graph, 8, hops=5).rings), 2)
+        capped = ego_network(graph, 0, max_degree=[2, 0])
+        self.assertEqual(set(capped.rings[1]), {2, 3})
+        self.assertEqual(len(capped.rings), 2)
+        self.assertEqual(set((u, v) for u, v, _ in capped.edges), {(2, 0), (0, 3), (3, 0)})
+        self.assertEqual(capped.children[2], [])
+        self.assertEqual(ego.children[5], [])
+        self.assertRaises(ValueError, ego_network, graph, 0, hops=3, max_degree=[2, 2])
+
+
+class DatabaseTests(unittest.TestCase):
+
+    def test_generate_database_1(self):
+        """
+        Test that a synthetic trustchain database has the requested number of blocks and that GraphReduction2 turns
+        it into a graph whose edge weights are the net flows of data of the generated interactions
+        """
+        directory = tempfile.mkdtemp() + os.sep
+        try:
+            generator = TrustchainGenerator(30, 501, skew=1.2, non_bandwidth_fraction=0.25, seed=3)
+            self.assertEqual(generator.write(directory, "synthetic", chunk_size=64), 501)
+
+            conn = sqlite3.connect(directory + "synthetic.db")
+            rows = conn.execute("SELECT type, tx, public_key, link_public_key, link_sequence_number "
+                                "FROM blocks").fetchall()
+            conn.close()
+            self.assertEqual(len(rows), 501)
+            other_blocks = sum(1 for row in rows if row[0] != 'tribler_bandwidth')
+            self.assertTrue(0 < other_blocks < 250)
+
+            net_flows = dict()
+            for block_type, tx, public_key, link_public_key, link_sequence_number in rows:
+                if block_type == 'tribler_bandwidth' and link_sequence_number == 0:
+                    tx = decode(str(tx))[1]
+                    edge = (str(public_key).encode('hex'), str(link_public_key).encode('hex'))
+                    net_flows[edge] = net_flows.get(edge, 0) + tx["up"] - tx["down"]
+                    net_flows[edge[::-1]] = net_flows.get(edge[::-1], 0) - tx["up"] + tx["down"]
+
+            gr = GraphReduction2(directory, "synthetic")
+            gr.open_data_set()
+            graph = gr.generate_graph()
+            self.assertTrue(graph.number_of_edges() > 0)
+            for source, destination, weight in graph.edges(data='weight'):
+                self.assertEqual(weight, net_flows[(source, destination)])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_time_decay_1(self):
+        """
+        Test that GraphReduction2 weights the blocks by their age at the time of the latest block, also when the
+        weights are renormalized while the blocks are read
+        """
+        directory = tempfile.mkdtemp() + os.sep
+        try:
+            TrustchainGenerator(20, 300, non_bandwidth_fraction=0, seed=5).write(directory, "synthetic")
+            conn = sqlite3.connect(directory + "synthetic.db")
+            rows = conn.execute("SELECT tx, public_key, link_public_key, block_timestamp FROM blocks").fetchall()
+            conn.close()
+            decay_rate = 1e-4
+            latest_time_stamp = max(row[3] for row in rows)
+            net_flows = dict()
+            for tx, public_key, link_public_key, time_stamp in rows:
+                tx = decode(str(tx))[1]
+                edge = (str(public_key).encode('hex'), str(link_public_key).encode('hex'))
+                size = (tx["up"] - tx["down"]) * math.exp(-decay_rate * (latest_time_stamp - time_stamp)) / 2
+                net_flows[edge] = net_flows.get(edge, 0) + size
+                net_flows[edge[::-1]] = net_flows.get(edge[::-1], 0) - size
+
+            gr = GraphReduction2(directory, "synthetic", decay_rate=decay_rate)
+            gr.open_data_set()
+            graph = gr.generate_graph()
+            self.assertLess(gr.time_decay.max_scale, math.exp(decay_rate * (latest_time_stamp - rows[0][3])))
+            self.assertEqual(gr.time_decay.reference_time, latest_time_stamp)
+            for source, destination, weight in graph.edges(data='weight'):
+                self.assertAlmostEqual(weight, net_flows[(source, destination)], delta=1e-9 * weight)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_sliding_window_1(self):
+        """
+        Test that GraphReduction2 only keeps the blocks of the sliding window in the graph and that the window keeps
+        expiring blocks through the engine built on the graph
+        """
+        directory = tempfile.mkdtemp() + os.sep
+        try:
+            TrustchainGenerator(20, 300, non_bandwidth_fraction=0, seed=5).write(directory, "synthetic")
+            conn = sqlite3.connect(directory + "synthetic.db")
+            rows = conn.execute("SELECT tx, public_key, link_public_key, block_timestamp FROM blocks").fetchall()
+            conn.close()
+            window = 100000
+            latest_time_stamp = max(row[3] for row in rows)
+            net_flows = dict()
+            for tx, public_key, link_public_key, time_stamp in rows:
+                if time_stamp < latest_time_stamp - window:
+                    continue
+                tx = decode(str(tx))[1]
+                edge = (str(public_key).encode('hex'), str(link_public_key).encode('hex'))
+                size = (tx["up"] - tx["down"]) / 2.0
+                net_flows[edge] = net_flows.get(edge, 0) + size
+                net_flows[edge[::-1]] = net_flows.get(edge[::-1], 0) - size
+
+            gr = GraphReduction2(directory, "synthetic", window=window, bucket_size=1)
+            gr.open_data_set()
+            graph = gr.generate_graph()
+            self.assertEqual(graph.number_of_edges(), sum(1 for net_flow in net_flows.values() if net_flow > 0))
+            for source, destination, weight in graph.edges(data='weight'):
+                self.assertAlmostEqual(weight, net_flows[(source, destination)])
+            self.assertRaises(ValueError, GraphReduction2, directory, "synthetic", 1e-4, window)
+
+            main_node = list(graph.nodes())[0]
+            pr = IncrementalPersonalizedPageRank2(graph, main_node, 100, 0.2)
+            pr.initial_random_walks()
+            gr.sliding_window.attach(pr)
+            gr.sliding_window.advance(latest_time_stamp + window + 1)
+            self.assertEqual(pr.graph.number_of_edges(), 0)
+            pr.update_random_walks()
+            self.assertTrue(all(random_walk == [main_node] for random_walk in pr.random_walks))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_time_decay_2(self):
+        """
+        Test that renormalizing the decayed weights of an engine does not repair any random walk, while a new
+        interaction does
+        """
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from([('a', 'b', 1), ('a', 'c', 3), ('b', 'a', 1), ('c', 'a', 1)])
+        pr = IncrementalPersonalizedPageRank2(self.graph, 'a', 500, 0.2)
+        pr.initial_random_walks()
+        time_decay = TimeDecay(math.log(2), pr.rescale_weights, reference_time=0, max_scale=100)
+        pr.add_weight_to_edge('a', 'b', time_decay.contribution(1, 2))
+        self.assertGreater(pr.update_random_walks(), 0)
+        self.assertEqual(pr.graph['a']['b']['weight'], 5)
+        self.assertAlmostEqual(time_decay.weight(pr.graph['a']['b']['weight'], 2), 1.25)
+
+        pr.add_weight_to_edge('a', 'c', time_decay.contribution(2, 10))
+        self.assertEqual(time_decay.reference_time, 10)
+        self.assertAlmostEqual(pr.graph['a']['b']['weight'], 5 / 1024.0)
+        self.assertAlmostEqual(pr.graph['a']['c']['weight'], 3 / 1024.0 + 2)
+        pr.update_random_walks()
+        random_walks = [list(random_walk) for random_walk in pr.random_walks]
+        time_decay.renormalize(20)
+        self.assertEqual(pr.update_random_walks(), 0)
+        self.assertEqual(pr.random_walks, random_walks)
+
 
 if __name__ == '__main__':
     unittest.main()
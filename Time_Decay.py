@@ -0,0 +1,75 @@
+"""
+The code in this file weights the interactions between peers by their age, so that a transfer of data from years ago
+counts less than one from yesterday, without touching every edge of the graph as time passes.
+"""
+from __future__ import division
+import math
+
+
+class TimeDecay(object):
+    """
+    Class to maintain exponentially time-decayed net flows with a global scale factor.
+
+    At time t an interaction of size s that took place at time t_i contributes s * exp(-decay_rate * (t - t_i)) to
+    the weight of its edge. Since every weight of the graph decays by the same factor as time passes, the transition
+    probabilities of the random walks never change because of the decay alone. The weights are therefore stored in
+    units of the reference time t_0: a new interaction adds s * exp(decay_rate * (t_i - t_0)) to its edge, and the
+    actual weight at time t is the stored weight divided by exp(decay_rate * (t - t_0)). Only the new interactions
+    modify the graph, and only they cause random walks to be repaired.
+    The scale factor exp(decay_rate * (t_i - t_0)) grows without bound, so once it exceeds max_scale the stored
+    weights are renormalized: all of them are divided by the scale factor with the function rescale, e.g. the method
+    rescale_weights of a page rank engine, and t_i becomes the new reference time. Renormalizing does not change
+    the transition probabilities either.
+    """
+
+    def __init__(self, decay_rate, rescale, reference_time=None, max_scale=1e12):
+        """
+        Initializes the decay
+        :param decay_rate: The decay rate per unit of time of the timestamps, e.g. math.log(2) / half_life
+        :param rescale: A function that multiplies all stored weights by a given factor
+        :param reference_time: The time in whose units the weights are stored, None for the time of the first
+        interaction
+        :param max_scale: The scale factor from which on the stored weights are renormalized
+        """
+        self.decay_rate = decay_rate
+        self.rescale = rescale
+        self.reference_time = reference_time
+        self.max_scale = max_scale
+
+    def scale(self, timestamp):
+        """
+        :return: The factor by which a weight at the given time is multiplied to store it
+        """
+        if self.reference_time is None:
+            self.reference_time = timestamp
+        return math.exp(self.decay_rate * (timestamp - self.reference_time))
+
+    def contribution(self, size, timestamp):
+        """
+        Converts the size of an interaction to the units of the stored weights, renormalizing the stored weights
+        first if the scale factor has become too large
+        :param size: The net flow of data of the interaction
+        :param timestamp: The time of the interaction
+        :return: The amount to add to the stored weight of the edge
+        """
+        if self.scale(timestamp) > self.max_scale:
+            self.renormalize(timestamp)
+        return size * self.scale(timestamp)
+
+    def renormalize(self, timestamp):
+        """
+        Divides all stored weights by the scale factor of a time, which becomes the new reference time. Afterwards the
+        stored weights are the actual weights at that time.
+        :param timestamp: The new reference time
+        """
+        factor = 1 / self.scale(timestamp)
+        self.reference_time = timestamp
+        if factor != 1:
+            self.rescale(factor)
+        return
+
+    def weight(self, stored_weight, timestamp):
+        """
+        :return: The actual weight at a given time of an edge with the given stored weight
+        """
+        return stored_weight / self.scale(timestamp)
@@ -0,0 +1,68 @@
+"""
+The code in this file decides which steps of the random walks have to be rerouted when the outgoing edges of a node
+change.
+"""
+from __future__ import division
+from Alias_Table import AliasTable
+
+
+class TransitionCoupling(object):
+    """
+    Class to couple the old and the new transition probabilities of a node whose outgoing edges have changed.
+
+    A random walk leaves the node to a successor x with probability p(x) = w(x) / W before and q(x) = w'(x) / W'
+    after the change, where W and W' are the total weights of the outgoing edges. A step to x that has already been
+    taken is kept with probability min(1, q(x) / p(x)) and otherwise rerouted to a successor drawn in proportion to
+    the increases q(y) - p(y) > 0. Then every step is distributed according to the new transition probabilities, while
+    a step is only rerouted with probability sum(max(p(x) - q(x), 0)). Adding an edge of weight w to a node of total
+    weight W for instance only reroutes a fraction w / (W + w) of the steps instead of all of them.
+    """
+
+    def __init__(self, old_weights, new_weights):
+        """
+        Computes the coupling
+        :param old_weights: A dictionary of the successors and edge weights before the change, with a positive total
+        :param new_weights: A dictionary of the successors and edge weights after the change, with a positive total
+        """
+        old_total_weight = sum(old_weights.itervalues())
+        new_total_weight = sum(new_weights.itervalues())
+        self.keep_probabilities = dict()
+        for node, weight in old_weights.iteritems():
+            old_probability = weight / old_total_weight
+            new_probability = new_weights.get(node, 0) / new_total_weight
+            if new_probability < old_probability:
+                self.keep_probabilities[node] = new_probability / old_probability
+        increases = dict()
+        for node, weight in new_weights.iteritems():
+            increase = weight / new_total_weight - old_weights.get(node, 0) / old_total_weight
+            if increase > 0:
+                increases[node] = increase
+        self.reroute_table = AliasTable(increases) if increases else None
+        if self.reroute_table is None:
+            # The transition probabilities only differ by rounding errors
+            self.keep_probabilities.clear()
+
+    def keep_probability(self, node):
+        """
+        :return: The probability with which a step to node is kept
+        """
+        return self.keep_probabilities.get(node, 1)
+
+    def reroute(self):
+        """
+        :return: The successor to which a rerouted step leads
+        """
+        return self.reroute_table.sample()
+
+
+def transition_coupling(old_weights, new_weights):
+    """
+    Couples the old and the new transition probabilities of a node
+    :param old_weights: A dictionary of the successors and edge weights before the change, None if unknown
+    :param new_weights: A dictionary of the successors and edge weights after the change
+    :return: A TransitionCoupling, or None if the node was or has become a dangling node, or its old edges are not
+    known, in which case every random walk has to be recomputed from the first visit of the node
+    """
+    if old_weights is None or sum(old_weights.itervalues()) <= 0 or sum(new_weights.itervalues()) <= 0:
+        return None
+    return TransitionCoupling(old_weights, new_weights)
@@ -9,28 +9,62 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import networkx as nx
 import sys
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
-import numpy as np
 import operator
 from heapq import nlargest
-import copy
+from Graph_Layout import LayoutCache
+from Network_View import NetworkView, trust_colors
+from Page_Rank_Worker import PageRankWorker
+from Ego_Network import ego_network
+
+
+class RankSignals(QObject):
+    """
+    Carries the snapshots published by the PageRankWorker from its writer thread to the GUI thread, together with the
+    neighbourhood of the main node at the time of the snapshot. The signal is emitted on the writer thread and, since
+    the receiving widget lives in the GUI thread, Qt queues the call to the connected slot in the event loop of the
+    GUI thread, which is the only thread allowed to draw.
+    """
+    snapshot_published = pyqtSignal(object, object)
 
 
 class TrustGUI(QWidget):
     NumButtons = ['Show All Peers', 'Show Most Trusted Peer', 'Show Trustworthy Peers']
 
-    def __init__(self, graph, main_node, page_ranks):
+    def __init__(self, graph, main_node, page_ranks=None, page_rank=None, initial_batches=10, max_degree=None):
+        """
+        Opens the network explorer. If an incremental page rank engine is given, the window is shown right away and
+        the random walks are computed by a PageRankWorker on a background thread. Every snapshot the worker publishes,
+        starting with a coarse estimate from the first batch of initial random walks, recolours the network.
+        :param graph: The graph of the network
+        :param main_node: The peer at the center of the network display
+        :param page_ranks: A dictionary of nodes and corresponding page ranks to show until the first snapshot
+        :param page_rank: An incremental personalized page rank engine, None to only show page_ranks
+        :param initial_batches: The number of snapshots in which the initial random walks are published
+        :param max_degree: The maximal number of neighbours displayed per peer, None for no limit
+        """
         super(TrustGUI, self).__init__()
 
         self.graph = graph
-        self.page_ranks = page_ranks
+        self.page_ranks = page_ranks if page_ranks is not None else {}
         self.main_node = main_node
+        self.max_degree = max_degree
+        self.layout_cache = LayoutCache()
+        self.view = None
+        self.drawn_pos = None
+        self.worker = None
         self.setMouseTracking(True)
 
         self.initUI()
 
+        if page_rank is not None:
+            self.signals = RankSignals()
+            self.signals.snapshot_published.connect(self.showSnapshot)
+            self.worker = PageRankWorker(page_rank, initial_batches=initial_batches, on_publish=self.publishSnapshot)
+            self.statusbar.showMessage("Computing page ranks...")
+            self.worker.start()
+
     def initUI(self):
         """
 
@@ -64,10 +98,10 @@ class TrustGUI(QWidget):
 
 
         """ Create Statusbar at the bottom of the window """
-        statusbar = QStatusBar()
-        self.grid.addWidget(statusbar, 9, 0)
-        statusbar.showMessage("Ready")
-        statusbar.show()
+        self.statusbar = QStatusBar()
+        self.grid.addWidget(self.statusbar, 9, 0)
+        self.statusbar.showMessage("Ready")
+        self.statusbar.show()
 
 
         """ Create Vertical Box of Buttons """
@@ -108,88 +142,61 @@ class TrustGUI(QWidget):
         return
 
     def ShowMostTrustedPeer(self):
-        self.page_ranks_of_subgraph = {node: self.page_ranks[node] for node in self.sub_graph.nodes()}
+        self.page_ranks_of_subgraph = {node: self.page_ranks.get(node, 0) for node in self.sub_graph.nodes()}
         del self.page_ranks_of_subgraph[self.main_node]
         self.most_trusted_node = max(self.page_ranks_of_subgraph.iteritems(), key=operator.itemgetter(1))[0]
-        del self.page_ranks_of_subgraph[self.most_trusted_node]
-
-        self.node_color_trusted = []
-        self.node_color_untrusted = []
-
-        for node in self.sub_graph.nodes():
-            if node in self.page_ranks_of_subgraph.keys():
-                if self.page_ranks[node] < 0.0001:
-                    self.node_color_untrusted.append('red')
-                if 0.0001 < self.page_ranks[node] < 0.0005:
-                    self.node_color_untrusted.append('yellow')
-                if self.page_ranks[node] > 0.0005:
-                    self.node_color_untrusted.append('green')
-            else:
-                if self.page_ranks[node] < 0.0001:
-                    self.node_color_trusted.append('red')
-                if 0.0001 < self.page_ranks[node] < 0.0005:
-                    self.node_color_trusted.append('yellow')
-                if self.page_ranks[node] > 0.0005:
-                    self.node_color_trusted.append('green')
-
-        self.figure.clf()
-        self.canvas.draw_idle()
-
-        plt.title('Tribler Network', size=15)
-        plt.axis('off')
-
-        nx.draw_networkx_nodes(self.sub_graph, pos=self.pos, nodelist=[self.main_node, self.most_trusted_node],
-                               node_size=50, width=0.05, node_color=self.node_color_trusted)
-        nx.draw_networkx_nodes(self.sub_graph, pos=self.pos, nodelist=self.page_ranks_of_subgraph.keys(), node_size=50,
-                               width=0.05, node_color=self.node_color_untrusted, alpha=0.1)
-        nx.draw_networkx_edges(self.sub_graph, pos=self.pos, edgelist=[(self.main_node, self.most_trusted_node)], width=0.2)
-        nx.draw_networkx_edges(self.sub_graph, pos=self.pos, edgelist=self.sub_graph.edges(), width=0.05, alpha=0.1)
+
+        self.view.highlight([self.main_node, self.most_trusted_node], [(self.main_node, self.most_trusted_node)])
+        return
 
     def ShowTrustworthyPeers(self):
-        self.page_ranks_of_subgraph = {node: self.page_ranks[node] for node in self.sub_graph.nodes()}
+        self.page_ranks_of_subgraph = {node: self.page_ranks.get(node, 0) for node in self.sub_graph.nodes()}
         del self.page_ranks_of_subgraph[self.main_node]
-        self.most_trusted_nodes = nlargest(10, self.page_ranks_of_subgraph)
-
-        for node in self.most_trusted_nodes:
-            del self.page_ranks_of_subgraph[node]
-
-        self.node_color_trusted = []
-        self.node_color_untrusted = []
-
-        for node in self.sub_graph.nodes():
-            if node in self.page_ranks_of_subgraph.keys():
-                if self.page_ranks[node] < 0.0001:
-                    self.node_color_untrusted.append('red')
-                if 0.0001 < self.page_ranks[node] < 0.0005:
-                    self.node_color_untrusted.append('yellow')
-                if self.page_ranks[node] > 0.0005:
-                    self.node_color_untrusted.append('green')
-            else:
-                if self.page_ranks[node] < 0.0001:
-                    self.node_color_trusted.append('red')
-                if 0.0001 < self.page_ranks[node] < 0.0005:
-                    self.node_color_trusted.append('yellow')
-                if self.page_ranks[node] > 0.0005:
-                    self.node_color_trusted.append('green')
-
-        self.figure.clf()
-        self.canvas.draw_idle()
-
-        plt.title('Tribler Network', size=15)
-        plt.axis('off')
-
-        nodelist = list(set(self.most_trusted_nodes).union({self.main_node}))
-        nx.draw_networkx_nodes(self.sub_graph, pos=self.pos, nodelist=nodelist,
-                               node_size=50, width=0.05, node_color=self.node_color_trusted)
-
-        nx.draw_networkx_nodes(self.sub_graph, pos=self.pos, nodelist=self.page_ranks_of_subgraph.keys(), node_size=50,
-                               width=0.05, node_color=self.node_color_untrusted, alpha=0.1)
-        #nx.
+        self.most_trusted_nodes = nlargest(10, self.page_ranks_of_subgraph, key=self.page_ranks_of_subgraph.get)
+
+        self.view.highlight(self.most_trusted_nodes + [self.main_node],
+                            [(self.main_node, node) for node in self.most_trusted_nodes])
         return
 
     def ShowAllPeers(self):
         self.showgraph(self.main_node)
 
+    def refresh(self, page_ranks):
+        """
+        Recolours the network with new page ranks. The layout is taken from the layout cache and the existing artists
+        are reused, so only the colours of the nodes are recomputed.
+        :param page_ranks: A dictionary of nodes and corresponding page ranks
+        """
+        self.page_ranks = page_ranks
+        self.showgraph(self.main_node)
+
+    def publishSnapshot(self, snapshot):
+        """
+        Computes the neighbourhood of the main node for a snapshot and passes both to the GUI thread. Runs in the
+        writer thread of the worker, which modifies the graph, so the graph is never read while it is being modified.
+        :param snapshot: The RankSnapshot
+        """
+        neighbourhood = ego_network(self.graph, self.main_node, hops=2, max_degree=self.max_degree)
+        self.signals.snapshot_published.emit(snapshot, neighbourhood)
+
+    def showSnapshot(self, snapshot, neighbourhood):
+        """
+        Shows a snapshot published by the worker. Runs in the GUI thread.
+        :param snapshot: The RankSnapshot
+        :param neighbourhood: The EgoNetwork of the main node computed by publishSnapshot
+        """
+        self.ego_network = neighbourhood
+        self.refresh(snapshot.page_ranks())
+        self.statusbar.showMessage("Page ranks of version {}".format(snapshot.version))
+
+    def closeEvent(self, event):
+        """
+        Stops the worker without waiting for queued modifications when the window is closed
+        """
+        if self.worker is not None:
+            self.worker.stop(flush=False)
+        super(TrustGUI, self).closeEvent(event)
+
     def center(self):
         qr = self.frameGeometry()
         cp = QDesktopWidget().availableGeometry().center()
@@ -197,71 +204,28 @@ class TrustGUI(QWidget):
         self.move(qr.topLeft())
 
     def showgraph(self, main_node):
-        main_node_neighbours = list(set(nx.DiGraph.successors(self.graph, main_node)).union(
-            set(nx.DiGraph.predecessors(self.graph, main_node))))
-
-        neighbours_of_neighbours = dict()
-        all_neighbours_of_neighbours = []
-
-        for j in range(len(main_node_neighbours)):
-            node_neighbours = []
-            node_neighbours.extend(nx.DiGraph.successors(self.graph, main_node_neighbours[j]))
-            node_neighbours.extend(nx.DiGraph.predecessors(self.graph, main_node_neighbours[j]))
-            node_neighbours.remove(main_node)
-            node_neighbours = list(set(node_neighbours) - set(main_node_neighbours))
-
-            for node in node_neighbours:
-                if node in all_neighbours_of_neighbours:
-                    node_neighbours.remove(node)
-                else:
-                    continue
-
-            all_neighbours_of_neighbours.extend(node_neighbours)
-            neighbours_of_neighbours[main_node_neighbours[j]] = node_neighbours
-
-        self.sub_graph = nx.DiGraph.subgraph(self.graph, list(set(main_node_neighbours).union({main_node}).union(all_neighbours_of_neighbours)))
-        plt.title('Tribler Network', size=15)
-        plt.axis('off')
-
-        self.pos = nx.spring_layout(self.sub_graph, center=np.array([0, 0]), scale=20)
-        self.pos[main_node] = np.array([0, 0])
-
-        angle_first_circle = (2*np.pi) / len(main_node_neighbours)
-        angle_second_circle = dict()
-
-        i = 0
-        for node in main_node_neighbours:
-            self.pos[node] = np.array([np.cos(angle_first_circle * i) * 20, np.sin(angle_first_circle * i) * 20])
-            try:
-                angle_second_circle[node] = angle_first_circle/len(neighbours_of_neighbours[node])
-            except ZeroDivisionError:
-                angle_second_circle[node] = None
-            i += 1
-
-        i = 0
-        for node1 in neighbours_of_neighbours.keys():
-            j = 0
-            for node2 in neighbours_of_neighbours[node1]:
-                # pos[node2] = np.array([np.cos(angle_second_circle[node1] * j + angle_first_circle * i - angle_first_circle / 2) * 20, np.sin(angle_second_circle[node1] * j + angle_first_circle * i - angle_first_circle / 2) * 20])
-                self.pos[node2] = np.array(
-                    [np.cos(angle_second_circle[node1] * j + angle_first_circle * i - angle_first_circle / 2) * 40,
-                     np.sin(angle_second_circle[node1] * j + angle_first_circle * i - angle_first_circle / 2) * 40])
-                j += 1
-            i += 1
-
-        self.node_color = []
-        for node in self.sub_graph.nodes():
-            if self.page_ranks[node] < 0.0001:
-                self.node_color.append('red')
-            if 0.0001 < self.page_ranks[node] < 0.0005:
-                self.node_color.append('yellow')
-            if self.page_ranks[node] > 0.0005:
-                self.node_color.append('green')
-
-        self.figure.clf()
-        self.canvas.draw_idle()
-
-        labels = {}
-        labels[self.main_node] = r'you'
-        self.pos[main_node] = np.array([0, 0])
-        nx.draw(self.sub_graph, with_labels=True, labels=labels, pos=self.pos, node_color=self.node_color, node_size=50, width=0.05)
+        # While the worker is running, the graph belongs to its writer thread and the neighbourhood published with the
+        # last snapshot is shown instead
+        if self.worker is None:
+            self.ego_network = ego_network(self.graph, main_node, hops=2, max_degree=self.max_degree)
+        self.sub_graph = self.ego_network.graph()
+        main_node_neighbours = self.ego_network.rings[1] if len(self.ego_network.rings) > 1 else []
+
+        self.pos = self.layout_cache.layout(self.sub_graph, main_node, main_node_neighbours,
+                                            self.ego_network.children)
+
+        # The artists are only created again if the layout cache has computed a new layout, i.e. if the
+        # neighbourhood has changed. Otherwise only the colours of the nodes are updated.
+        if self.view is None or self.pos is not self.drawn_pos:
+            if self.view is not None:
+                self.view.disconnect()
+            self.figure.clf()
+            axes = self.figure.add_subplot(111)
+            self.view = NetworkView(axes)
+            self.view.draw(self.sub_graph, self.pos, trust_colors(self.page_ranks, self.sub_graph.nodes()),
+                           center=main_node, labels={self.main_node: r'you'})
+            axes.set_title('Tribler Network', size=15)
+            self.drawn_pos = self.pos
+        else:
+            self.view.set_colors(trust_colors(self.page_ranks, self.view.nodes))
+            self.view.highlight(None)
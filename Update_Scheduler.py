@@ -0,0 +1,217 @@
+"""
+The code in this file decides when modifications of the graph are applied to the random walks of an incremental
+personalized page rank engine.
+"""
+from __future__ import division
+import time
+from collections import deque
+
+
+class UpdateScheduler(object):
+    """
+    Class to flush the pending modifications of the graph of an incremental personalized page rank engine.
+
+    Modifications of the graph are applied to the graph of the engine immediately, but the random walks are only
+    updated when the scheduler flushes, i.e. calls update_random_walks. Calling update_random_walks after every
+    modification keeps the page ranks fresh, but repairs the same random walks over and over again under bursty
+    traffic, whereas never calling it leaves the page ranks stale. The scheduler flushes as soon as one of the
+    following policies fires:
+        - max_pending_mutations modifications are pending,
+        - the oldest pending modification has been waiting for max_delay seconds,
+        - the estimated number of random walks affected by the pending modifications exceeds max_affected_walks.
+    The number of affected random walks is estimated with the walk index of the engine, as the sum of the number of
+    random walks passing through the source nodes of all modified edges.
+    For every flush the scheduler records which policy fired, how many modifications were applied, the estimated and
+    actual number of recomputed random walks, how long the flush took and how stale the oldest modification was.
+
+    In a single thread the policies are checked whenever a modification is made or poll is called. The
+    PageRankWorker waits at most time_until_flush seconds for new modifications, so that max_delay is respected.
+    """
+
+    def __init__(self, page_rank, max_pending_mutations=100, max_delay=1.0, max_affected_walks=None,
+                 history_size=1000):
+        """
+        Initializes the scheduler
+        :param page_rank: The incremental personalized page rank engine whose random walks are updated
+        :param max_pending_mutations: Number of pending modifications at which the scheduler flushes, None to disable
+        :param max_delay: Number of seconds after the first pending modification at which the scheduler flushes,
+        None to disable
+        :param max_affected_walks: Estimated number of affected random walks at which the scheduler flushes, None
+        to disable
+        :param history_size: Number of flushes of which the statistics are kept
+        """
+        self.page_rank = page_rank
+        self.max_pending_mutations = max_pending_mutations
+        self.max_delay = max_delay
+        self.max_affected_walks = max_affected_walks
+
+        self.pending_mutations = 0
+        self.pending_nodes = set()
+        self.affected_walks = 0
+        self.first_pending_time = None
+
+        self.flush_history = deque(maxlen=history_size)
+        self.total_flushes = 0
+        self.total_mutations = 0
+        self.total_rerouted_walks = 0
+
+    def add_edge(self, source, destination, weight):
+        """
+        Applies the addition of an edge, see IncrementalPersonalizedPageRank2.add_edge, and flushes if a policy fires
+        """
+        self.record('add_edge', (source, destination, weight))
+        return self.poll()
+
+    def add_weight_to_edge(self, source, destination, weight):
+        """
+        Applies a change of the weight of an edge, see IncrementalPersonalizedPageRank2.add_weight_to_edge, and
+        flushes if a policy fires
+        """
+        self.record('add_weight_to_edge', (source, destination, weight))
+        return self.poll()
+
+    def remove_edge(self, source, destination):
+        """
+        Applies the removal of an edge, see IncrementalPersonalizedPageRank2.remove_edge, and flushes if a policy fires
+        """
+        self.record('remove_edge', (source, destination))
+        return self.poll()
+
+    def add_node(self, node):
+        """
+        Applies the addition of a node, see IncrementalPersonalizedPageRank2.add_node, and flushes if a policy fires
+        """
+        self.record('add_node', (node,))
+        return self.poll()
+
+    def remove_node(self, node):
+        """
+        Applies the removal of a node, see IncrementalPersonalizedPageRank2.remove_node, and flushes if a policy fires
+        """
+        self.record('remove_node', (node,))
+        return self.poll()
+
+    def record(self, method, arguments):
+        """
+        Applies a modification to the graph of the engine without checking the policies, and updates the estimated
+        number of affected random walks with the source nodes of the edges the modification has added or removed
+        :param method: Name of the modifying method of the engine, e.g. 'add_edge'
+        :param arguments: Arguments of the method
+        """
+        number_of_added_edges = len(self.page_rank.added_edges)
+        number_of_removed_edges = len(self.page_rank.removed_edges)
+        number_of_removed_nodes = len(self.page_rank.removed_nodes)
+        getattr(self.page_rank, method)(*arguments)
+
+        changed_nodes = [edge[0] for edge in self.page_rank.added_edges[number_of_added_edges:]]
+        changed_nodes.extend(edge[0] for edge in self.page_rank.removed_edges[number_of_removed_edges:])
+        changed_nodes.extend(self.page_rank.removed_nodes[number_of_removed_nodes:])
+        for node in changed_nodes:
+            if node not in self.pending_nodes:
+                self.pending_nodes.add(node)
+                self.affected_walks += self.page_rank.walk_index.number_of_walks_through_node(node)
+
+        if self.first_pending_time is None:
+            self.first_pending_time = time.time()
+        self.pending_mutations += 1
+        return
+
+    def due(self, include_delay=True):
+        """
+        Checks the policies
+        :param include_delay: If false, the max_delay policy is not checked
+        :return: The name of the policy that fires, or None if the pending modifications can wait
+        """
+        if self.pending_mutations == 0:
+            return None
+        if self.max_pending_mutations is not None and self.pending_mutations >= self.max_pending_mutations:
+            return 'mutations'
+        if self.max_affected_walks is not None and self.affected_walks >= self.max_affected_walks:
+            return 'affected_walks'
+        if include_delay and self.max_delay is not None and \
+                time.time() - self.first_pending_time >= self.max_delay:
+            return 'delay'
+        return None
+
+    def poll(self, include_delay=True):
+        """
+        Flushes the pending modifications if one of the policies fires
+        :param include_delay: If false, the max_delay policy is not checked
+        :return: The statistics of the flush, or None if no flush was necessary
+        """
+        reason = self.due(include_delay)
+        if reason is None:
+            return None
+        return self.flush(reason)
+
+    def time_until_flush(self):
+        """
+        :return: The number of seconds until the max_delay policy fires, or None if nothing is pending or the
+        policy is disabled
+        """
+        if self.pending_mutations == 0 or self.max_delay is None:
+            return None
+        return max(0.0, self.first_pending_time + self.max_delay - time.time())
+
+    def flush(self, reason='manual'):
+        """
+        Updates the random walks of the engine with all pending modifications
+        :param reason: The policy that caused the flush, recorded in the statistics
+        :return: A dictionary of statistics of the flush, or None if there were no pending modifications
+        """
+        if self.pending_mutations == 0:
+            return None
+        start_time = time.time()
+        try:
+            rerouted_walks = self.page_rank.update_random_walks()
+        except Exception:
+            # The modifications are not retried, so that a failing update does not fire on every poll
+            self.reset()
+            raise
+        finish_time = time.time()
+
+        flush = {'reason': reason,
+                 'mutations': self.pending_mutations,
+                 'estimated_affected_walks': self.affected_walks,
+                 'rerouted_walks': rerouted_walks,
+                 'duration': finish_time - start_time,
+                 'staleness': start_time - self.first_pending_time}
+        self.flush_history.append(flush)
+        self.total_flushes += 1
+        self.total_mutations += self.pending_mutations
+        self.total_rerouted_walks += rerouted_walks
+        self.reset()
+        return flush
+
+    def reset(self):
+        """
+        Forgets the pending modifications
+        """
+        self.pending_mutations = 0
+        self.pending_nodes = set()
+        self.affected_walks = 0
+        self.first_pending_time = None
+        return
+
+    def metrics(self):
+        """
+        Summarizes the flushes of the scheduler
+        :return: A dictionary with the total number of flushes, modifications and recomputed random walks, the
+        average number of modifications and recomputed random walks per flush, the average duration and staleness of
+        the recent flushes, the number of recent flushes per policy and the state of the pending modifications
+        """
+        recent_flushes = list(self.flush_history)
+        reasons = dict()
+        for flush in recent_flushes:
+            reasons[flush['reason']] = reasons.get(flush['reason'], 0) + 1
+        number_of_recent_flushes = max(len(recent_flushes), 1)
+        return {'flushes': self.total_flushes,
+                'mutations': self.total_mutations,
+                'rerouted_walks': self.total_rerouted_walks,
+                'mutations_per_flush': self.total_mutations / max(self.total_flushes, 1),
+                'rerouted_walks_per_flush': self.total_rerouted_walks / max(self.total_flushes, 1),
+                'average_duration': sum(flush['duration'] for flush in recent_flushes) / number_of_recent_flushes,
+                'average_staleness': sum(flush['staleness'] for flush in recent_flushes) / number_of_recent_flushes,
+                'reasons': reasons,
+                'pending_mutations': self.pending_mutations,
+                'estimated_affected_walks': self.affected_walks}
@@ -3,6 +3,9 @@ The code below opens the trustchain data set and and runs the Monte Carlo page r
 from all transactions blocks, where nodes correspond to peers and edge weights to net flows of data in between peers.
 The execution of the entire code takes roughly 120 seconds. Loading the data set only needs to be done once. Thereafter
 the page ranks are computed incrementally upon changes in the graph.
+The network explorer is opened as soon as the graph is loaded. The random walks are computed in the background and the
+explorer is refreshed whenever a new batch of random walks is available. The Monte Carlo page ranks are compared to
+the page ranks of the power iteration once the explorer has been closed.
 """
 from __future__ import division
 from Open_Database2 import GraphReduction2
@@ -25,24 +28,40 @@ import sys
 start_time = time.time()
 file_path = "C:\\Users\\alexa\\Documents\\TU Delft\\Course material\\Other\\Blockchain\\Blockchain Lab\\Incremental Pagerank\\"
 file_name = "trustchain"
+# Length of the sliding window of interactions in milliseconds, e.g. 30 * 24 * 3600 * 1000 for the last 30 days, None
+# to use all interactions
+window = None
 
-gr = GraphReduction2(file_path, file_name)
+gr = GraphReduction2(file_path, file_name, window=window)
 gr.open_data_set()
 graph = gr.generate_graph()
+load_time = time.time()
 
 main_node = random.choice(list(graph.nodes()))
 pr = IncrementalPersonalizedPageRank2(graph, main_node, 300, 0.05)
+if gr.sliding_window is not None:
+    gr.sliding_window.attach(pr)
+pr.enable_statistics()
+
+app = QApplication(sys.argv)
+trustgui = TrustGUI(graph, main_node, page_ranks={}, page_rank=pr)
+exit_code = app.exec_()
+# The application may be quit without closing the window, so the worker has to be stopped before using the engine
+trustgui.worker.stop(flush=False)
+
 pr.initial_random_walks()
-page_ranks = pr.compute_personalized_page_ranks()
-page_ranks_2 = nx.pagerank(graph, alpha=0.95, personalization={main_node: 1},
-                           max_iter=500, weight='weight')
-print "Monte Carlo Pageranks: ", page_ranks.values()
-print "Power Iteration Pageranks: ", page_ranks_2.values()
-print np.linalg.norm(np.array(page_ranks.values()) - np.array(page_ranks_2.values())) / \
-      np.linalg.norm(page_ranks_2.values())
+page_ranks = pr.compute_dense_page_ranks()
+# Both page rank vectors are aligned with the node order of the engine
+page_ranks_2 = pr.node_order.dense(nx.pagerank(graph, alpha=0.95, personalization={main_node: 1},
+                                               max_iter=500, weight='weight'))
+page_ranks = np.pad(page_ranks, (0, len(page_ranks_2) - len(page_ranks)), 'constant')
+print "Monte Carlo Pageranks: ", page_ranks
+print "Power Iteration Pageranks: ", page_ranks_2
+print np.linalg.norm(page_ranks - page_ranks_2) / np.linalg.norm(page_ranks_2)
 
-finish_time = time.time()
-print finish_time - start_time, " Seconds" 
+print load_time - start_time, " Seconds loading the data set"
+print pr.statistics.phase_breakdown()
+print pr.stats()
 
 """
 dataset = [graph, main_node, page_ranks]
@@ -61,8 +80,4 @@ main_node = dataset[1]
 page_ranks = dataset[2]
 """
 
-app = QApplication(sys.argv)
-trustgui = TrustGUI(graph, main_node, page_ranks)
-sys.exit(app.exec_())
-
-
+sys.exit(exit_code)